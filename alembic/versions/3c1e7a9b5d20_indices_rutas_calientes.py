@@ -0,0 +1,60 @@
+"""indices rutas calientes
+
+Revision ID: 3c1e7a9b5d20
+Revises: 9f9b155d755c
+Create Date: 2026-10-18 10:12:41.503118
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3c1e7a9b5d20'
+down_revision: Union[str, Sequence[str], None] = '9f9b155d755c'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Antes del UNIQUE: fusionar registros duplicados de inventario
+    # (suma las cantidades en el id más bajo y borra el resto).
+    op.execute("""
+        WITH dup AS (
+            SELECT producto_id, sucursal_id, MIN(id) AS id_keep, SUM(cantidad) AS total
+            FROM inventario
+            GROUP BY producto_id, sucursal_id
+            HAVING COUNT(*) > 1
+        )
+        UPDATE inventario i SET cantidad = dup.total
+        FROM dup WHERE i.id = dup.id_keep
+    """)
+    op.execute("""
+        DELETE FROM inventario i
+        USING inventario keep
+        WHERE i.producto_id = keep.producto_id
+          AND i.sucursal_id = keep.sucursal_id
+          AND i.id > keep.id
+    """)
+
+    op.create_unique_constraint('uq_inventario_producto_sucursal', 'inventario', ['producto_id', 'sucursal_id'])
+    op.create_index('ix_venta_sucursal_fecha', 'venta', ['sucursal_id', 'fecha'], unique=False)
+    op.create_index('ix_venta_corte_caja_id', 'venta', ['corte_caja_id'], unique=False)
+    op.create_index('ix_corte_caja_abierto_usuario', 'corte_caja', ['usuario_id'], unique=False,
+                    postgresql_where=sa.text('fecha_cierre IS NULL'))
+    op.create_index('ix_historial_inventario_producto_fecha', 'historial_inventario', ['producto_id', 'fecha'], unique=False)
+    op.create_index('ix_venta_detalle_venta_id', 'venta_detalle', ['venta_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_venta_detalle_venta_id', table_name='venta_detalle')
+    op.drop_index('ix_historial_inventario_producto_fecha', table_name='historial_inventario')
+    op.drop_index('ix_corte_caja_abierto_usuario', table_name='corte_caja',
+                  postgresql_where=sa.text('fecha_cierre IS NULL'))
+    op.drop_index('ix_venta_corte_caja_id', table_name='venta')
+    op.drop_index('ix_venta_sucursal_fecha', table_name='venta')
+    op.drop_constraint('uq_inventario_producto_sucursal', 'inventario', type_='unique')
@@ -0,0 +1,172 @@
+"""particiones mensuales
+
+Revision ID: 5a9c3e1f7b42
+Revises: d3f8a1b5c672
+Create Date: 2026-10-18 19:05:31.402117
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5a9c3e1f7b42'
+down_revision: Union[str, Sequence[str], None] = 'd3f8a1b5c672'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Meses que se dejan creados hacia adelante; después los mantiene servicios/particiones.py
+MESES_ADELANTE = 3
+
+INDICES = {
+    'venta': [
+        ('ix_venta_sucursal_fecha', ['sucursal_id', 'fecha']),
+        ('ix_venta_corte_caja_id', ['corte_caja_id']),
+        ('ix_venta_fecha_id', ['fecha', 'id']),
+    ],
+    'venta_detalle': [
+        ('ix_venta_detalle_venta_id', ['venta_id']),
+    ],
+    'historial_inventario': [
+        ('ix_historial_inventario_producto_fecha', ['producto_id', 'fecha']),
+        ('ix_historial_inventario_sucursal_producto_fecha', ['sucursal_id', 'producto_id', 'fecha', 'id']),
+    ],
+}
+
+# Los FKs hacia catálogos (el de venta_detalle -> venta cambia de forma y va aparte)
+LLAVES_FORANEAS = {
+    'venta': [
+        ('venta_sucursal_id_fkey', 'sucursal', 'sucursal_id', 'CASCADE'),
+        ('venta_usuario_id_fkey', 'usuario', 'usuario_id', 'CASCADE'),
+        ('venta_cliente_id_fkey', 'cliente', 'cliente_id', 'SET NULL'),
+        ('venta_corte_caja_id_fkey', 'corte_caja', 'corte_caja_id', None),
+    ],
+    'venta_detalle': [
+        ('venta_detalle_producto_id_fkey', 'producto', 'producto_id', 'CASCADE'),
+    ],
+    'historial_inventario': [
+        ('historial_inventario_producto_id_fkey', 'producto', 'producto_id', None),
+        ('historial_inventario_sucursal_id_fkey', 'sucursal', 'sucursal_id', None),
+        ('historial_inventario_usuario_id_fkey', 'usuario', 'usuario_id', None),
+    ],
+}
+
+# Crea las particiones <tabla>_YYYY_MM (meses en UTC) entre dos fechas. Solo
+# vive durante la migración; después los meses los crea servicios/particiones.py
+FUNCION_PARTICIONES = """
+CREATE OR REPLACE FUNCTION crear_particiones_mensuales(tabla text, desde timestamptz, hasta timestamptz)
+RETURNS integer LANGUAGE plpgsql AS $$
+DECLARE
+    mes timestamp := date_trunc('month', desde AT TIME ZONE 'UTC');
+    nombre text;
+    creadas integer := 0;
+BEGIN
+    WHILE mes <= hasta AT TIME ZONE 'UTC' LOOP
+        nombre := tabla || '_' || to_char(mes, 'YYYY_MM');
+        IF to_regclass(nombre) IS NULL THEN
+            EXECUTE format('CREATE TABLE %I PARTITION OF %I FOR VALUES FROM (%L) TO (%L)',
+                           nombre, tabla, mes AT TIME ZONE 'UTC', (mes + interval '1 month') AT TIME ZONE 'UTC');
+            creadas := creadas + 1;
+        END IF;
+        mes := mes + interval '1 month';
+    END LOOP;
+    RETURN creadas;
+END $$
+"""
+
+
+def _soltar_tabla(tabla: str, sufijo: str) -> None:
+    """Renombra la tabla actual (y su PK) y libera los nombres de sus índices."""
+    op.execute(f"ALTER TABLE {tabla} RENAME TO {tabla}_{sufijo}")
+    op.execute(f"ALTER INDEX {tabla}_pkey RENAME TO {tabla}_{sufijo}_pkey")
+    for nombre, _ in INDICES[tabla]:
+        op.drop_index(nombre, table_name=f"{tabla}_{sufijo}")
+
+
+def _terminar_tabla(tabla: str) -> None:
+    """Índices y FKs a catálogos ya con los datos copiados; la secuencia pasa a la tabla nueva."""
+    for nombre, columnas in INDICES[tabla]:
+        op.create_index(nombre, tabla, columnas, unique=False)
+    for nombre, destino, columna, ondelete in LLAVES_FORANEAS[tabla]:
+        op.create_foreign_key(nombre, tabla, destino, [columna], ['id'], ondelete=ondelete)
+    op.execute(f"ALTER SEQUENCE {tabla}_id_seq OWNED BY {tabla}.id")
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute(FUNCION_PARTICIONES)
+
+    # Las fechas NULL del historial (la columna las admitía) pasan a hoy
+    op.execute("UPDATE historial_inventario SET fecha = now() WHERE fecha IS NULL")
+
+    for tabla in ('venta', 'venta_detalle', 'historial_inventario'):
+        _soltar_tabla(tabla, 'anterior')
+        op.execute(f"CREATE TABLE {tabla} (LIKE {tabla}_anterior INCLUDING DEFAULTS) PARTITION BY RANGE (fecha)")
+        if tabla == 'venta_detalle':
+            # El detalle repite la fecha de su venta para particionarse igual y podar junto con ella
+            op.add_column('venta_detalle', sa.Column('fecha', sa.DateTime(timezone=True), nullable=False))
+        op.execute(f"ALTER TABLE {tabla} ADD PRIMARY KEY (id, fecha)")
+
+    # Particiones desde el mes más viejo con datos hasta MESES_ADELANTE, más una DEFAULT
+    # para que una fecha fuera de rango no tumbe la venta
+    desde = {
+        'venta': "(SELECT min(fecha) FROM venta_anterior)",
+        'venta_detalle': "(SELECT min(fecha) FROM venta_anterior)",
+        'historial_inventario': "(SELECT min(fecha) FROM historial_inventario_anterior)",
+    }
+    for tabla, minimo in desde.items():
+        op.execute(
+            f"SELECT crear_particiones_mensuales('{tabla}', coalesce({minimo}, now()), "
+            f"now() + interval '{MESES_ADELANTE} months')"
+        )
+        op.execute(f"CREATE TABLE {tabla}_default PARTITION OF {tabla} DEFAULT")
+
+    op.execute("INSERT INTO venta SELECT * FROM venta_anterior")
+    op.execute("""
+        INSERT INTO venta_detalle
+        SELECT d.*, coalesce(v.fecha, now())
+        FROM venta_detalle_anterior d
+        LEFT JOIN venta_anterior v ON v.id = d.venta_id
+    """)
+    op.execute("INSERT INTO historial_inventario SELECT * FROM historial_inventario_anterior")
+
+    for tabla in ('venta', 'venta_detalle', 'historial_inventario'):
+        _terminar_tabla(tabla)
+    op.create_foreign_key('venta_detalle_venta_id_fkey', 'venta_detalle', 'venta',
+                          ['venta_id', 'fecha'], ['id', 'fecha'], ondelete='CASCADE')
+
+    op.drop_table('venta_detalle_anterior')
+    op.drop_table('venta_anterior')
+    op.drop_table('historial_inventario_anterior')
+    op.execute("DROP FUNCTION crear_particiones_mensuales(text, timestamptz, timestamptz)")
+    for tabla in ('venta', 'venta_detalle', 'historial_inventario'):
+        op.execute(f"ANALYZE {tabla}")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for tabla in ('venta', 'venta_detalle', 'historial_inventario'):
+        _soltar_tabla(tabla, 'particionada')
+        op.execute(f"CREATE TABLE {tabla} (LIKE {tabla}_particionada INCLUDING DEFAULTS)")
+        if tabla == 'venta_detalle':
+            op.drop_column('venta_detalle', 'fecha')
+        op.execute(f"ALTER TABLE {tabla} ADD PRIMARY KEY (id)")
+
+    op.execute("INSERT INTO venta SELECT * FROM venta_particionada")
+    op.execute("""
+        INSERT INTO venta_detalle (id, venta_id, producto_id, cantidad, precio_unitario)
+        SELECT id, venta_id, producto_id, cantidad, precio_unitario FROM venta_detalle_particionada
+    """)
+    op.execute("INSERT INTO historial_inventario SELECT * FROM historial_inventario_particionada")
+
+    for tabla in ('venta', 'venta_detalle', 'historial_inventario'):
+        _terminar_tabla(tabla)
+    op.create_foreign_key('venta_detalle_venta_id_fkey', 'venta_detalle', 'venta',
+                          ['venta_id'], ['id'], ondelete='CASCADE')
+
+    # Borrar el padre particionado se lleva sus particiones
+    op.drop_table('venta_detalle_particionada')
+    op.drop_table('venta_particionada')
+    op.drop_table('historial_inventario_particionada')
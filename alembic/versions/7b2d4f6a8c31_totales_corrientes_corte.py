@@ -0,0 +1,43 @@
+"""totales corrientes corte
+
+Revision ID: 7b2d4f6a8c31
+Revises: 3c1e7a9b5d20
+Create Date: 2026-10-18 11:02:17.884210
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7b2d4f6a8c31'
+down_revision: Union[str, Sequence[str], None] = '3c1e7a9b5d20'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Desde esta versión las ventas y cancelaciones acumulan en corte_caja.
+    # Los turnos que ya estaban abiertos se ponen al día una sola vez.
+    op.execute("""
+        UPDATE corte_caja c SET
+            ventas_totales = t.total,
+            efectivo_esperado = c.fondo_inicial + t.total
+        FROM (
+            SELECT c2.id, COALESCE(SUM(v.total), 0) AS total
+            FROM corte_caja c2
+            LEFT JOIN venta v ON v.corte_caja_id = c2.id
+            WHERE c2.fecha_cierre IS NULL
+            GROUP BY c2.id
+        ) t
+        WHERE c.id = t.id
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # Solo datos: las versiones anteriores recalculan al vuelo, no hay nada que revertir
+    pass
@@ -0,0 +1,39 @@
+"""inventario snapshot
+
+Revision ID: 8e4b2d6f9a13
+Revises: 5a9c3e1f7b42
+Create Date: 2026-10-18 20:12:07.553284
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8e4b2d6f9a13'
+down_revision: Union[str, Sequence[str], None] = '5a9c3e1f7b42'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # La primera foto la toma la tarea de fondo (servicios/snapshots.py) al arrancar
+    op.create_table('inventario_snapshot',
+    sa.Column('fecha_local', sa.Date(), nullable=False),
+    sa.Column('sucursal_id', sa.Integer(), nullable=False),
+    sa.Column('producto_id', sa.Integer(), nullable=False),
+    sa.Column('cantidad', sa.Numeric(precision=12, scale=3), nullable=False),
+    sa.Column('precio_base', sa.Numeric(precision=10, scale=2), nullable=False),
+    sa.Column('valor', sa.Numeric(precision=14, scale=2), nullable=False),
+    sa.ForeignKeyConstraint(['producto_id'], ['producto.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['sucursal_id'], ['sucursal.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('fecha_local', 'sucursal_id', 'producto_id')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('inventario_snapshot')
@@ -0,0 +1,28 @@
+"""indice paginacion ventas
+
+Revision ID: a41c9e0d7f53
+Revises: 7b2d4f6a8c31
+Create Date: 2026-10-18 11:40:09.117342
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a41c9e0d7f53'
+down_revision: Union[str, Sequence[str], None] = '7b2d4f6a8c31'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_venta_fecha_id', 'venta', ['fecha', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_venta_fecha_id', table_name='venta')
@@ -0,0 +1,56 @@
+"""conteo fisico sesiones
+
+Revision ID: b6d0e4c2a917
+Revises: f2a7c3e9b614
+Create Date: 2026-10-18 16:02:11.407215
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b6d0e4c2a917'
+down_revision: Union[str, Sequence[str], None] = 'f2a7c3e9b614'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('conteo_sesion',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('sucursal_id', sa.Integer(), nullable=False),
+    sa.Column('usuario_id', sa.Integer(), nullable=False),
+    sa.Column('fecha_apertura', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.Column('fecha_cierre', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('estado', sa.Text(), server_default='ABIERTO', nullable=False),
+    sa.Column('motivo', sa.Text(), nullable=True),
+    sa.ForeignKeyConstraint(['sucursal_id'], ['sucursal.id'], ),
+    sa.ForeignKeyConstraint(['usuario_id'], ['usuario.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('uq_conteo_sesion_abierta_sucursal', 'conteo_sesion', ['sucursal_id'], unique=True,
+                    postgresql_where=sa.text("estado = 'ABIERTO'"))
+    op.create_table('conteo_detalle',
+    sa.Column('sesion_id', sa.Integer(), nullable=False),
+    sa.Column('producto_id', sa.Integer(), nullable=False),
+    sa.Column('dispositivo', sa.Text(), nullable=False),
+    sa.Column('cantidad', sa.Numeric(precision=12, scale=3), nullable=False),
+    sa.Column('usuario_id', sa.Integer(), nullable=False),
+    sa.Column('fecha', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.ForeignKeyConstraint(['producto_id'], ['producto.id'], ),
+    sa.ForeignKeyConstraint(['sesion_id'], ['conteo_sesion.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['usuario_id'], ['usuario.id'], ),
+    sa.PrimaryKeyConstraint('sesion_id', 'producto_id', 'dispositivo')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('conteo_detalle')
+    op.drop_index('uq_conteo_sesion_abierta_sucursal', table_name='conteo_sesion',
+                  postgresql_where=sa.text("estado = 'ABIERTO'"))
+    op.drop_table('conteo_sesion')
@@ -0,0 +1,47 @@
+"""venta resumen diario
+
+Revision ID: c58e2b7a1d94
+Revises: a41c9e0d7f53
+Create Date: 2026-10-18 12:25:53.240671
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c58e2b7a1d94'
+down_revision: Union[str, Sequence[str], None] = 'a41c9e0d7f53'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('venta_resumen_diario',
+    sa.Column('sucursal_id', sa.Integer(), nullable=False),
+    sa.Column('fecha_local', sa.Date(), nullable=False),
+    sa.Column('hora', sa.Integer(), nullable=False),
+    sa.Column('total_vendido', sa.Numeric(precision=12, scale=2), server_default='0', nullable=False),
+    sa.Column('transacciones', sa.Integer(), server_default='0', nullable=False),
+    sa.ForeignKeyConstraint(['sucursal_id'], ['sucursal.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('sucursal_id', 'fecha_local', 'hora')
+    )
+    # Llenado inicial con el histórico (después: python -m servicios.resumen_ventas)
+    op.execute("""
+        INSERT INTO venta_resumen_diario (sucursal_id, fecha_local, hora, total_vendido, transacciones)
+        SELECT sucursal_id,
+               (fecha AT TIME ZONE 'America/Mexico_City')::date,
+               EXTRACT(HOUR FROM fecha AT TIME ZONE 'America/Mexico_City')::int,
+               SUM(total), COUNT(*)
+        FROM venta
+        WHERE sucursal_id IS NOT NULL
+        GROUP BY 1, 2, 3
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('venta_resumen_diario')
@@ -0,0 +1,42 @@
+"""trabajos segundo plano
+
+Revision ID: c7a1e5f3b820
+Revises: 8e4b2d6f9a13
+Create Date: 2026-10-18 21:26:40.918452
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c7a1e5f3b820'
+down_revision: Union[str, Sequence[str], None] = '8e4b2d6f9a13'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('trabajo',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('tipo', sa.Text(), nullable=False),
+    sa.Column('parametros', sa.Text(), nullable=False),
+    sa.Column('estado', sa.Text(), server_default='PENDIENTE', nullable=False),
+    sa.Column('fecha_creacion', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.Column('fecha_inicio', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('fecha_fin', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('tipo_contenido', sa.Text(), nullable=True),
+    sa.Column('resultado', sa.LargeBinary(), nullable=True),
+    sa.Column('error', sa.Text(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_trabajo_estado_fecha_creacion', 'trabajo', ['estado', 'fecha_creacion'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_trabajo_estado_fecha_creacion', table_name='trabajo')
+    op.drop_table('trabajo')
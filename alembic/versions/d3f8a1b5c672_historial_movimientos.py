@@ -0,0 +1,42 @@
+"""historial movimientos
+
+Revision ID: d3f8a1b5c672
+Revises: b6d0e4c2a917
+Create Date: 2026-10-18 17:40:52.118390
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd3f8a1b5c672'
+down_revision: Union[str, Sequence[str], None] = 'b6d0e4c2a917'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_historial_inventario_sucursal_producto_fecha', 'historial_inventario',
+                    ['sucursal_id', 'producto_id', 'fecha', 'id'], unique=False)
+    # Saldo inicial: desde aquí ventas, cancelaciones y compras quedan en el
+    # historial, así que el stock a una fecha se puede leer de él. Se le asigna
+    # al primer usuario (la columna no admite NULL).
+    op.execute("""
+        INSERT INTO historial_inventario (fecha, sucursal_id, usuario_id, producto_id, tipo_movimiento,
+                                          cantidad_anterior, cantidad_movida, cantidad_nueva, motivo)
+        SELECT now(), i.sucursal_id, u.id, i.producto_id, 'SALDO_INICIAL',
+               0, i.cantidad, i.cantidad, 'Saldo al activar el historial de movimientos'
+        FROM inventario i
+        CROSS JOIN (SELECT min(id) AS id FROM usuario) u
+        WHERE u.id IS NOT NULL AND i.sucursal_id IS NOT NULL AND i.producto_id IS NOT NULL
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DELETE FROM historial_inventario WHERE tipo_movimiento = 'SALDO_INICIAL'")
+    op.drop_index('ix_historial_inventario_sucursal_producto_fecha', table_name='historial_inventario')
@@ -0,0 +1,47 @@
+"""venta producto diario
+
+Revision ID: e93f1a6c2b08
+Revises: c58e2b7a1d94
+Create Date: 2026-10-18 13:08:44.602915
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e93f1a6c2b08'
+down_revision: Union[str, Sequence[str], None] = 'c58e2b7a1d94'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('venta_producto_diario',
+    sa.Column('fecha_local', sa.Date(), nullable=False),
+    sa.Column('sucursal_id', sa.Integer(), nullable=False),
+    sa.Column('producto_id', sa.Integer(), nullable=False),
+    sa.Column('cantidad', sa.Numeric(precision=14, scale=3), nullable=False),
+    sa.Column('ingreso', sa.Numeric(precision=14, scale=2), nullable=False),
+    sa.ForeignKeyConstraint(['producto_id'], ['producto.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['sucursal_id'], ['sucursal.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('fecha_local', 'sucursal_id', 'producto_id')
+    )
+    # Llenado inicial con el histórico
+    op.execute("""
+        INSERT INTO venta_producto_diario (fecha_local, sucursal_id, producto_id, cantidad, ingreso)
+        SELECT (v.fecha AT TIME ZONE 'America/Mexico_City')::date, v.sucursal_id, d.producto_id,
+               SUM(d.cantidad), SUM(d.cantidad * d.precio_unitario)
+        FROM venta_detalle d
+        JOIN venta v ON v.id = d.venta_id
+        WHERE v.sucursal_id IS NOT NULL AND d.producto_id IS NOT NULL
+        GROUP BY 1, 2, 3
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('venta_producto_diario')
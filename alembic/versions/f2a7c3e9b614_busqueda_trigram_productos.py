@@ -0,0 +1,46 @@
+"""busqueda trigram productos
+
+Revision ID: f2a7c3e9b614
+Revises: e93f1a6c2b08
+Create Date: 2026-10-18 14:21:30.918462
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f2a7c3e9b614'
+down_revision: Union[str, Sequence[str], None] = 'e93f1a6c2b08'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    # GIN con trigramas: sirven para ILIKE '%texto%' y para el operador % (similitud)
+    op.create_index('ix_producto_nombre_trgm', 'producto', ['nombre'], unique=False,
+                    postgresql_using='gin', postgresql_ops={'nombre': 'gin_trgm_ops'})
+    op.create_index('ix_producto_sku_trgm', 'producto', ['sku'], unique=False,
+                    postgresql_using='gin', postgresql_ops={'sku': 'gin_trgm_ops'})
+    op.create_index('ix_producto_codigo_barras_trgm', 'producto', ['codigo_barras'], unique=False,
+                    postgresql_using='gin', postgresql_ops={'codigo_barras': 'gin_trgm_ops'})
+    op.create_index('ix_marca_nombre_trgm', 'marca', ['nombre'], unique=False,
+                    postgresql_using='gin', postgresql_ops={'nombre': 'gin_trgm_ops'})
+    # Camino rápido del escáner: igualdad exacta por código de barras
+    op.create_index('ix_producto_codigo_barras', 'producto', ['codigo_barras'], unique=False)
+    # Para que "marca_id = ANY(ids de marcas que coinciden)" entre al BitmapOr
+    op.create_index('ix_producto_marca_id', 'producto', ['marca_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_producto_marca_id', table_name='producto')
+    op.drop_index('ix_producto_codigo_barras', table_name='producto')
+    op.drop_index('ix_marca_nombre_trgm', table_name='marca')
+    op.drop_index('ix_producto_codigo_barras_trgm', table_name='producto')
+    op.drop_index('ix_producto_sku_trgm', table_name='producto')
+    op.drop_index('ix_producto_nombre_trgm', table_name='producto')
@@ -0,0 +1,251 @@
+# benchmark/dia_tienda.py
+#
+# Un día de tienda contra la app en proceso (httpx + ASGITransport, sin
+# uvicorn ni red): cada caja abre turno, vende, cancela alguna venta, recibe
+# mercancía, busca productos y consulta informes, y al final cierra su corte.
+# Reporta throughput y p50/p95/p99 por endpoint contra un PostgreSQL local.
+#
+# Uso (siembra y corre 60 s con todas las cajas):
+#   python -m benchmark.dia_tienda --sucursales 3 --cajas 4 --segundos 60 --salida hoy.json
+# Comparar contra una corrida anterior:
+#   python -m benchmark.dia_tienda --sin-sembrar --comparar hoy.json
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import time
+from collections import defaultdict
+
+import httpx
+
+from benchmark.sembrar import BENCH_DATABASE_URL, sembrar, log_step
+
+# Peso de cada acción en la mezcla de una caja (más o menos lo que pasa en mostrador)
+MEZCLA = {
+    "venta": 60,
+    "venta_escaneada": 10,
+    "buscar": 8,
+    "barcode": 5,
+    "listar_ventas": 3,
+    "ingreso_lote": 3,
+    "cancelar": 2,
+    "ventas_dia": 3,
+    "mas_vendidos": 2,
+    "stock_bajo": 2,
+    "catalogo": 2,
+}
+BUSQUEDAS = ["croq", "perro adulto", "gato", "SKU-12", "purina", "premium cachorro"]
+
+
+def percentil(ordenadas, p):
+    return ordenadas[min(len(ordenadas) - 1, int(len(ordenadas) * p))]
+
+
+class Resultados:
+    def __init__(self):
+        self.tiempos = defaultdict(list)
+        self.errores = defaultdict(int)
+
+    def anotar(self, endpoint, inicio, ok):
+        self.tiempos[endpoint].append((time.perf_counter() - inicio) * 1000)
+        if not ok:
+            self.errores[endpoint] += 1
+
+    def resumen(self, segundos):
+        filas = {}
+        for endpoint, muestras in sorted(self.tiempos.items()):
+            ordenadas = sorted(muestras)
+            filas[endpoint] = {
+                "n": len(ordenadas),
+                "errores": self.errores[endpoint],
+                "rps": round(len(ordenadas) / segundos, 2),
+                "p50": round(statistics.median(ordenadas), 2),
+                "p95": round(percentil(ordenadas, 0.95), 2),
+                "p99": round(percentil(ordenadas, 0.99), 2),
+                "max": round(ordenadas[-1], 2),
+            }
+        return filas
+
+
+class Caja:
+    """Un cajero: su usuario, su sucursal y las ventas que lleva en el turno."""
+
+    def __init__(self, cliente, resultados, usuario_id, sucursal_id, productos, clientes, rng):
+        self.http = cliente
+        self.res = resultados
+        self.usuario_id = usuario_id
+        self.sucursal_id = sucursal_id
+        self.productos = productos
+        self.clientes = clientes
+        self.rng = rng
+        self.ventas = []
+        self.etag_catalogo = None
+
+    async def pedir(self, endpoint, metodo, url, **kwargs):
+        inicio = time.perf_counter()
+        try:
+            r = await self.http.request(metodo, url, **kwargs)
+            ok = r.status_code < 400
+        except httpx.HTTPError:
+            r, ok = None, False
+        self.res.anotar(endpoint, inicio, ok)
+        return r if ok else None
+
+    def _lineas(self, escaneada):
+        lineas = []
+        for _ in range(self.rng.randint(1, 8)):
+            pid = self.rng.randint(1, self.productos)
+            # Granel: a veces se vende medio bulto (fracción) y a veces el bulto cerrado
+            cantidad = self.rng.choice([1, 1, 1, 2, 3, 0.5, 0.25])
+            if escaneada:
+                lineas.append({"codigo": str(750000000000 + pid), "cantidad": cantidad})
+            else:
+                lineas.append({"producto_id": pid, "cantidad": cantidad})
+        return lineas
+
+    async def venta(self, escaneada=False):
+        cliente_id = self.rng.randint(1, self.clientes) if self.rng.random() < 0.3 else None
+        r = await self.pedir(
+            "POST /ventas/ (escaneada)" if escaneada else "POST /ventas/", "POST", "/ventas/",
+            json={
+                "sucursal_id": self.sucursal_id, "usuario_id": self.usuario_id,
+                "cliente_id": cliente_id, "detalles": self._lineas(escaneada)
+            }
+        )
+        if r is not None:
+            self.ventas.append(r.json()["venta_id"])
+
+    async def accion(self, nombre):
+        s, rng = self.sucursal_id, self.rng
+        if nombre == "venta":
+            await self.venta()
+        elif nombre == "venta_escaneada":
+            await self.venta(escaneada=True)
+        elif nombre == "buscar":
+            await self.pedir("GET /productos/buscar", "GET", "/productos/buscar",
+                             params={"q": rng.choice(BUSQUEDAS)})
+        elif nombre == "barcode":
+            await self.pedir("GET /productos/barcode/{code}", "GET",
+                             f"/productos/barcode/{750000000000 + rng.randint(1, self.productos)}")
+        elif nombre == "listar_ventas":
+            await self.pedir("GET /ventas/", "GET", "/ventas/", params={"sucursal_id": s, "limite": 50})
+        elif nombre == "ingreso_lote":
+            lineas = [{"producto_id": rng.randint(1, self.productos), "cantidad": rng.randint(1, 10)}
+                      for _ in range(rng.randint(10, 60))]
+            await self.pedir("POST /ingreso-inventario/lote", "POST", "/ingreso-inventario/lote",
+                             json={"sucursal_id": s, "usuario_id": self.usuario_id, "lineas": lineas})
+        elif nombre == "cancelar":
+            if self.ventas:
+                venta_id = self.ventas.pop(rng.randrange(len(self.ventas)))
+                await self.pedir("PUT /ventas/{id}/cancelar", "PUT", f"/ventas/{venta_id}/cancelar")
+        elif nombre == "ventas_dia":
+            await self.pedir("GET /informes/ventas-dia", "GET", "/informes/ventas-dia",
+                             params={"sucursal_id": s})
+        elif nombre == "mas_vendidos":
+            await self.pedir("GET /informes/productos-mas-vendidos", "GET",
+                             "/informes/productos-mas-vendidos", params={"sucursal_id": s})
+        elif nombre == "stock_bajo":
+            await self.pedir("GET /informes/stock-bajo", "GET", "/informes/stock-bajo",
+                             params={"sucursal_id": s})
+        elif nombre == "catalogo":
+            # Como el POS: revalida con el ETag que ya tiene
+            headers = {"If-None-Match": self.etag_catalogo} if self.etag_catalogo else {}
+            r = await self.pedir("GET /productos/", "GET", "/productos/", headers=headers)
+            if r is not None:
+                self.etag_catalogo = r.headers.get("etag")
+
+    async def turno(self, hasta, pausa):
+        r = await self.pedir("POST /corte/abrir", "POST", "/corte/abrir",
+                             json={"sucursal_id": self.sucursal_id, "usuario_id": self.usuario_id,
+                                   "fondo_inicial": 500})
+        if r is None:
+            return
+        corte_id = r.json()["id"]
+
+        acciones, pesos = list(MEZCLA), list(MEZCLA.values())
+        while time.perf_counter() < hasta:
+            await self.accion(self.rng.choices(acciones, pesos)[0])
+            if pausa:
+                await asyncio.sleep(self.rng.expovariate(1 / pausa))
+
+        await self.pedir("GET /corte/actual/{usuario_id}", "GET", f"/corte/actual/{self.usuario_id}")
+        await self.pedir("POST /corte/cerrar", "POST", "/corte/cerrar",
+                         json={"corte_id": corte_id, "efectivo_real": 1000, "monto_retirado": 500})
+
+
+async def correr(args):
+    # database.py lee DATABASE_URL al importarse: la app se importa ya apuntando a la base de pruebas
+    os.environ["DATABASE_URL"] = args.url
+    from main import app
+
+    resultados = Resultados()
+    rng = random.Random(args.semilla)
+    async with app.router.lifespan_context(app):
+        transporte = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transporte, base_url="http://bench", timeout=60) as cliente:
+            cajas = []
+            usuario_id = 0
+            for sucursal_id in range(1, args.sucursales + 1):
+                for _ in range(args.cajas):
+                    usuario_id += 1
+                    cajas.append(Caja(cliente, resultados, usuario_id, sucursal_id,
+                                      args.productos, args.clientes, random.Random(rng.random())))
+
+            log_step(f"{len(cajas)} CAJAS DURANTE {args.segundos} s")
+            inicio = time.perf_counter()
+            await asyncio.gather(*[c.turno(inicio + args.segundos, args.pausa) for c in cajas])
+            duracion = time.perf_counter() - inicio
+    return resultados.resumen(duracion), duracion
+
+
+def imprimir(filas, duracion, anterior=None):
+    total = sum(f["n"] for f in filas.values())
+    print(f"\n{'endpoint':<38} {'n':>6} {'err':>4} {'rps':>7} {'p50':>8} {'p95':>8} {'p99':>8} {'max':>8}")
+    for endpoint, f in filas.items():
+        linea = (f"{endpoint:<38} {f['n']:>6} {f['errores']:>4} {f['rps']:>7.1f} "
+                 f"{f['p50']:>8.2f} {f['p95']:>8.2f} {f['p99']:>8.2f} {f['max']:>8.2f}")
+        previo = (anterior or {}).get(endpoint)
+        if previo and previo["p95"]:
+            cambio = (f["p95"] - previo["p95"]) / previo["p95"] * 100
+            linea += f"   p95 {cambio:+.0f}%"
+        print(linea)
+    print(f"\nTotal: {total} requests en {duracion:.1f} s = {total / duracion:.1f} req/s (latencias en ms)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de un día de tienda (app en proceso)")
+    parser.add_argument("--url", default=BENCH_DATABASE_URL, help="Base de PRUEBAS (se borra al sembrar)")
+    parser.add_argument("--sucursales", type=int, default=3)
+    parser.add_argument("--cajas", type=int, default=4, help="Cajas simultáneas por sucursal")
+    parser.add_argument("--productos", type=int, default=5000)
+    parser.add_argument("--clientes", type=int, default=2000)
+    parser.add_argument("--segundos", type=float, default=60)
+    parser.add_argument("--pausa", type=float, default=0.0, help="Segundos promedio entre acciones de una caja")
+    parser.add_argument("--semilla", type=int, default=42)
+    parser.add_argument("--sin-sembrar", action="store_true", help="Reusar los datos sembrados (mismos --sucursales, --cajas, --productos y --clientes)")
+    parser.add_argument("--salida", default=None, help="Guardar resultados en JSON")
+    parser.add_argument("--comparar", default=None, help="JSON de una corrida anterior")
+    args = parser.parse_args()
+
+    if not args.sin_sembrar:
+        sembrar(args.url, args.sucursales, args.productos, args.clientes, args.cajas)
+
+    filas, duracion = asyncio.run(correr(args))
+
+    anterior = None
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as f:
+            anterior = json.load(f)["endpoints"]
+    imprimir(filas, duracion, anterior)
+
+    if args.salida:
+        with open(args.salida, "w", encoding="utf-8") as f:
+            json.dump({"parametros": vars(args), "duracion_s": duracion, "endpoints": filas}, f, indent=2)
+        print(f"Resultados guardados en {args.salida}")
+
+
+if __name__ == "__main__":
+    main()
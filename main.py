@@ -1,17 +1,39 @@
 # main.py
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
+import asyncio
+import time
 
 # --- ¡Nuevas importaciones! ---
 from database import database 
-from routers import productos, categorias, atributos, inventario, sucursales, usuarios, clientes, ventas, auth, corte, descuentos, auditoria, informes
+from servicios.descuentos import motor_descuentos
+from servicios.ranking_productos import tarea_refresco
+from servicios.codigos import indice_codigos
+from servicios.metricas import MedicionRequest, medicion_actual, metricas_rutas, server_timing
+from servicios.kpis import kpis, monitor_loop
+from servicios.particiones import tarea_particiones
+from servicios.snapshots import tarea_snapshots
+from servicios.trabajos import cola_trabajos
+from routers import productos, categorias, atributos, inventario, sucursales, usuarios, clientes, ventas, auth, corte, descuentos, auditoria, informes, interno, trabajos
 # ... (tu lifespan se queda igual) ...
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     await database.connect()
+    await motor_descuentos.cargar()
+    await indice_codigos.cargar()
+    await cola_trabajos.iniciar()
+    refresco_ranking = asyncio.create_task(tarea_refresco())
+    medicion_loop = asyncio.create_task(monitor_loop.tarea())
+    particiones = asyncio.create_task(tarea_particiones())
+    fotos_inventario = asyncio.create_task(tarea_snapshots())
     yield
+    refresco_ranking.cancel()
+    medicion_loop.cancel()
+    particiones.cancel()
+    fotos_inventario.cancel()
+    await cola_trabajos.detener()
     await database.disconnect()
 
 app = FastAPI(lifespan=lifespan)
@@ -25,6 +47,31 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Consultas y tiempo en base por request: Server-Timing + histograma por ruta (GET /interno/rutas)
+@app.middleware("http")
+async def medir_request(request: Request, call_next):
+    medicion = MedicionRequest()
+    token = medicion_actual.set(medicion)
+    inicio = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+    finally:
+        duracion = time.perf_counter() - inicio
+        medicion_actual.reset(token)
+        ruta = request.scope.get("route")
+        if ruta is not None:
+            nombre = f"{request.method} {ruta.path}"
+            # routers/ventas.py -> "ventas"
+            modulo = getattr(getattr(ruta, "endpoint", None), "__module__", None) or "sin_router"
+            router = modulo.rsplit(".", 1)[-1]
+        else:
+            nombre = router = "sin_ruta"
+        metricas_rutas.registrar(nombre, router, status, duracion, medicion)
+    response.headers["Server-Timing"] = server_timing(medicion, duracion)
+    return response
+
 # --- ¡AQUÍ CONECTAS TUS DEPARTAMENTOS! ---
 print("Incluyendo routers...")
 app.include_router(auth.router)
@@ -40,4 +87,7 @@ app.include_router(corte.router)
 app.include_router(descuentos.router)
 app.include_router(auditoria.router)
 app.include_router(informes.router)
+app.include_router(trabajos.router)
+app.include_router(interno.router)
+app.include_router(interno.router_metrics)
 print("Routers incluidos. Iniciando app.")
\ No newline at end of file
@@ -0,0 +1,129 @@
+# medir_login.py
+#
+# Muestra que una ráfaga de logins ya no congela al resto de endpoints.
+#
+# Sin argumentos corre en proceso y no necesita base de datos: mide la latencia
+# de una "caja" (una corrutina que despierta cada 10 ms, lo mismo que sufriría
+# cualquier request) mientras se verifican contraseñas con bcrypt, primero
+# bloqueando el event loop y luego con el pool de security.py.
+#
+# Contra un servidor corriendo, mide POST /ventas/ (lo que espera la caja) con
+# y sin ráfaga de /token. Abre turno al usuario si no tiene y al final cancela
+# las ventas de prueba para dejar el stock como estaba:
+#   python medir_login.py --url http://127.0.0.1:8000 --usuario admin --password 1234 \
+#       --usuario-id 1 --sucursal-id 1 --producto-id 1
+
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+
+from benchmark.sembrar import log_step
+from security import get_password_hash, verificar_password, verificar_password_async
+
+
+def percentiles(muestras_ms):
+    ordenadas = sorted(muestras_ms)
+    p99 = ordenadas[min(len(ordenadas) - 1, int(len(ordenadas) * 0.99))]
+    return statistics.median(ordenadas), p99, ordenadas[-1]
+
+
+def imprimir(nombre, muestras_ms):
+    p50, p99, maximo = percentiles(muestras_ms)
+    print(f"{nombre:<28} n={len(muestras_ms):<5} p50={p50:8.2f} ms  p99={p99:8.2f} ms  max={maximo:8.2f} ms")
+
+
+async def _caja(detener, muestras, intervalo=0.010):
+    """Simula un request ligero: cuánto se atrasa respecto a lo esperado."""
+    while not detener.is_set():
+        inicio = time.perf_counter()
+        await asyncio.sleep(intervalo)
+        muestras.append((time.perf_counter() - inicio - intervalo) * 1000)
+
+
+async def en_proceso(logins):
+    hash_prueba = get_password_hash("secreto")
+
+    async def verificar_bloqueando():
+        verificar_password("secreto", hash_prueba)
+        await asyncio.sleep(0)
+
+    async def verificar_en_pool():
+        await verificar_password_async("secreto", hash_prueba)
+
+    for nombre, verificar in [("bloqueando el loop", verificar_bloqueando), ("pool de hilos", verificar_en_pool)]:
+        detener, muestras = asyncio.Event(), []
+        caja = asyncio.create_task(_caja(detener, muestras))
+        await asyncio.sleep(0.2)
+        await asyncio.gather(*[verificar() for _ in range(logins)])
+        detener.set()
+        await caja
+        imprimir(nombre, muestras)
+
+
+async def contra_servidor(url, usuario, password, logins, ventas, usuario_id, sucursal_id, producto_id):
+    async with httpx.AsyncClient(base_url=url, timeout=60) as cliente:
+        # Sin turno abierto la venta responde 400; si ya había uno, /corte/abrir también (y se usa ese)
+        r = await cliente.post("/corte/abrir", json={
+            "sucursal_id": sucursal_id, "usuario_id": usuario_id, "fondo_inicial": 0
+        })
+        if r.status_code not in (200, 400):
+            r.raise_for_status()
+        venta = {
+            "sucursal_id": sucursal_id, "usuario_id": usuario_id,
+            "detalles": [{"producto_id": producto_id, "cantidad": 1}]
+        }
+        creadas = []
+
+        async def medir_ventas():
+            muestras = []
+            for _ in range(ventas):
+                inicio = time.perf_counter()
+                r = await cliente.post("/ventas/", json=venta)
+                r.raise_for_status()
+                muestras.append((time.perf_counter() - inicio) * 1000)
+                creadas.append(r.json()["venta_id"])
+            return muestras
+
+        async def login():
+            await cliente.post("/token", data={"username": usuario, "password": password})
+
+        try:
+            imprimir("POST /ventas/ sin logins", await medir_ventas())
+
+            rafaga = asyncio.gather(*[login() for _ in range(logins)])
+            muestras = await medir_ventas()
+            await rafaga
+            imprimir("POST /ventas/ con ráfaga", muestras)
+        finally:
+            for venta_id in creadas:
+                await cliente.put(f"/ventas/{venta_id}/cancelar", params={"usuario_id": usuario_id})
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Latencia de la caja durante una ráfaga de logins")
+    parser.add_argument("--logins", type=int, default=20)
+    parser.add_argument("--url", default=None, help="Servidor a medir (si no, corre en proceso)")
+    parser.add_argument("--usuario", default="admin")
+    parser.add_argument("--password", default="1234")
+    parser.add_argument("--ventas", type=int, default=200, help="Ventas a registrar en cada medición")
+    parser.add_argument("--usuario-id", type=int, default=1, help="Cajero de las ventas de prueba")
+    parser.add_argument("--sucursal-id", type=int, default=1)
+    parser.add_argument("--producto-id", type=int, default=1, help="Producto que se vende (y se regresa al cancelar)")
+    args = parser.parse_args()
+
+    if args.url:
+        log_step(f"SERVIDOR {args.url}")
+        asyncio.run(contra_servidor(
+            args.url, args.usuario, args.password, args.logins, args.ventas,
+            args.usuario_id, args.sucursal_id, args.producto_id
+        ))
+    else:
+        log_step(f"EN PROCESO ({args.logins} logins)")
+        asyncio.run(en_proceso(args.logins))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,4 @@
-from sqlalchemy import Table, Column, Integer, Text, Numeric, MetaData, ForeignKey, DateTime, Boolean
+from sqlalchemy import Table, Column, Integer, Text, Numeric, MetaData, ForeignKey, ForeignKeyConstraint, DateTime, Date, Boolean, Index, UniqueConstraint, LargeBinary, text
 from sqlalchemy.sql import func
 
 metadata = MetaData()
@@ -26,7 +26,9 @@ marca = Table(
     "marca",
     metadata,
     Column("id", Integer, primary_key=True),
-    Column("nombre", Text, nullable=False, unique=True)
+    Column("nombre", Text, nullable=False, unique=True),
+
+    Index("ix_marca_nombre_trgm", "nombre", postgresql_using="gin", postgresql_ops={"nombre": "gin_trgm_ops"})
 )
 
 especie = Table(
@@ -112,7 +114,14 @@ producto = Table(
     Column("precio_granel", Numeric(10, 2), nullable=True),  # Precio por unidad suelta (Kilo/Tableta)
     
     Column("activo", Boolean, default=True), # Soft Delete
-    Column("stock_minimo", Numeric(12, 3), default=5.0)
+    Column("stock_minimo", Numeric(12, 3), default=5.0),
+
+    # Búsqueda del POS (pg_trgm): ILIKE '%texto%' por nombre, SKU y código
+    Index("ix_producto_nombre_trgm", "nombre", postgresql_using="gin", postgresql_ops={"nombre": "gin_trgm_ops"}),
+    Index("ix_producto_sku_trgm", "sku", postgresql_using="gin", postgresql_ops={"sku": "gin_trgm_ops"}),
+    Index("ix_producto_codigo_barras_trgm", "codigo_barras", postgresql_using="gin", postgresql_ops={"codigo_barras": "gin_trgm_ops"}),
+    Index("ix_producto_codigo_barras", "codigo_barras"),
+    Index("ix_producto_marca_id", "marca_id")
 )
 
 # ==========================================
@@ -130,7 +139,10 @@ inventario = Table(
     # Numeric(12, 3) permite hasta 999 millones y 3 decimales (gramos)
     Column("cantidad", Numeric(12, 3), nullable=False, default=0), 
     
-    Column("fecha_actualizacion", DateTime(timezone=True), server_default=func.now(), nullable=False)
+    Column("fecha_actualizacion", DateTime(timezone=True), server_default=func.now(), nullable=False),
+
+    # Un solo registro por producto y sucursal (permite el upsert de stock)
+    UniqueConstraint("producto_id", "sucursal_id", name="uq_inventario_producto_sucursal")
 )
 
 # Registro de Compras/Ingresos
@@ -164,23 +176,60 @@ ajuste_inventario = Table(
 )
 
 # El "Chismoso" (Bitácora completa de movimientos)
+# Particionada por mes (servicios/particiones.py): la PK lleva la fecha
 historial_inventario = Table(
     "historial_inventario",
     metadata,
-    Column("id", Integer, primary_key=True),
-    Column("fecha", DateTime(timezone=True), server_default=func.now()),
+    Column("id", Integer, primary_key=True, autoincrement=True),
+    Column("fecha", DateTime(timezone=True), primary_key=True, server_default=func.now()),
     
     Column("sucursal_id", Integer, ForeignKey("sucursal.id"), nullable=False),
     Column("usuario_id", Integer, ForeignKey("usuario.id"), nullable=False),
     Column("producto_id", Integer, ForeignKey("producto.id"), nullable=False),
     
-    Column("tipo_movimiento", Text, nullable=False), # 'VENTA', 'COMPRA', 'AJUSTE', 'CORRECCION'
+    Column("tipo_movimiento", Text, nullable=False), # 'VENTA', 'COMPRA', 'AJUSTE_AUDITORIA', 'AJUSTE_MANUAL', 'CANCELACION'
     
     Column("cantidad_anterior", Numeric(12, 3), nullable=False),
     Column("cantidad_movida", Numeric(12, 3), nullable=False), 
     Column("cantidad_nueva", Numeric(12, 3), nullable=False),
     
-    Column("motivo", Text)
+    Column("motivo", Text),
+
+    Index("ix_historial_inventario_producto_fecha", "producto_id", "fecha"),
+    # Stock a una fecha: último renglón de cada producto en la sucursal
+    Index("ix_historial_inventario_sucursal_producto_fecha", "sucursal_id", "producto_id", "fecha", "id"),
+    postgresql_partition_by="RANGE (fecha)"
+)
+
+# Conteo físico por sesión (inventario mensual): varios dispositivos suben
+# lo que van contando y al cerrar se ajusta todo el inventario de una vez
+conteo_sesion = Table(
+    "conteo_sesion",
+    metadata,
+    Column("id", Integer, primary_key=True),
+    Column("sucursal_id", Integer, ForeignKey("sucursal.id"), nullable=False),
+    Column("usuario_id", Integer, ForeignKey("usuario.id"), nullable=False), # Quien lo abrió
+    
+    Column("fecha_apertura", DateTime(timezone=True), server_default=func.now()),
+    Column("fecha_cierre", DateTime(timezone=True), nullable=True),
+    Column("estado", Text, nullable=False, server_default="ABIERTO"), # 'ABIERTO', 'CERRADO', 'CANCELADO'
+    Column("motivo", Text),
+
+    # Un solo conteo abierto por sucursal
+    Index("uq_conteo_sesion_abierta_sucursal", "sucursal_id", unique=True,
+          postgresql_where=text("estado = 'ABIERTO'"))
+)
+
+conteo_detalle = Table(
+    "conteo_detalle",
+    metadata,
+    Column("sesion_id", Integer, ForeignKey("conteo_sesion.id", ondelete="CASCADE"), primary_key=True),
+    Column("producto_id", Integer, ForeignKey("producto.id"), primary_key=True),
+    # Lo contado por cada dispositivo se suma (el mismo producto puede estar en dos anaqueles)
+    Column("dispositivo", Text, primary_key=True),
+    Column("cantidad", Numeric(12, 3), nullable=False),
+    Column("usuario_id", Integer, ForeignKey("usuario.id"), nullable=False),
+    Column("fecha", DateTime(timezone=True), server_default=func.now())
 )
 
 # ==========================================
@@ -208,7 +257,10 @@ corte_caja = Table(
     Column("monto_retirado", Numeric(10, 2), default=0),     # Tu ganancia
     Column("fondo_siguiente", Numeric(10, 2), default=0),    # Para mañana
     
-    Column("comentarios", Text)
+    Column("comentarios", Text),
+
+    # Solo los turnos abiertos: "¿este usuario tiene caja abierta?"
+    Index("ix_corte_caja_abierto_usuario", "usuario_id", postgresql_where=text("fecha_cierre IS NULL"))
 )
 
 regla_descuento = Table(
@@ -226,32 +278,112 @@ regla_descuento = Table(
     Column("activo", Boolean, default=True)
 )
 
+# venta y venta_detalle van particionadas por mes (servicios/particiones.py):
+# la fecha es parte de la PK y venta_detalle la repite para el FK
 venta = Table(
     "venta",
     metadata,
-    Column("id", Integer, primary_key=True),
+    Column("id", Integer, primary_key=True, autoincrement=True),
     Column("sucursal_id", Integer, ForeignKey("sucursal.id", ondelete="CASCADE")),
     Column("usuario_id", Integer, ForeignKey("usuario.id", ondelete="CASCADE")),
     
     Column("cliente_id", Integer, ForeignKey("cliente.id", ondelete="SET NULL")), 
     Column("corte_caja_id", Integer, ForeignKey("corte_caja.id")), 
     
-    Column("fecha", DateTime(timezone=True), nullable=False, server_default=func.now()),
+    Column("fecha", DateTime(timezone=True), primary_key=True, nullable=False, server_default=func.now()),
     Column("total", Numeric(10, 2), nullable=False),
     
     # Descuentos manuales
     Column("descuento_especial_monto", Numeric(10, 2), default=0),
-    Column("descuento_especial_motivo", Text)
+    Column("descuento_especial_motivo", Text),
+
+    Index("ix_venta_sucursal_fecha", "sucursal_id", "fecha"),
+    Index("ix_venta_corte_caja_id", "corte_caja_id"),
+    Index("ix_venta_fecha_id", "fecha", "id"), # Paginación por cursor de GET /ventas/
+    postgresql_partition_by="RANGE (fecha)"
 )
 
 venta_detalle = Table(
     "venta_detalle",
     metadata,
-    Column("id", Integer, primary_key=True),
-    Column("venta_id", Integer, ForeignKey("venta.id", ondelete="CASCADE")),
+    Column("id", Integer, primary_key=True, autoincrement=True),
+    Column("venta_id", Integer),
     Column("producto_id", Integer, ForeignKey("producto.id", ondelete="CASCADE")),
     
     # Numeric para soportar 0.5 kg
     Column("cantidad", Numeric(12, 3), nullable=False), 
-    Column("precio_unitario", Numeric(10, 2), nullable=False)
-)
\ No newline at end of file
+    Column("precio_unitario", Numeric(10, 2), nullable=False),
+    Column("fecha", DateTime(timezone=True), primary_key=True), # La de la venta (clave de partición)
+
+    ForeignKeyConstraint(["venta_id", "fecha"], ["venta.id", "venta.fecha"], ondelete="CASCADE"),
+    Index("ix_venta_detalle_venta_id", "venta_id"),
+    postgresql_partition_by="RANGE (fecha)"
+)
+
+# ==========================================
+# 6. RESÚMENES (Tablas de reportes)
+# ==========================================
+
+# Ventas acumuladas por sucursal, día y hora (hora local CDMX).
+# Se actualiza con cada venta/cancelación; los reportes leen de aquí.
+venta_resumen_diario = Table(
+    "venta_resumen_diario",
+    metadata,
+    Column("sucursal_id", Integer, ForeignKey("sucursal.id", ondelete="CASCADE"), primary_key=True),
+    Column("fecha_local", Date, primary_key=True),
+    Column("hora", Integer, primary_key=True), # 0-23
+
+    Column("total_vendido", Numeric(12, 2), nullable=False, server_default='0'),
+    Column("transacciones", Integer, nullable=False, server_default='0')
+)
+
+# Cantidad e importe vendidos por producto, sucursal y día (hora local CDMX).
+# Lo refresca una tarea de fondo (servicios/ranking_productos.py).
+venta_producto_diario = Table(
+    "venta_producto_diario",
+    metadata,
+    Column("fecha_local", Date, primary_key=True),
+    Column("sucursal_id", Integer, ForeignKey("sucursal.id", ondelete="CASCADE"), primary_key=True),
+    Column("producto_id", Integer, ForeignKey("producto.id", ondelete="CASCADE"), primary_key=True),
+
+    Column("cantidad", Numeric(14, 3), nullable=False),
+    Column("ingreso", Numeric(14, 2), nullable=False)
+)
+
+# Foto del stock al cierre de cada día local (CDMX) por sucursal y producto,
+# valuada a precio_base. La toma cada noche servicios/snapshots.py; el stock a
+# cualquier momento es la foto anterior más los movimientos de historial desde ella.
+inventario_snapshot = Table(
+    "inventario_snapshot",
+    metadata,
+    Column("fecha_local", Date, primary_key=True),
+    Column("sucursal_id", Integer, ForeignKey("sucursal.id", ondelete="CASCADE"), primary_key=True),
+    Column("producto_id", Integer, ForeignKey("producto.id", ondelete="CASCADE"), primary_key=True),
+
+    Column("cantidad", Numeric(12, 3), nullable=False), # Unidad de inventario (kilos/piezas)
+    Column("precio_base", Numeric(10, 2), nullable=False),
+    Column("valor", Numeric(14, 2), nullable=False)
+)
+
+# ==========================================
+# 7. TRABAJOS EN SEGUNDO PLANO
+# ==========================================
+
+# Informes y exportaciones pesadas que corren fuera del request
+# (servicios/trabajos.py). El resultado se guarda aquí hasta que se descarga.
+trabajo = Table(
+    "trabajo",
+    metadata,
+    Column("id", Integer, primary_key=True),
+    Column("tipo", Text, nullable=False),          # 'informes.ventas-mes', 'productos.exportar-csv', ...
+    Column("parametros", Text, nullable=False),    # JSON
+    Column("estado", Text, nullable=False, server_default="PENDIENTE"), # PENDIENTE, EN_CURSO, TERMINADO, ERROR
+    Column("fecha_creacion", DateTime(timezone=True), nullable=False, server_default=func.now()),
+    Column("fecha_inicio", DateTime(timezone=True)),
+    Column("fecha_fin", DateTime(timezone=True)),
+    Column("tipo_contenido", Text),                # media type del resultado
+    Column("resultado", LargeBinary),
+    Column("error", Text),
+
+    Index("ix_trabajo_estado_fecha_creacion", "estado", "fecha_creacion")
+)
@@ -1,6 +1,6 @@
 # routers/atributos.py
 
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, HTTPException, Query, Request
 from typing import List, Optional
 from models import marca, especie, etapa
 from schemas import ( 
@@ -8,6 +8,8 @@ from schemas import (
     EtapaIn, Etapa,
 )
 from database import database
+from servicios.descuentos import motor_descuentos
+from servicios.catalogo import cache_catalogo, responder_catalogo
 
 router = APIRouter(
     tags=["Atributos (Marcas, Especies, etc)"]
@@ -15,12 +17,14 @@ router = APIRouter(
 
 # === MARCAS ===
 @router.get("/marcas", response_model=List[Marca])
-async def obtener_marcas(q: Optional[str] = Query(None, description="Buscar por nombre")):
+async def obtener_marcas(request: Request, q: Optional[str] = Query(None, description="Buscar por nombre")):
     query = marca.select()
     if q:
         # Búsqueda insensible a mayúsculas/minúsculas (ilike)
         query = query.where(marca.c.nombre.ilike(f"%{q}%"))
-    return await database.fetch_all(query)
+        return await database.fetch_all(query)
+    # Catálogo completo: desde la caché (ETag / 304)
+    return await responder_catalogo(request, "marcas", (), Marca, lambda: database.fetch_all(query))
 
 @router.get("/marcas/{id}", response_model=Marca)
 async def obtener_marca(id: int):
@@ -34,12 +38,14 @@ async def obtener_marca(id: int):
 async def crear_marca(m: MarcaIn):
     query = marca.insert().values(**m.model_dump())
     last_id = await database.execute(query)
+    cache_catalogo.invalidar("marcas")
     return {**m.model_dump(), "id": last_id}
 
 @router.put("/marcas/{id}", response_model=Marca)
 async def actualizar_marca(id: int, m: MarcaIn):
     query = marca.update().where(marca.c.id == id).values(**m.model_dump())
     result = await database.execute(query)
+    cache_catalogo.invalidar("marcas")
     if result == 0:
         raise HTTPException(status_code=404, detail="Marca no encontrada")
     return {**m.model_dump(), "id": id}
@@ -48,6 +54,8 @@ async def actualizar_marca(id: int, m: MarcaIn):
 async def eliminar_marca(id: int):
     query = marca.delete().where(marca.c.id == id)
     result = await database.execute(query)
+    cache_catalogo.invalidar("marcas")
+    motor_descuentos.invalidar() # Sus reglas se borran en cascada
     if result == 0:
         raise HTTPException(status_code=404, detail="Marca no encontrada")
     return {"mensaje": "Marca eliminada"}
@@ -55,11 +63,12 @@ async def eliminar_marca(id: int):
 
 # === ESPECIES ===
 @router.get("/especies", response_model=List[Especie])
-async def obtener_especies(q: Optional[str] = Query(None)):
+async def obtener_especies(request: Request, q: Optional[str] = Query(None)):
     query = especie.select()
     if q:
         query = query.where(especie.c.nombre.ilike(f"%{q}%"))
-    return await database.fetch_all(query)
+        return await database.fetch_all(query)
+    return await responder_catalogo(request, "especies", (), Especie, lambda: database.fetch_all(query))
 
 @router.get("/especies/{id}", response_model=Especie)
 async def obtener_especie(id: int):
@@ -73,12 +82,14 @@ async def obtener_especie(id: int):
 async def crear_especie(e: EspecieIn):
     query = especie.insert().values(**e.model_dump())
     last_id = await database.execute(query)
+    cache_catalogo.invalidar("especies")
     return {**e.model_dump(), "id": last_id}
 
 @router.put("/especies/{id}", response_model=Especie)
 async def actualizar_especie(id: int, e: EspecieIn):
     query = especie.update().where(especie.c.id == id).values(**e.model_dump())
     result = await database.execute(query)
+    cache_catalogo.invalidar("especies")
     if result == 0:
         raise HTTPException(status_code=404, detail="Especie no encontrada")
     return {**e.model_dump(), "id": id}
@@ -87,6 +98,7 @@ async def actualizar_especie(id: int, e: EspecieIn):
 async def eliminar_especie(id: int):
     query = especie.delete().where(especie.c.id == id)
     result = await database.execute(query)
+    cache_catalogo.invalidar("especies")
     if result == 0:
         raise HTTPException(status_code=404, detail="Especie no encontrada")
     return {"mensaje": "Especie eliminada"}
@@ -94,11 +106,12 @@ async def eliminar_especie(id: int):
 
 # === ETAPAS ===
 @router.get("/etapas", response_model=List[Etapa])
-async def obtener_etapas(q: Optional[str] = Query(None)):
+async def obtener_etapas(request: Request, q: Optional[str] = Query(None)):
     query = etapa.select()
     if q:
         query = query.where(etapa.c.nombre.ilike(f"%{q}%"))
-    return await database.fetch_all(query)
+        return await database.fetch_all(query)
+    return await responder_catalogo(request, "etapas", (), Etapa, lambda: database.fetch_all(query))
 
 @router.get("/etapas/{id}", response_model=Etapa)
 async def obtener_etapa(id: int):
@@ -112,12 +125,14 @@ async def obtener_etapa(id: int):
 async def crear_etapa(e: EtapaIn):
     query = etapa.insert().values(**e.model_dump())
     last_id = await database.execute(query)
+    cache_catalogo.invalidar("etapas")
     return {**e.model_dump(), "id": last_id}
 
 @router.put("/etapas/{id}", response_model=Etapa)
 async def actualizar_etapa(id: int, e: EtapaIn):
     query = etapa.update().where(etapa.c.id == id).values(**e.model_dump())
     result = await database.execute(query)
+    cache_catalogo.invalidar("etapas")
     if result == 0:
         raise HTTPException(status_code=404, detail="Etapa no encontrada")
     return {**e.model_dump(), "id": id}
@@ -126,6 +141,7 @@ async def actualizar_etapa(id: int, e: EtapaIn):
 async def eliminar_etapa(id: int):
     query = etapa.delete().where(etapa.c.id == id)
     result = await database.execute(query)
+    cache_catalogo.invalidar("etapas")
     if result == 0:
         raise HTTPException(status_code=404, detail="Etapa no encontrada")
     return {"mensaje": "Etapa eliminada"}
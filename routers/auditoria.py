@@ -1,11 +1,18 @@
-from fastapi import APIRouter, HTTPException
-from typing import List
-from datetime import datetime, timezone
-from sqlalchemy import select, update
+from fastapi import APIRouter, HTTPException, Query, Response
+from typing import List, Optional
+from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
+from sqlalchemy import select, func, desc, tuple_, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 
 from database import database
-from models import inventario, ajuste_inventario, historial_inventario, producto
-from schemas import AjusteInventarioIn, AjusteInventario, HistorialInventario
+from models import ajuste_inventario, historial_inventario, conteo_sesion, conteo_detalle
+from schemas import (
+    AjusteInventarioIn, AjusteInventario, HistorialInventario,
+    ConteoSesionIn, ConteoSesion, ConteoLecturasIn, ConteoCierreIn
+)
+from servicios.stock import fijar_stock
+from servicios.paginacion import codificar_cursor, decodificar_cursor
 
 router = APIRouter(
     prefix="/auditoria",
@@ -19,14 +26,11 @@ async def registrar_ajuste_inventario(data: AjusteInventarioIn):
     Calcula la diferencia y actualiza el inventario.
     """
     async with database.transaction():
-        # 1. Obtener Inventario Actual (Sistema)
-        query_inv = select(inventario).where(
-            (inventario.c.producto_id == data.producto_id) &
-            (inventario.c.sucursal_id == data.sucursal_id)
-        )
-        inv_db = await database.fetch_one(query_inv)
-        
-        cantidad_sistema = float(inv_db['cantidad']) if inv_db else 0.0
+        # 1. Reemplazar el Inventario con el valor FÍSICO (el real)
+        #    fijar_stock devuelve lo que decía el sistema justo antes de sobrescribirlo
+        ahora = datetime.now(timezone.utc)
+        movs = await fijar_stock(data.sucursal_id, {data.producto_id: data.cantidad_fisica}, ahora)
+        cantidad_sistema, _ = movs[data.producto_id]
         
         # 2. Calcular Diferencia (Real - Sistema)
         # Ej: Real 48kg - Sistema 50kg = -2kg (Merma)
@@ -37,34 +41,17 @@ async def registrar_ajuste_inventario(data: AjusteInventarioIn):
             sucursal_id=data.sucursal_id,
             usuario_id=data.usuario_id,
             producto_id=data.producto_id,
-            fecha=datetime.now(timezone.utc),
+            fecha=ahora,
             cantidad_sistema=cantidad_sistema,
             cantidad_fisica=data.cantidad_fisica,
             diferencia=diferencia,
             motivo=data.motivo
         )
         ajuste_id = await database.execute(query_ajuste)
-        
-        # 4. Actualizar o Crear el Inventario con el valor FÍSICO (el real)
-        if inv_db:
-            query_upd = inventario.update().where(inventario.c.id == inv_db['id']).values(
-                cantidad=data.cantidad_fisica,
-                fecha_actualizacion=datetime.now(timezone.utc)
-            )
-            await database.execute(query_upd)
-        else:
-            # Si no existía registro, lo creamos
-            query_ins = inventario.insert().values(
-                producto_id=data.producto_id,
-                sucursal_id=data.sucursal_id,
-                cantidad=data.cantidad_fisica,
-                fecha_actualizacion=datetime.now(timezone.utc)
-            )
-            await database.execute(query_ins)
             
-        # 5. Registrar en el Historial (El Chismoso)
+        # 4. Registrar en el Historial (El Chismoso)
         query_hist = historial_inventario.insert().values(
-            fecha=datetime.now(timezone.utc),
+            fecha=ahora,
             sucursal_id=data.sucursal_id,
             usuario_id=data.usuario_id,
             producto_id=data.producto_id,
@@ -85,14 +72,218 @@ async def registrar_ajuste_inventario(data: AjusteInventarioIn):
             "cantidad_fisica": data.cantidad_fisica,
             "diferencia": diferencia,
             "motivo": data.motivo,
-            "fecha": datetime.now(timezone.utc)
+            "fecha": ahora
+        }
+
+# === CONTEO FÍSICO POR SESIÓN ===
+
+async def _sesion_abierta(sesion_id: int, bloqueo: str):
+    """La sesión con lock (FOR SHARE al subir lecturas, FOR UPDATE al cerrar)."""
+    query = conteo_sesion.select().where(conteo_sesion.c.id == sesion_id)
+    query = query.with_for_update(read=(bloqueo == "share"))
+    sesion = await database.fetch_one(query)
+    if not sesion:
+        raise HTTPException(status_code=404, detail="Conteo no encontrado")
+    if sesion["estado"] != "ABIERTO":
+        raise HTTPException(status_code=409, detail=f"El conteo ya está {sesion['estado'].lower()}")
+    return sesion
+
+@router.post("/conteos", response_model=ConteoSesion)
+async def abrir_conteo(data: ConteoSesionIn):
+    abierta = await database.fetch_one(
+        select(conteo_sesion.c.id).where(
+            (conteo_sesion.c.sucursal_id == data.sucursal_id) &
+            (conteo_sesion.c.estado == "ABIERTO")
+        )
+    )
+    if abierta:
+        raise HTTPException(status_code=409, detail=f"La sucursal ya tiene el conteo {abierta['id']} abierto")
+    
+    # Dos aperturas a la vez pasan la revisión de arriba: el índice único parcial
+    # decide y la que pierde no inserta nada (en vez de un error 500)
+    query = pg_insert(conteo_sesion).values(**data.model_dump()).on_conflict_do_nothing(
+        index_elements=["sucursal_id"], index_where=text("estado = 'ABIERTO'")
+    ).returning(*conteo_sesion.c)
+    sesion = await database.fetch_one(query)
+    if sesion is None:
+        raise HTTPException(status_code=409, detail="La sucursal ya tiene un conteo abierto")
+    return sesion
+
+@router.get("/conteos/{sesion_id}", response_model=dict)
+async def obtener_conteo(sesion_id: int):
+    """La sesión y su avance (productos contados y por qué dispositivos)."""
+    sesion = await database.fetch_one(conteo_sesion.select().where(conteo_sesion.c.id == sesion_id))
+    if not sesion:
+        raise HTTPException(status_code=404, detail="Conteo no encontrado")
+    
+    query_avance = select(
+        conteo_detalle.c.dispositivo,
+        func.count().label("productos"),
+        func.max(conteo_detalle.c.fecha).label("ultima_lectura")
+    ).where(conteo_detalle.c.sesion_id == sesion_id).group_by(conteo_detalle.c.dispositivo)
+    dispositivos = await database.fetch_all(query_avance)
+    
+    query_total = select(func.count(func.distinct(conteo_detalle.c.producto_id))).where(
+        conteo_detalle.c.sesion_id == sesion_id
+    )
+    return {
+        **ConteoSesion.model_validate(dict(sesion)).model_dump(),
+        "productos_contados": await database.fetch_val(query_total),
+        "dispositivos": [dict(d) for d in dispositivos]
+    }
+
+@router.post("/conteos/{sesion_id}/lecturas", response_model=dict)
+async def subir_lecturas(sesion_id: int, data: ConteoLecturasIn):
+    """
+    Lo que lleva contado un dispositivo. Se puede mandar por partes y
+    reenviar: por (producto, dispositivo) queda la última cantidad recibida.
+    """
+    # Si la misma línea viene dos veces en el envío, gana la última
+    cantidades = {l.producto_id: l.cantidad for l in data.lineas}
+    if not cantidades:
+        return {"recibidas": 0}
+    
+    ahora = datetime.now(timezone.utc)
+    query = pg_insert(conteo_detalle).values([
+        {
+            "sesion_id": sesion_id, "producto_id": pid, "dispositivo": data.dispositivo,
+            "cantidad": cantidad, "usuario_id": data.usuario_id, "fecha": ahora
+        }
+        for pid, cantidad in cantidades.items()
+    ])
+    query = query.on_conflict_do_update(
+        index_elements=["sesion_id", "producto_id", "dispositivo"],
+        set_={
+            "cantidad": query.excluded.cantidad,
+            "usuario_id": query.excluded.usuario_id,
+            "fecha": query.excluded.fecha
         }
+    )
+    async with database.transaction():
+        # FOR SHARE: varios dispositivos suben a la vez, pero nadie cierra en medio
+        await _sesion_abierta(sesion_id, "share")
+        await database.execute(query)
+    return {"recibidas": len(cantidades)}
+
+@router.post("/conteos/{sesion_id}/cerrar", response_model=dict)
+async def cerrar_conteo(sesion_id: int, data: ConteoCierreIn):
+    """
+    Aplica el conteo: el inventario de cada producto contado queda igual a
+    la suma de todos los dispositivos. Lo que no se contó no se toca.
+    Las diferencias salen de un solo UPDATE (fijar_stock) y los ajustes e
+    historial se escriben en bloque.
+    """
+    query_contado = select(
+        conteo_detalle.c.producto_id,
+        func.sum(conteo_detalle.c.cantidad).label("cantidad")
+    ).where(conteo_detalle.c.sesion_id == sesion_id).group_by(conteo_detalle.c.producto_id)
+    
+    async with database.transaction():
+        sesion = await _sesion_abierta(sesion_id, "update")
+        contado = {r["producto_id"]: float(r["cantidad"]) for r in await database.fetch_all(query_contado)}
+        
+        ahora = datetime.now(timezone.utc)
+        movs = await fijar_stock(sesion["sucursal_id"], contado, ahora)
+        motivo = sesion["motivo"] or f"Conteo físico #{sesion_id}"
+        
+        # Un ajuste por producto contado (evidencia, aunque cuadre) ...
+        if movs:
+            await database.execute(ajuste_inventario.insert().values([
+                {
+                    "sucursal_id": sesion["sucursal_id"], "usuario_id": data.usuario_id,
+                    "producto_id": pid, "fecha": ahora,
+                    "cantidad_sistema": anterior, "cantidad_fisica": nueva,
+                    "diferencia": nueva - anterior, "motivo": motivo
+                }
+                for pid, (anterior, nueva) in movs.items()
+            ]))
+        
+        # ... y movimiento en el historial solo donde cambió algo
+        cambios = {pid: (a, n) for pid, (a, n) in movs.items() if n != a}
+        if cambios:
+            await database.execute(historial_inventario.insert().values([
+                {
+                    "fecha": ahora, "sucursal_id": sesion["sucursal_id"], "usuario_id": data.usuario_id,
+                    "producto_id": pid, "tipo_movimiento": "AJUSTE_AUDITORIA",
+                    "cantidad_anterior": anterior, "cantidad_movida": nueva - anterior,
+                    "cantidad_nueva": nueva, "motivo": motivo
+                }
+                for pid, (anterior, nueva) in cambios.items()
+            ]))
+        
+        await database.execute(
+            conteo_sesion.update().where(conteo_sesion.c.id == sesion_id).values(
+                estado="CERRADO", fecha_cierre=ahora
+            )
+        )
+    
+    diferencias = [n - a for a, n in cambios.values()]
+    return {
+        "id": sesion_id,
+        "productos_contados": len(movs),
+        "productos_con_diferencia": len(cambios),
+        "merma": sum(d for d in diferencias if d < 0),
+        "sobrante": sum(d for d in diferencias if d > 0),
+        "fecha_cierre": ahora
+    }
+
+@router.delete("/conteos/{sesion_id}")
+async def cancelar_conteo(sesion_id: int):
+    """Descarta el conteo sin tocar el inventario."""
+    async with database.transaction():
+        await _sesion_abierta(sesion_id, "update")
+        await database.execute(
+            conteo_sesion.update().where(conteo_sesion.c.id == sesion_id).values(
+                estado="CANCELADO", fecha_cierre=datetime.now(timezone.utc)
+            )
+        )
+    return {"mensaje": "Conteo cancelado"}
 
 @router.get("/historial", response_model=List[HistorialInventario])
-async def ver_historial(producto_id: int):
-    """Ver todos los movimientos de un producto específico"""
+async def ver_historial(
+    response: Response,
+    producto_id: Optional[int] = None,
+    sucursal_id: Optional[int] = None,
+    desde: Optional[datetime] = Query(None, description="Por defecto, 30 días antes de `hasta`"),
+    hasta: Optional[datetime] = Query(None, description="Por defecto, ahora"),
+    limite: int = Query(100, ge=1, le=1000, description="Movimientos por página"),
+    cursor: Optional[str] = Query(None, description="Valor de X-Siguiente-Cursor de la página anterior")
+):
+    """
+    Movimientos de inventario, del más reciente al más viejo, dentro de un
+    rango de fechas (el historial está particionado por mes: el rango hace
+    que solo se lean los meses que tocan). Paginación por cursor sobre
+    (fecha, id) con el header X-Siguiente-Cursor, como GET /ventas/.
+    """
+    # Sin zona se toma como hora de la tienda
+    zona = ZoneInfo("America/Mexico_City")
+    hasta = hasta or datetime.now(timezone.utc)
+    if hasta.tzinfo is None:
+        hasta = hasta.replace(tzinfo=zona)
+    desde = desde or hasta - timedelta(days=30)
+    if desde.tzinfo is None:
+        desde = desde.replace(tzinfo=zona)
+    if desde > hasta:
+        raise HTTPException(400, "desde no puede ser posterior a hasta")
+
     query = historial_inventario.select().where(
-        historial_inventario.c.producto_id == producto_id
-    ).order_by(historial_inventario.c.fecha.desc())
-    
-    return await database.fetch_all(query)
\ No newline at end of file
+        (historial_inventario.c.fecha >= desde) & (historial_inventario.c.fecha <= hasta)
+    )
+    if producto_id:
+        query = query.where(historial_inventario.c.producto_id == producto_id)
+    if sucursal_id:
+        query = query.where(historial_inventario.c.sucursal_id == sucursal_id)
+    if cursor:
+        cursor_fecha, cursor_id = decodificar_cursor(cursor)
+        query = query.where(
+            tuple_(historial_inventario.c.fecha, historial_inventario.c.id) < tuple_(cursor_fecha, cursor_id)
+        )
+    query = query.order_by(desc(historial_inventario.c.fecha), desc(historial_inventario.c.id))
+
+    # Uno de más para saber si hay otra página
+    registros = await database.fetch_all(query.limit(limite + 1))
+    if len(registros) > limite:
+        registros = registros[:limite]
+        ultimo = registros[-1]
+        response.headers["X-Siguiente-Cursor"] = codificar_cursor(ultimo["fecha"], ultimo["id"])
+    return registros
\ No newline at end of file
@@ -2,7 +2,7 @@ from fastapi import APIRouter, HTTPException, status, Depends
 from fastapi.security import OAuth2PasswordRequestForm
 from database import database
 from models import usuario
-from security import verificar_password, crear_token_acceso
+from security import verificar_password_async, crear_token_acceso
 from sqlalchemy import select
 
 router = APIRouter(tags=["Autenticación"])
@@ -14,7 +14,7 @@ async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(
     user_db = await database.fetch_one(query)
     
     # 2. Validar si existe y si la contraseña coincide
-    if not user_db or not verificar_password(form_data.password, user_db["contrasena_hash"]):
+    if not user_db or not await verificar_password_async(form_data.password, user_db["contrasena_hash"]):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Usuario o contraseña incorrectos",
@@ -1,12 +1,13 @@
 # routers/categorias.py
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request
 from typing import List
 
 # --- Importaciones del proyecto ---
 from models import categoria, subcategoria
 from schemas import CategoriaIn, Categoria, SubcategoriaIn, Subcategoria
 from database import database
+from servicios.catalogo import cache_catalogo, responder_catalogo
 
 # --- Router para Categorías ---
 router = APIRouter(
@@ -15,9 +16,9 @@ router = APIRouter(
 )
 
 @router.get("/", response_model=List[Categoria])
-async def obtener_categorias():
+async def obtener_categorias(request: Request):
     query = categoria.select()
-    return await database.fetch_all(query)
+    return await responder_catalogo(request, "categorias", (), Categoria, lambda: database.fetch_all(query))
 
 @router.get("/{id}", response_model=Categoria)
 async def obtener_categoria(id: int):
@@ -31,12 +32,14 @@ async def obtener_categoria(id: int):
 async def crear_categoria(cat: CategoriaIn):
     query = categoria.insert().values(**cat.model_dump())
     last_id = await database.execute(query)
+    cache_catalogo.invalidar("categorias")
     return {**cat.model_dump(), "id": last_id}
 
 @router.put("/{id}", response_model=Categoria)
 async def actualizar_categoria(id: int, cat: CategoriaIn):
     query = categoria.update().where(categoria.c.id == id).values(**cat.model_dump())
     result = await database.execute(query)
+    cache_catalogo.invalidar("categorias")
     if result == 0:
         raise HTTPException(status_code=404, detail="Categoría no encontrada")
     return {**cat.model_dump(), "id": id}
@@ -45,6 +48,7 @@ async def actualizar_categoria(id: int, cat: CategoriaIn):
 async def eliminar_categoria(id: int):
     query = categoria.delete().where(categoria.c.id == id)
     result = await database.execute(query)
+    cache_catalogo.invalidar("categorias", "subcategorias") # Sus subcategorías se borran en cascada
     if result == 0:
         raise HTTPException(status_code=404, detail="Categoría no encontrada")
     return {"mensaje": "Categoría eliminada"}
@@ -52,9 +56,9 @@ async def eliminar_categoria(id: int):
 # --- Endpoints de Subcategorías (usando el mismo router) ---
 
 @router.get("/subcategorias/", response_model=List[Subcategoria])
-async def obtener_subcategorias():
+async def obtener_subcategorias(request: Request):
     query = subcategoria.select()
-    return await database.fetch_all(query)
+    return await responder_catalogo(request, "subcategorias", (), Subcategoria, lambda: database.fetch_all(query))
 
 @router.get("/subcategorias/{id}", response_model=Subcategoria)
 async def obtener_subcategoria(id: int):
@@ -68,12 +72,14 @@ async def obtener_subcategoria(id: int):
 async def crear_subcategoria(subcat: SubcategoriaIn):
     query = subcategoria.insert().values(**subcat.model_dump())
     last_id = await database.execute(query)
+    cache_catalogo.invalidar("subcategorias")
     return {**subcat.model_dump(), "id": last_id}
 
 @router.put("/subcategorias/{id}", response_model=Subcategoria)
 async def actualizar_subcategoria(id: int, subcat: SubcategoriaIn):
     query = subcategoria.update().where(subcategoria.c.id == id).values(**subcat.model_dump())
     result = await database.execute(query)
+    cache_catalogo.invalidar("subcategorias")
     if result == 0:
         raise HTTPException(status_code=404, detail="Subcategoría no encontrada")
     return {**subcat.model_dump(), "id": id}
@@ -82,6 +88,7 @@ async def actualizar_subcategoria(id: int, subcat: SubcategoriaIn):
 async def eliminar_subcategoria(id: int):
     query = subcategoria.delete().where(subcategoria.c.id == id)
     result = await database.execute(query)
+    cache_catalogo.invalidar("subcategorias")
     if result == 0:
         raise HTTPException(status_code=404, detail="Subcategoría no encontrada")
     return {"mensaje": "Subcategoría eliminada"}
\ No newline at end of file
@@ -7,6 +7,7 @@ from typing import List
 from models import cliente
 from schemas import ClienteIn, Cliente
 from database import database
+from servicios.descuentos import motor_descuentos
 
 router = APIRouter(
     prefix="/clientes",
@@ -44,6 +45,7 @@ async def actualizar_cliente(id: int, c: ClienteIn):
 async def eliminar_cliente(id: int):
     query = cliente.delete().where(cliente.c.id == id)
     result = await database.execute(query)
+    motor_descuentos.invalidar() # Sus reglas se borran en cascada
     if result == 0:
         raise HTTPException(status_code=404, detail="Cliente no encontrado")
     return {"mensaje": "Cliente eliminado"}
\ No newline at end of file
@@ -2,10 +2,11 @@ from fastapi import APIRouter, HTTPException
 from typing import List, Optional
 from pydantic import BaseModel
 from datetime import datetime, timezone
-from sqlalchemy import select, update, func
+from sqlalchemy import select, update
 
 from database import database, fecha_local_iso
-from models import corte_caja, venta, usuario
+from models import corte_caja, usuario
+from servicios.kpis import kpis
 
 router = APIRouter(
     prefix="/corte",
@@ -59,6 +60,7 @@ async def abrir_caja(data: AperturaCajaReq):
         efectivo_esperado=data.fondo_inicial # Al inicio es igual al fondo
     )
     corte_id = await database.execute(query)
+    kpis.invalidar_cortes()
     
     return {
         "id": corte_id,
@@ -82,55 +84,50 @@ async def obtener_corte_actual(usuario_id: int):
     if not corte:
         raise HTTPException(404, "No hay turno abierto para este usuario")
         
-    # 2. Calcular ventas acumuladas
-    query_ventas = select(func.sum(venta.c.total)).where(venta.c.corte_caja_id == corte['id'])
-    total_ventas = await database.fetch_val(query_ventas) or 0.0
-    
-    esperado = float(corte['fondo_inicial']) + float(total_ventas)
-    
+    # 2. Los totales se acumulan con cada venta/cancelación, no hay que sumar nada
     return {
         "id": corte['id'],
         "fecha_apertura": fecha_local_iso(corte['fecha_apertura']),
         "fondo_inicial": corte['fondo_inicial'],
-        "ventas_totales": total_ventas,
-        "efectivo_esperado": esperado,
+        "ventas_totales": corte['ventas_totales'] or 0.0,
+        "efectivo_esperado": corte['efectivo_esperado'],
         "estado": "ABIERTO"
     }
 
 @router.post("/cerrar", response_model=CorteResponse)
 async def cerrar_caja(data: CierreCajaReq):
-    # 1. Obtener datos actuales
-    query = select(corte_caja).where(corte_caja.c.id == data.corte_id)
-    corte = await database.fetch_one(query)
-    if not corte:
-        raise HTTPException(404, "Corte no encontrado")
-    if corte['fecha_cierre'] is not None:
-        raise HTTPException(400, "Este corte ya está cerrado")
+    async with database.transaction():
+        # 1. Obtener datos actuales (bloqueando el corte para que no entren ventas a medio cierre)
+        query = select(corte_caja).where(corte_caja.c.id == data.corte_id).with_for_update()
+        corte = await database.fetch_one(query)
+        if not corte:
+            raise HTTPException(404, "Corte no encontrado")
+        if corte['fecha_cierre'] is not None:
+            raise HTTPException(400, "Este corte ya está cerrado")
 
-    # 2. Calcular totales finales
-    query_ventas = select(func.sum(venta.c.total)).where(venta.c.corte_caja_id == data.corte_id)
-    total_ventas = await database.fetch_val(query_ventas) or 0.0
+        # 2. Totales finales (acumulados por cada venta/cancelación del turno)
+        total_ventas = float(corte['ventas_totales'] or 0.0)
+        esperado = float(corte['fondo_inicial']) + total_ventas
+        diferencia = data.efectivo_real - esperado 
     
-    esperado = float(corte['fondo_inicial']) + float(total_ventas)
-    diferencia = data.efectivo_real - esperado 
+        fondo_siguiente = data.efectivo_real - data.monto_retirado
     
-    fondo_siguiente = data.efectivo_real - data.monto_retirado
+        fecha_cierre = datetime.now(timezone.utc)
     
-    fecha_cierre = datetime.now(timezone.utc)
-    
-    # 3. Actualizar DB (CORREGIDO: efectivo_real en lugar de efectivo_final_real)
-    upd_query = corte_caja.update().where(corte_caja.c.id == data.corte_id).values(
-        fecha_cierre=fecha_cierre,
-        ventas_totales=total_ventas,
-        efectivo_esperado=esperado,
-        efectivo_real=data.efectivo_real, # <--- AQUÍ ESTABA EL ERROR
-        diferencia=diferencia,
-        monto_retirado=data.monto_retirado,
-        fondo_siguiente=fondo_siguiente,
-        comentarios=data.comentarios
-    )
-    await database.execute(upd_query)
+        # 3. Actualizar DB (CORREGIDO: efectivo_real en lugar de efectivo_final_real)
+        upd_query = corte_caja.update().where(corte_caja.c.id == data.corte_id).values(
+            fecha_cierre=fecha_cierre,
+            ventas_totales=total_ventas,
+            efectivo_esperado=esperado,
+            efectivo_real=data.efectivo_real, # <--- AQUÍ ESTABA EL ERROR
+            diferencia=diferencia,
+            monto_retirado=data.monto_retirado,
+            fondo_siguiente=fondo_siguiente,
+            comentarios=data.comentarios
+        )
+        await database.execute(upd_query)
     
+    kpis.invalidar_cortes()
     return {
         "id": data.corte_id,
         "fecha_apertura": fecha_local_iso(corte['fecha_apertura']),
@@ -3,6 +3,7 @@ from typing import List
 from models import regla_descuento
 from schemas import ReglaDescuentoIn, ReglaDescuento
 from database import database
+from servicios.descuentos import motor_descuentos
 
 router = APIRouter(
     prefix="/descuentos",
@@ -18,12 +19,14 @@ async def listar_reglas():
 async def crear_regla(regla: ReglaDescuentoIn):
     query = regla_descuento.insert().values(**regla.model_dump())
     last_id = await database.execute(query)
+    motor_descuentos.invalidar()
     return {**regla.model_dump(), "id": last_id}
 
 @router.delete("/{id}")
 async def eliminar_regla(id: int):
     query = regla_descuento.delete().where(regla_descuento.c.id == id)
     result = await database.execute(query)
+    motor_descuentos.invalidar()
     if result == 0:
         raise HTTPException(status_code=404, detail="Regla no encontrada")
     return {"mensaje": "Regla eliminada"}
\ No newline at end of file
@@ -1,58 +1,127 @@
 from fastapi import APIRouter
-from typing import List
-from datetime import date, datetime, timezone
+from typing import List, Optional
+from datetime import date, datetime, time, timedelta
+from zoneinfo import ZoneInfo
 from sqlalchemy import select, func, and_, desc
 from database import database
 # 👇 AQUÍ FALTABA 'inventario'
-from models import venta, venta_detalle, producto, inventario
+from models import venta, producto, inventario, venta_resumen_diario, venta_producto_diario
+from servicios.resumen_ventas import ZONA_LOCAL, totales
+from servicios.snapshots import stock_al_momento
+from servicios.analitica import analitica_ventas
+from servicios.trabajos import cola_trabajos
 
 router = APIRouter(
     prefix="/informes",
     tags=["Informes y Reportes"]
 )
 
+def _hoy_local() -> date:
+    return datetime.now(ZoneInfo(ZONA_LOCAL)).date()
+
 @router.get("/ventas-dia")
-async def reporte_ventas_dia(sucursal_id: int, fecha: date = None):
+@cola_trabajos.registrar("informes.ventas-dia")
+async def reporte_ventas_dia(sucursal_id: int, fecha: date = None, incluir_ventas: bool = False):
+    """Total del día (hora local) desde el resumen. `incluir_ventas` agrega la lista de tickets."""
     if not fecha:
-        fecha = datetime.now(timezone.utc).date()
-    
-    inicio = datetime.combine(fecha, datetime.min.time())
-    fin = datetime.combine(fecha, datetime.max.time())
+        fecha = _hoy_local()
     
-    query = select(func.sum(venta.c.total)).where(
+    query = select(
+        venta_resumen_diario.c.hora,
+        venta_resumen_diario.c.total_vendido,
+        venta_resumen_diario.c.transacciones
+    ).where(
         and_(
-            venta.c.sucursal_id == sucursal_id,
-            venta.c.fecha >= inicio,
-            venta.c.fecha <= fin
+            venta_resumen_diario.c.sucursal_id == sucursal_id,
+            venta_resumen_diario.c.fecha_local == fecha
         )
-    )
-    total = await database.fetch_val(query) or 0.0
+    ).order_by(venta_resumen_diario.c.hora)
+    por_hora = await database.fetch_all(query)
     
-    query_list = select(venta).where(
-        and_(
-            venta.c.sucursal_id == sucursal_id,
-            venta.c.fecha >= inicio,
-            venta.c.fecha <= fin
-        )
-    )
-    lista = await database.fetch_all(query_list)
+    reporte = {
+        "fecha": fecha,
+        "sucursal_id": sucursal_id,
+        "total_vendido": sum(float(h["total_vendido"]) for h in por_hora),
+        "cantidad_transacciones": sum(h["transacciones"] for h in por_hora),
+        "por_hora": [dict(h) for h in por_hora]
+    }
+    
+    if incluir_ventas:
+        # Límites del día local sobre la columna: usa ix_venta_sucursal_fecha y solo lee su partición
+        zona = ZoneInfo(ZONA_LOCAL)
+        inicio = datetime.combine(fecha, time.min, tzinfo=zona)
+        fin = datetime.combine(fecha + timedelta(days=1), time.min, tzinfo=zona)
+        query_list = select(venta).where(
+            and_(
+                venta.c.sucursal_id == sucursal_id,
+                venta.c.fecha >= inicio,
+                venta.c.fecha < fin
+            )
+        ).order_by(venta.c.fecha)
+        reporte["ventas"] = await database.fetch_all(query_list)
     
+    return reporte
+
+async def _reporte_periodo(sucursal_id: int, desde: date, hasta: date):
+    dias = await totales(sucursal_id, desde, hasta)
     return {
-        "fecha": fecha,
         "sucursal_id": sucursal_id,
-        "total_vendido": total,
-        "cantidad_transacciones": len(lista),
-        "ventas": lista
+        "desde": desde,
+        "hasta": hasta,
+        "total_vendido": sum(float(d["total_vendido"]) for d in dias),
+        "cantidad_transacciones": sum(d["cantidad_transacciones"] for d in dias),
+        "por_dia": [dict(d) for d in dias]
     }
 
+@router.get("/ventas-semana")
+@cola_trabajos.registrar("informes.ventas-semana")
+async def reporte_ventas_semana(sucursal_id: int, fecha: date = None):
+    """Semana (lunes a domingo) que contiene `fecha`."""
+    fecha = fecha or _hoy_local()
+    inicio = fecha - timedelta(days=fecha.weekday())
+    return await _reporte_periodo(sucursal_id, inicio, inicio + timedelta(days=6))
+
+@router.get("/ventas-mes")
+@cola_trabajos.registrar("informes.ventas-mes")
+async def reporte_ventas_mes(sucursal_id: int, fecha: date = None):
+    """Mes calendario que contiene `fecha`."""
+    fecha = fecha or _hoy_local()
+    inicio = fecha.replace(day=1)
+    fin = (inicio + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+    return await _reporte_periodo(sucursal_id, inicio, fin)
+
 @router.get("/productos-mas-vendidos")
-async def productos_top(limit: int = 5):
+@cola_trabajos.registrar("informes.productos-mas-vendidos")
+async def productos_top(
+    limit: int = 5,
+    desde: date = None,
+    hasta: date = None,
+    sucursal_id: Optional[int] = None
+):
+    """
+    Top de productos por cantidad vendida, desde el agregado diario.
+    Sin fechas toma los últimos 30 días. El agregado se refresca en segundo
+    plano, así que lo de los últimos minutos puede tardar en aparecer.
+    """
+    hasta = hasta or _hoy_local()
+    desde = desde or hasta - timedelta(days=29)
+    
+    filtros = [
+        venta_producto_diario.c.fecha_local >= desde,
+        venta_producto_diario.c.fecha_local <= hasta
+    ]
+    if sucursal_id is not None:
+        filtros.append(venta_producto_diario.c.sucursal_id == sucursal_id)
+    
     query = select(
+        producto.c.id.label("producto_id"),
         producto.c.nombre,
-        func.sum(venta_detalle.c.cantidad).label("total_cantidad"),
-        func.sum(venta_detalle.c.cantidad * venta_detalle.c.precio_unitario).label("total_dinero")
+        func.sum(venta_producto_diario.c.cantidad).label("total_cantidad"),
+        func.sum(venta_producto_diario.c.ingreso).label("total_dinero")
     ).select_from(
-        venta_detalle.join(producto)
+        venta_producto_diario.join(producto)
+    ).where(
+        and_(*filtros)
     ).group_by(
         producto.c.id
     ).order_by(desc("total_cantidad")).limit(limit)
@@ -60,6 +129,7 @@ async def productos_top(limit: int = 5):
     return await database.fetch_all(query)
 
 @router.get("/stock-bajo")
+@cola_trabajos.registrar("informes.stock-bajo")
 async def alerta_stock_bajo(sucursal_id: int):
     query = select(
         producto.c.nombre,
@@ -76,4 +146,44 @@ async def alerta_stock_bajo(sucursal_id: int):
         )
     ).order_by(inventario.c.cantidad)
     
-    return await database.fetch_all(query)
\ No newline at end of file
+    return await database.fetch_all(query)
+
+@router.get("/inventario-valorizado")
+@cola_trabajos.registrar("informes.inventario-valorizado")
+async def inventario_valorizado(sucursal_id: int, fecha: datetime = None, producto_id: Optional[int] = None):
+    """
+    Stock y valor a precio_base de la sucursal en `fecha` (sin zona = hora
+    local; sin fecha = ahora). Sale de la foto nocturna más reciente
+    (inventario_snapshot) más los movimientos desde su cierre.
+    """
+    zona = ZoneInfo(ZONA_LOCAL)
+    fecha = fecha or datetime.now(zona)
+    if fecha.tzinfo is None:
+        fecha = fecha.replace(tzinfo=zona)
+    
+    foto, productos = await stock_al_momento(sucursal_id, fecha, producto_id)
+    return {
+        "sucursal_id": sucursal_id,
+        "fecha": fecha,
+        "foto_base": foto,
+        "valor_total": sum(float(p["valor"] or 0) for p in productos),
+        "productos": [dict(p) for p in productos]
+    }
+
+@router.get("/analitica")
+@cola_trabajos.registrar("informes.analitica")
+async def analitica(
+    desde: date = None,
+    hasta: date = None,
+    sucursal_id: Optional[int] = None,
+    limit: Optional[int] = None
+):
+    """
+    ABC por ingreso, velocidad de venta, sell-through, días de cobertura y
+    fuga por descuentos por producto. Sin fechas toma los últimos 90 días.
+    Lee el detalle completo del rango: para rangos largos conviene correrlo
+    como trabajo (POST /trabajos/ con tipo "informes.analitica").
+    """
+    hasta = hasta or _hoy_local()
+    desde = desde or hasta - timedelta(days=89)
+    return await analitica_ventas(desde, hasta, sucursal_id, limit)
@@ -0,0 +1,167 @@
+# routers/interno.py
+#
+# Endpoints de operación (no son para el POS). Solo responden a las IPs de
+# INTERNO_IPS; por defecto, la misma máquina.
+
+import os
+from collections import defaultdict
+
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+
+from database import database
+from servicios.metricas import metricas_rutas, CUBETAS_MS
+from servicios.kpis import kpis, monitor_loop
+from servicios.trabajos import cola_trabajos
+
+INTERNO_IPS = {ip.strip() for ip in os.getenv("INTERNO_IPS", "127.0.0.1,::1").split(",") if ip.strip()}
+
+
+def solo_interno(request: Request):
+    if "*" in INTERNO_IPS:
+        return
+    if request.client is None or request.client.host not in INTERNO_IPS:
+        raise HTTPException(status_code=403, detail="Solo disponible desde la red interna")
+
+
+router = APIRouter(
+    prefix="/interno",
+    tags=["Interno"],
+    dependencies=[Depends(solo_interno)]
+)
+
+# /metrics va en la raíz, que es donde lo busca Prometheus
+router_metrics = APIRouter(
+    tags=["Interno"],
+    dependencies=[Depends(solo_interno)]
+)
+
+@router.get("/pool")
+async def metricas_pool():
+    """
+    Estado del pool de conexiones de este worker: abiertas, en uso, libres,
+    requests esperando una conexión y cuánto esperaron (p50/p95/p99).
+    Si 'esperando' o la p99 suben en hora pico, hay que subir POOL_MAX
+    (sin pasar el max_connections de PostgreSQL entre todos los workers).
+    """
+    return database.metricas_pool()
+
+@router.get("/rutas")
+async def metricas_por_ruta():
+    """
+    Por ruta: requests, latencia y tiempo en base promedio, consultas por
+    request (promedio, máximo e histograma) y la consulta más lenta vista.
+    Ordenado por consultas promedio: un N+1 aparece arriba.
+    """
+    return metricas_rutas.resumen()
+
+
+class _Exposicion:
+    """Arma el formato de texto de Prometheus (0.0.4)."""
+
+    def __init__(self):
+        self.lineas = []
+
+    def metrica(self, nombre, tipo, ayuda, muestras):
+        self.lineas.append(f"# HELP {nombre} {ayuda}")
+        self.lineas.append(f"# TYPE {nombre} {tipo}")
+        for sufijo, etiquetas, valor in muestras:
+            if etiquetas:
+                texto = ",".join(f'{k}="{v}"' for k, v in etiquetas.items())
+                self.lineas.append(f"{nombre}{sufijo}{{{texto}}} {valor}")
+            else:
+                self.lineas.append(f"{nombre}{sufijo} {valor}")
+
+    def texto(self):
+        return "\n".join(self.lineas) + "\n"
+
+
+def _por_sucursal(valores):
+    return [("", {"sucursal_id": s}, v) for s, v in sorted(valores.items())]
+
+
+@router_metrics.get("/metrics", include_in_schema=False)
+async def metrics():
+    """
+    Para Prometheus (scrape cada 15 s). Todo sale de memoria: histogramas por
+    router del middleware, retraso del event loop, pool y contadores de
+    negocio. No se hace ninguna consulta a la base.
+    """
+    exp = _Exposicion()
+
+    # 1. Latencia por router (se juntan las rutas de cada routers/*.py)
+    cubetas = defaultdict(lambda: [0] * (len(CUBETAS_MS) + 1))
+    suma, cuenta, errores, consultas, tiempo_db = (defaultdict(float) for _ in range(5))
+    for est in metricas_rutas.rutas().values():
+        for i, n in enumerate(est.cubetas_ms):
+            cubetas[est.router][i] += n
+        suma[est.router] += est.duracion_total_ms / 1000
+        cuenta[est.router] += est.requests
+        errores[est.router] += est.errores
+        consultas[est.router] += est.consultas_total
+        tiempo_db[est.router] += est.db_total_ms / 1000
+
+    muestras = []
+    for router_, conteos in sorted(cubetas.items()):
+        acumulado = 0
+        for limite, n in zip(CUBETAS_MS + ["+Inf"], conteos):
+            acumulado += n
+            le = "+Inf" if limite == "+Inf" else f"{limite / 1000:g}"
+            muestras.append(("_bucket", {"router": router_, "le": le}, acumulado))
+        muestras.append(("_sum", {"router": router_}, round(suma[router_], 6)))
+        muestras.append(("_count", {"router": router_}, int(cuenta[router_])))
+    exp.metrica("pp_http_request_duration_seconds", "histogram",
+                "Latencia de los requests por router", muestras)
+    exp.metrica("pp_http_errores_total", "counter", "Respuestas 5xx por router",
+                [("", {"router": r}, int(v)) for r, v in sorted(errores.items())])
+    exp.metrica("pp_db_consultas_total", "counter", "Consultas a la base por router",
+                [("", {"router": r}, int(v)) for r, v in sorted(consultas.items())])
+    exp.metrica("pp_db_tiempo_segundos_total", "counter", "Tiempo en la base por router",
+                [("", {"router": r}, round(v, 6)) for r, v in sorted(tiempo_db.items())])
+
+    # 2. Event loop
+    exp.metrica("pp_event_loop_lag_segundos", "gauge", "Retraso de la última medición del event loop",
+                [("", {}, round(monitor_loop.ultimo, 6))])
+    exp.metrica("pp_event_loop_lag_max_segundos", "gauge", "Mayor retraso del event loop desde el arranque",
+                [("", {}, round(monitor_loop.maximo, 6))])
+    exp.metrica("pp_event_loop_lag_segundos_total", "counter", "Suma de los retrasos medidos (con _muestras da el promedio)",
+                [("", {}, round(monitor_loop.suma, 6))])
+    exp.metrica("pp_event_loop_muestras_total", "counter", "Mediciones del event loop",
+                [("", {}, monitor_loop.muestras)])
+
+    # 3. Pool de conexiones
+    pool = database.metricas_pool()
+    if pool.get("conectado"):
+        for clave, ayuda in [("max", "Tamaño máximo del pool"), ("abiertas", "Conexiones abiertas"),
+                             ("en_uso", "Conexiones prestadas"), ("libres", "Conexiones libres"),
+                             ("esperando", "Requests esperando conexión")]:
+            exp.metrica(f"pp_pool_{clave}", "gauge", ayuda, [("", {}, pool[clave])])
+        exp.metrica("pp_pool_adquisiciones_total", "counter", "Conexiones pedidas al pool",
+                    [("", {}, pool["adquisiciones"])])
+        exp.metrica("pp_pool_agotado_total", "counter", "Esperas que vencieron POOL_ESPERA_MAX",
+                    [("", {}, pool["agotados"])])
+        exp.metrica("pp_pool_espera_segundos_total", "counter", "Tiempo total esperando conexión",
+                    [("", {}, pool["espera_total_s"])])
+
+    # 4. Negocio
+    exp.metrica("pp_ventas_total", "counter", "Ventas registradas", _por_sucursal(kpis.ventas))
+    exp.metrica("pp_ventas_monto_total", "counter", "Pesos vendidos",
+                _por_sucursal({k: round(v, 2) for k, v in kpis.ventas_monto.items()}))
+    exp.metrica("pp_cancelaciones_total", "counter", "Ventas canceladas", _por_sucursal(kpis.cancelaciones))
+    exp.metrica("pp_cancelaciones_monto_total", "counter", "Pesos cancelados",
+                _por_sucursal({k: round(v, 2) for k, v in kpis.cancelaciones_monto.items()}))
+    exp.metrica("pp_agotados_total", "counter", "Productos que una venta dejó sin stock",
+                _por_sucursal(kpis.agotados))
+    if pool.get("conectado"):
+        exp.metrica("pp_cortes_abiertos", "gauge",
+                    "Turnos de caja abiertos (de la base: todos los workers reportan el mismo valor, agregar con max)",
+                    _por_sucursal(await kpis.cortes_abiertos()))
+
+    # 5. Trabajos en segundo plano
+    cola = cola_trabajos.resumen()
+    exp.metrica("pp_trabajos_en_cola", "gauge", "Trabajos esperando worker", [("", {}, cola["en_cola"])])
+    exp.metrica("pp_trabajos_en_curso", "gauge", "Trabajos corriendo", [("", {}, cola["en_curso"])])
+    exp.metrica("pp_trabajos_terminados_total", "counter", "Trabajos terminados", [("", {}, cola["terminados"])])
+    exp.metrica("pp_trabajos_fallidos_total", "counter", "Trabajos con error o tiempo agotado",
+                [("", {}, cola["fallidos"])])
+
+    return Response(content=exp.texto(), media_type="text/plain; version=0.0.4; charset=utf-8")
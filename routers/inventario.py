@@ -3,12 +3,15 @@
 from fastapi import APIRouter, HTTPException, Query
 from typing import Optional, List
 from datetime import datetime, timezone, timedelta
-from sqlalchemy import select, update, func
+from zoneinfo import ZoneInfo
+from sqlalchemy import select, update, func, Integer, Numeric
 
 # --- Importaciones del proyecto ---
 from models import inventario, ingreso_inventario, producto, sucursal
-from schemas import InventarioIn, Inventario, IngresoInventarioIn, IngresoInventario
-from database import database, fecha_local_iso, fecha_local_iso_simple
+from schemas import InventarioIn, Inventario, IngresoInventarioIn, IngresoInventario, IngresoInventarioLoteIn
+from database import database, fecha_local_iso, fecha_local_iso_simple, tabla_valores
+from servicios.stock import mover_stock, fijar_stock
+from servicios.snapshots import stock_al_momento
 
 router = APIRouter(
     tags=["Inventario"]
@@ -30,6 +33,33 @@ async def obtener_inventario(
     registros = await database.fetch_all(query)
     return [Inventario.from_orm(r) for r in registros]
 
+@router.get("/inventario/al-momento")
+async def inventario_al_momento(
+    sucursal_id: int,
+    fecha: datetime = Query(..., description="Fecha y hora (sin zona = hora de CDMX)"),
+    producto_id: Optional[int] = None
+):
+    """
+    Stock que había en la sucursal en un momento dado: la foto nocturna del
+    día anterior (inventario_snapshot) más el último movimiento de cada
+    producto desde entonces, así que solo se lee un día de historial. Los
+    productos sin foto ni movimientos hasta esa fecha no aparecen.
+    ultimo_movimiento es la fecha de ese movimiento; es null si el producto no
+    se movió desde la foto (la foto no guarda la fecha de su último movimiento).
+    Con valuación: GET /informes/inventario-valorizado.
+    """
+    if fecha.tzinfo is None:
+        fecha = fecha.replace(tzinfo=ZoneInfo("America/Mexico_City"))
+    
+    _, registros = await stock_al_momento(sucursal_id, fecha, producto_id)
+    return [
+        {
+            "producto_id": r["producto_id"], "nombre": r["nombre"], "cantidad": r["cantidad"],
+            "ultimo_movimiento": r["ultimo_movimiento"]
+        }
+        for r in registros
+    ]
+
 @router.get("/inventario/{id}", response_model=Inventario)
 async def obtener_inventario_id(id: int):
     query = inventario.select().where(inventario.c.id == id)
@@ -40,94 +70,93 @@ async def obtener_inventario_id(id: int):
 
 @router.post("/inventario", response_model=Inventario)
 async def crear_inventario(item: InventarioIn):
-    query = inventario.insert().values(**item.model_dump())
-    last_id = await database.execute(query)
-    query_get = inventario.select().where(inventario.c.id == last_id)
-    created = await database.fetch_one(query_get)
+    """Suma `cantidad` al stock del producto en la sucursal (crea el registro si no existe)."""
+    async with database.transaction():
+        await mover_stock(
+            item.sucursal_id, {item.producto_id: item.cantidad},
+            tipo_movimiento="AJUSTE_MANUAL",
+            usuario_id=item.usuario_id,
+            motivo=item.motivo or "Alta manual de inventario"
+        )
+        created = await database.fetch_one(
+            inventario.select().where(
+                (inventario.c.producto_id == item.producto_id) &
+                (inventario.c.sucursal_id == item.sucursal_id)
+            )
+        )
     return Inventario.from_orm(created)
 
+async def _registro_inventario(id: int):
+    r = await database.fetch_one(inventario.select().where(inventario.c.id == id).with_for_update())
+    if r is None:
+        raise HTTPException(status_code=404, detail="Inventario no encontrado")
+    return r
+
 @router.put("/inventario/{id}", response_model=Inventario)
 async def actualizar_inventario(id: int, item: InventarioIn):
-    query = inventario.update().where(inventario.c.id == id).values(
-        **item.model_dump(),
-        fecha_actualizacion=datetime.now(timezone.utc)
-    )
-    result = await database.execute(query)
-    if result == 0:
-        raise HTTPException(status_code=404, detail="Inventario no encontrado")
-    query_get = inventario.select().where(inventario.c.id == id)
-    updated = await database.fetch_one(query_get)
+    """Fija la cantidad del registro; el producto y la sucursal no se pueden cambiar."""
+    async with database.transaction():
+        r = await _registro_inventario(id)
+        if (r["producto_id"], r["sucursal_id"]) != (item.producto_id, item.sucursal_id):
+            raise HTTPException(status_code=400, detail="No se puede cambiar el producto ni la sucursal del registro")
+        await fijar_stock(
+            item.sucursal_id, {item.producto_id: item.cantidad},
+            tipo_movimiento="AJUSTE_MANUAL",
+            usuario_id=item.usuario_id,
+            motivo=item.motivo or "Corrección manual de inventario"
+        )
+        updated = await database.fetch_one(inventario.select().where(inventario.c.id == id))
     return Inventario.from_orm(updated)
 
 @router.delete("/inventario/{id}")
-async def eliminar_inventario(id: int):
-    query = inventario.delete().where(inventario.c.id == id)
-    result = await database.execute(query)
-    if result == 0:
-        raise HTTPException(status_code=404, detail="Inventario no encontrado")
+async def eliminar_inventario(id: int, usuario_id: int, motivo: Optional[str] = None):
+    """Deja el stock en 0 (con su movimiento en el historial) y borra el registro."""
+    async with database.transaction():
+        r = await _registro_inventario(id)
+        await fijar_stock(
+            r["sucursal_id"], {r["producto_id"]: 0},
+            tipo_movimiento="AJUSTE_MANUAL",
+            usuario_id=usuario_id,
+            motivo=motivo or "Registro de inventario eliminado"
+        )
+        await database.execute(inventario.delete().where(inventario.c.id == id))
     return {"mensaje": "Inventario eliminado"}
 
 # === INGRESO DE INVENTARIO (Lógica de Negocio) ===
 
 @router.post("/ingreso-inventario/", response_model=IngresoInventario)
 async def ingresar_inventario(data: IngresoInventarioIn):
+    async with database.transaction():
     
-    # 1. OBTENER EL PESO DEL BULTO
-    query_prod = select(producto).where(producto.c.id == data.producto_id)
-    prod_obj = await database.fetch_one(query_prod)
-    
-    if not prod_obj:
-        raise HTTPException(status_code=404, detail="Producto no encontrado")
-
-    # 2. CALCULAR KILOS REALES
-    # data.cantidad viene del frontend (ej: 5 bultos)
-    # contenido_neto es Decimal en DB, lo convertimos a float
-    contenido_neto = float(prod_obj["contenido_neto"])
-    kilos_reales = float(data.cantidad) * contenido_neto
-
-    # 3. ACTUALIZAR O CREAR INVENTARIO
-    query_inventario = select(inventario).where(
-        (inventario.c.producto_id == data.producto_id) &
-        (inventario.c.sucursal_id == data.sucursal_id)
-    )
-    result = await database.fetch_one(query_inventario)
-
-    if result:
-        # --- CORRECCIÓN CRÍTICA AQUÍ ---
-        # Convertimos result["cantidad"] (Decimal) a float antes de sumar
-        cantidad_actual = float(result["cantidad"])
-        nueva_cantidad = cantidad_actual + kilos_reales
+        # 1. OBTENER EL PESO DEL BULTO
+        query_prod = select(producto.c.contenido_neto).where(producto.c.id == data.producto_id)
+        prod_obj = await database.fetch_one(query_prod)
         
-        update_query = (
-            update(inventario)
-            .where(inventario.c.id == result["id"])
-            .values(
-                cantidad=nueva_cantidad,
-                fecha_actualizacion=datetime.now(timezone.utc)
-            )
+        if not prod_obj:
+            raise HTTPException(status_code=404, detail="Producto no encontrado")
+
+        # 2. CALCULAR KILOS REALES
+        # data.cantidad viene del frontend (ej: 5 bultos)
+        # contenido_neto es Decimal en DB, lo convertimos a float
+        contenido_neto = float(prod_obj["contenido_neto"])
+        kilos_reales = float(data.cantidad) * contenido_neto
+
+        # 3. SUMAR AL INVENTARIO (atómico: cantidad = cantidad + kilos)
+        await mover_stock(
+            data.sucursal_id, {data.producto_id: kilos_reales},
+            tipo_movimiento="COMPRA",
+            usuario_id=data.usuario_id,
+            motivo="Ingreso de mercancía"
         )
-        await database.execute(update_query)
-    else:   
-        # Crear nuevo registro
-        insert_inventario = inventario.insert().values(
+
+        # 4. REGISTRAR EL MOVIMIENTO
+        insert_ingreso = ingreso_inventario.insert().values(
             producto_id=data.producto_id,
             sucursal_id=data.sucursal_id,
-            cantidad=kilos_reales, 
-            fecha_actualizacion=datetime.now(timezone.utc)
-        )
-        await database.execute(insert_inventario)
-
-    # 4. REGISTRAR EL MOVIMIENTO
-    insert_ingreso = ingreso_inventario.insert().values(
-        producto_id=data.producto_id,
-        sucursal_id=data.sucursal_id,
-        cantidad=data.cantidad, # Guardamos "5 bultos" tal cual para el historial
-        usuario_id=data.usuario_id
-    )
-    id_insertado = await database.execute(insert_ingreso)
-
-    ingreso_query = ingreso_inventario.select().where(ingreso_inventario.c.id == id_insertado)
-    ingreso = await database.fetch_one(ingreso_query)
+            cantidad=data.cantidad, # Guardamos "5 bultos" tal cual para el historial
+            usuario_id=data.usuario_id
+        ).returning(*ingreso_inventario.c)
+        ingreso = await database.fetch_one(insert_ingreso)
     
     # Formatear fecha para respuesta
     ingreso_dict = dict(ingreso)
@@ -136,6 +165,62 @@ async def ingresar_inventario(data: IngresoInventarioIn):
     return IngresoInventario(**ingreso_dict)
 
 
+@router.post("/ingreso-inventario/lote", response_model=List[IngresoInventario])
+async def ingresar_inventario_lote(data: IngresoInventarioLoteIn):
+    """
+    Recepción de un pedido completo (todas las líneas del camión) en una
+    transacción: una consulta para pasar bultos a kilos, un upsert de
+    inventario y un insert de los ingresos, sin importar cuántas líneas traiga.
+    """
+    if not data.lineas:
+        raise HTTPException(status_code=400, detail="El ingreso no trae líneas")
+    
+    lineas = tabla_valores(
+        "lineas",
+        producto_id=(Integer, [l.producto_id for l in data.lineas]),
+        cantidad=(Numeric, [l.cantidad for l in data.lineas])
+    )
+    # 1. KILOS POR PRODUCTO (bultos * contenido_neto; líneas repetidas se suman)
+    query_kilos = select(
+        producto.c.id,
+        func.sum(lineas.c.cantidad * producto.c.contenido_neto).label("kilos")
+    ).select_from(
+        lineas.join(producto, producto.c.id == lineas.c.producto_id)
+    ).group_by(producto.c.id)
+    
+    ahora = datetime.now(timezone.utc)
+    async with database.transaction():
+        kilos = {r["id"]: float(r["kilos"]) for r in await database.fetch_all(query_kilos)}
+        faltantes = {l.producto_id for l in data.lineas} - kilos.keys()
+        if faltantes:
+            raise HTTPException(status_code=404, detail=f"Productos no encontrados: {sorted(faltantes)}")
+        
+        # 2. SUMAR AL INVENTARIO (un solo upsert para todo el pedido)
+        await mover_stock(
+            data.sucursal_id, kilos, ahora,
+            tipo_movimiento="COMPRA",
+            usuario_id=data.usuario_id,
+            motivo=f"Ingreso en lote ({len(data.lineas)} líneas)"
+        )
+        
+        # 3. REGISTRAR LOS MOVIMIENTOS (una fila por línea, en bultos, como el individual)
+        insert_ingresos = ingreso_inventario.insert().values([
+            {
+                "producto_id": l.producto_id,
+                "sucursal_id": data.sucursal_id,
+                "cantidad": l.cantidad,
+                "usuario_id": data.usuario_id,
+                "fecha_actualizacion": ahora
+            }
+            for l in data.lineas
+        ]).returning(*ingreso_inventario.c)
+        ingresos = await database.fetch_all(insert_ingresos)
+    
+    return [
+        IngresoInventario(**{**dict(r), "fecha_actualizacion": fecha_local_iso(r["fecha_actualizacion"])})
+        for r in ingresos
+    ]
+
 @router.get("/ingresos-inventario/")
 async def listar_ingresos_inventario(
     producto_id: Optional[int] = None,
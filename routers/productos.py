@@ -1,8 +1,15 @@
-from fastapi import APIRouter, HTTPException
+import asyncpg
+from fastapi import APIRouter, HTTPException, Request, Query
+from fastapi.responses import StreamingResponse
 from typing import List, Optional
-from models import producto
-from schemas import ProductoIn, Producto, ProductoUpdate
+from decimal import Decimal
+from sqlalchemy import select, func, or_, and_, desc, any_, case, cast, bindparam, Numeric
+from models import producto, marca
+from schemas import ProductoIn, Producto, ProductoUpdate, ProductoBusqueda, CambioPreciosIn
 from database import database
+from servicios.catalogo import cache_catalogo, responder_catalogo
+from servicios.codigos import indice_codigos
+from servicios import carga_productos
 
 router = APIRouter(
     prefix="/productos",
@@ -11,6 +18,7 @@ router = APIRouter(
 
 @router.get("/", response_model=List[Producto])
 async def obtener_productos(
+    request: Request,
     tipo: Optional[str] = None, # Filtro por tipo (Alimento, Accesorio...)
     mostrar_inactivos: bool = False # Filtro soft-delete
 ):
@@ -23,8 +31,131 @@ async def obtener_productos(
     # 2. Filtro por Tipo de Producto
     if tipo:
         query = query.where(producto.c.tipo_producto == tipo)
-        
-    return await database.fetch_all(query)
+    
+    # 3. Desde la caché de catálogos (ETag / 304)
+    return await responder_catalogo(
+        request, "productos", (tipo, mostrar_inactivos), Producto,
+        lambda: database.fetch_all(query)
+    )
+
+def construir_busqueda(q: str, limite: int, solo_activos: bool = True):
+    """
+    Búsqueda por nombre, SKU, código de barras y marca (índices pg_trgm).
+    Cada palabra tiene que aparecer en alguno de los campos; se ordena por
+    similitud del nombre (o de la marca) con el texto completo.
+    """
+    def coincide(palabra):
+        # % y _ que escribe el usuario son texto, no comodines
+        patron = "%" + palabra.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+        # La marca se resuelve a un ARRAY de ids (InitPlan) para que todo el OR
+        # quede sobre columnas indexadas de producto (BitmapOr)
+        marcas = select(marca.c.id).where(marca.c.nombre.ilike(patron, escape="\\")).correlate(None).scalar_subquery()
+        return or_(
+            producto.c.nombre.ilike(patron, escape="\\"),
+            producto.c.sku.ilike(patron, escape="\\"),
+            producto.c.codigo_barras.ilike(patron, escape="\\"),
+            producto.c.marca_id == any_(func.array(marcas))
+        )
+
+    filtros = [coincide(p) for p in q.split()]
+    if solo_activos:
+        filtros.append(producto.c.activo == True)
+
+    relevancia = func.greatest(
+        func.similarity(producto.c.nombre, q),
+        func.similarity(func.coalesce(marca.c.nombre, ""), q)
+    )
+    return select(
+        producto,
+        marca.c.nombre.label("marca_nombre"),
+        relevancia.label("relevancia")
+    ).select_from(
+        producto.outerjoin(marca)
+    ).where(
+        and_(*filtros)
+    ).order_by(desc("relevancia"), producto.c.nombre).limit(limite)
+
+@router.get("/buscar", response_model=List[ProductoBusqueda])
+async def buscar_productos(
+    q: str = Query(..., min_length=1, description="Nombre, SKU, código de barras o marca"),
+    limite: int = Query(20, ge=1, le=100),
+    solo_activos: bool = True
+):
+    q = q.strip()
+    if not q:
+        raise HTTPException(status_code=422, detail="La búsqueda no puede estar vacía")
+    
+    # 1. Camino rápido: código de barras o SKU exacto (lo que manda el escáner)
+    query_exacto = select(
+        producto, marca.c.nombre.label("marca_nombre")
+    ).select_from(
+        producto.outerjoin(marca)
+    ).where(
+        or_(producto.c.codigo_barras == q, producto.c.sku == q)
+    )
+    if solo_activos:
+        query_exacto = query_exacto.where(producto.c.activo == True)
+    exactos = await database.fetch_all(query_exacto)
+    if exactos:
+        return [{**dict(r), "relevancia": 1.0} for r in exactos]
+    
+    # 2. Búsqueda parcial con ranking
+    return await database.fetch_all(construir_busqueda(q, limite, solo_activos))
+
+@router.get("/barcode/{code}", response_model=Producto)
+async def obtener_por_codigo(code: str):
+    """Producto activo por código de barras o SKU, desde el índice en memoria."""
+    await indice_codigos.asegurar_cargado()
+    prod = indice_codigos.buscar(code)
+    if prod is None:
+        # Pudo darse de alta en otro worker: una consulta y queda en el índice
+        query = producto.select().where(
+            (producto.c.activo == True) &
+            or_(producto.c.codigo_barras == code, producto.c.sku == code)
+        ).order_by(desc(producto.c.id))
+        fila = await database.fetch_one(query)
+        if fila is None:
+            raise HTTPException(status_code=404, detail="Producto no encontrado")
+        prod = dict(fila)
+        indice_codigos.actualizar(prod)
+    return prod
+
+@router.post("/importar", response_model=dict)
+async def importar_productos(
+    request: Request,
+    formato: str = Query("csv", pattern="^(csv|ndjson)$")
+):
+    """
+    Carga masiva (p. ej. la lista de precios del proveedor). El cuerpo es el
+    archivo crudo: CSV con encabezado o NDJSON, con las columnas de ProductoIn.
+    Se cruza por SKU: los que existen se actualizan (solo las columnas que
+    trae el archivo) y los nuevos se dan de alta si vienen nombre y precio_base.
+    """
+    try:
+        if formato == "csv":
+            columnas, datos = await carga_productos.separar_encabezado_csv(request.stream())
+        else:
+            columnas, datos = await carga_productos.separar_encabezado_ndjson(request.stream())
+        resultado = await carga_productos.importar(columnas, datos)
+    except carga_productos.ArchivoInvalido as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except asyncpg.PostgresError as e:
+        # Tipos mal formados, FK inexistente, nombre vacío en un alta...
+        raise HTTPException(status_code=400, detail=f"Archivo rechazado: {e}")
+    
+    cache_catalogo.invalidar("productos")
+    await indice_codigos.cargar()
+    return resultado
+
+@router.get("/exportar")
+async def exportar_productos(formato: str = Query("csv", pattern="^(csv|ndjson)$")):
+    """Todo el catálogo en streaming, en el mismo formato que acepta /importar."""
+    if formato == "csv":
+        return StreamingResponse(
+            carga_productos.exportar_csv(), media_type="text/csv",
+            headers={"Content-Disposition": 'attachment; filename="productos.csv"'}
+        )
+    return StreamingResponse(carga_productos.exportar_ndjson(), media_type="application/x-ndjson")
 
 @router.get("/{id}", response_model=Producto)
 async def obtener_producto(id: int):
@@ -41,14 +172,57 @@ async def crear_producto(prod: ProductoIn):
     datos["activo"] = True 
     query = producto.insert().values(**datos)
     last_id = await database.execute(query)
+    cache_catalogo.invalidar("productos")
+    indice_codigos.actualizar({**datos, "id": last_id})
     return {**datos, "id": last_id}
 
+def precio_ajustado(columna, modo: str, valor):
+    """Precio nuevo de `columna` redondeado a centavos y sin bajar de cero; NULL se queda NULL."""
+    if modo == "porcentaje":
+        precio = columna * (1 + valor / 100)
+    else:
+        precio = columna + valor
+    # GREATEST ignora los NULL (greatest(NULL, 0) = 0): sin el CASE, un producto
+    # sin precio_granel quedaría vendiéndose suelto a $0
+    return case((columna.is_(None), None), else_=func.greatest(func.round(precio, 2), 0))
+
+@router.post("/precios", response_model=List[Producto])
+async def cambiar_precios(cambio: CambioPreciosIn):
+    """
+    Aumento / rebaja en lote (p. ej. cuando una marca sube precios): un solo
+    UPDATE sobre todos los productos del filtro, redondeado a centavos y sin
+    bajar de cero. Devuelve los productos ya con el precio nuevo.
+    """
+    valor = cast(bindparam("valor", Decimal(str(cambio.valor)), type_=Numeric), Numeric)
+    
+    query = producto.update().values(
+        {campo: precio_ajustado(producto.c[campo], cambio.modo, valor) for campo in cambio.campos}
+    )
+    if cambio.marca_id is not None:
+        query = query.where(producto.c.marca_id == cambio.marca_id)
+    if cambio.categoria_id is not None:
+        query = query.where(producto.c.categoria_id == cambio.categoria_id)
+    if cambio.especie_id is not None:
+        query = query.where(producto.c.especie_id == cambio.especie_id)
+    if cambio.ids:
+        query = query.where(producto.c.id.in_(cambio.ids))
+    if not cambio.incluir_inactivos:
+        query = query.where(producto.c.activo == True)
+    
+    actualizados = await database.fetch_all(query.returning(*producto.c))
+    cache_catalogo.invalidar("productos")
+    for fila in actualizados:
+        indice_codigos.actualizar(dict(fila))
+    return actualizados
+
 @router.put("/{id}", response_model=Producto)
 async def actualizar_producto(id: int, prod: ProductoIn):
     query = producto.update().where(producto.c.id == id).values(**prod.model_dump())
     result = await database.execute(query)
+    cache_catalogo.invalidar("productos")
     if result == 0:
         raise HTTPException(status_code=404, detail="Producto no encontrado")
+    indice_codigos.actualizar({**prod.model_dump(), "id": id})
     return {**prod.model_dump(), "id": id}
 
 @router.patch("/{id}", response_model=Producto)
@@ -62,19 +236,25 @@ async def actualizar_parcial_producto(id: int, prod: ProductoUpdate): # <--- CAM
     # 2. Ejecutamos la actualización en BD
     query = producto.update().where(producto.c.id == id).values(**datos_actualizar)
     result = await database.execute(query)
+    cache_catalogo.invalidar("productos")
     
     if result == 0:
         raise HTTPException(status_code=404, detail="Producto no encontrado")
     
     # 3. Recuperamos el producto actualizado
     query_get = producto.select().where(producto.c.id == id)
-    return await database.fetch_one(query_get)
+    actualizado = await database.fetch_one(query_get)
+    if actualizado:
+        indice_codigos.actualizar(dict(actualizado))
+    return actualizado
 
 @router.delete("/{id}")
 async def eliminar_producto(id: int):
     # Soft Delete: Solo cambiamos el estado, no borramos
     query = producto.update().where(producto.c.id == id).values(activo=False)
     result = await database.execute(query)
+    cache_catalogo.invalidar("productos")
+    indice_codigos.quitar(id)
     
     if result == 0:
         raise HTTPException(status_code=404, detail="Producto no encontrado")
@@ -0,0 +1,65 @@
+# routers/trabajos.py
+#
+# Alta, estado y descarga de trabajos en segundo plano (servicios/trabajos.py).
+# Flujo: POST /trabajos/ -> 202 con el id; GET /trabajos/{id} hasta que
+# estado sea TERMINADO; GET /trabajos/{id}/resultado para descargarlo.
+
+from fastapi import APIRouter, HTTPException, Query, Response
+from typing import List, Optional
+
+from schemas import TrabajoIn, Trabajo
+from servicios import trabajos
+from servicios.trabajos import cola_trabajos, ColaLlena
+
+router = APIRouter(
+    prefix="/trabajos",
+    tags=["Trabajos en segundo plano"]
+)
+
+@router.get("/tipos")
+async def tipos_de_trabajo():
+    """Qué se puede mandar a segundo plano y con qué parámetros."""
+    return cola_trabajos.tipos()
+
+@router.post("/", response_model=Trabajo, status_code=202)
+async def enviar_trabajo(data: TrabajoIn, response: Response):
+    try:
+        id = await cola_trabajos.enviar(data.tipo, data.parametros)
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+    except ColaLlena:
+        raise HTTPException(503, "Hay demasiados trabajos en espera, intenta en unos minutos",
+                            headers={"Retry-After": "60"})
+    response.headers["Location"] = f"/trabajos/{id}"
+    return await trabajos.obtener(id)
+
+@router.get("/", response_model=List[Trabajo])
+async def listar_trabajos(
+    estado: Optional[str] = Query(None, pattern="^(PENDIENTE|EN_CURSO|TERMINADO|ERROR)$"),
+    limite: int = Query(50, ge=1, le=500)
+):
+    return await trabajos.listar(estado, limite)
+
+@router.get("/{id}", response_model=Trabajo)
+async def estado_trabajo(id: int):
+    t = await trabajos.obtener(id)
+    if t is None:
+        raise HTTPException(404, "Trabajo no encontrado")
+    return t
+
+@router.get("/{id}/resultado")
+async def resultado_trabajo(id: int):
+    t = await trabajos.resultado(id)
+    if t is None:
+        raise HTTPException(404, "Trabajo no encontrado")
+    if t["estado"] == "ERROR":
+        raise HTTPException(409, "El trabajo falló; el detalle está en GET /trabajos/{id}")
+    if t["estado"] != "TERMINADO":
+        raise HTTPException(409, f"El trabajo sigue {t['estado']}", headers={"Retry-After": "5"})
+    
+    extension = {"application/json": "json", "text/csv": "csv", "application/x-ndjson": "ndjson"}
+    nombre = f"{t['tipo']}-{id}.{extension.get(t['tipo_contenido'], 'bin')}"
+    return Response(
+        content=t["resultado"], media_type=t["tipo_contenido"],
+        headers={"Content-Disposition": f'attachment; filename="{nombre}"'}
+    )
@@ -3,7 +3,7 @@ from typing import List
 from models import usuario
 from schemas import UsuarioIn, Usuario
 from database import database
-from security import get_password_hash # Asegúrate de tener security.py creado
+from security import get_password_hash_async # Se corre fuera del event loop
 
 router = APIRouter(
     prefix="/usuarios",
@@ -30,7 +30,7 @@ async def crear_usuario(u: UsuarioIn):
     
     # 2. --- EL CAMBIO CLAVE ---
     # Encriptamos la contraseña antes de enviarla a la base de datos
-    datos_usuario["contrasena_hash"] = get_password_hash(datos_usuario["contrasena_hash"])
+    datos_usuario["contrasena_hash"] = await get_password_hash_async(datos_usuario["contrasena_hash"])
     
     # 3. Insertamos los datos ya encriptados
     query = usuario.insert().values(**datos_usuario)
@@ -42,7 +42,7 @@ async def crear_usuario(u: UsuarioIn):
 async def actualizar_usuario(id: int, u: UsuarioIn):
     # También encriptamos al actualizar, por si el usuario cambia su contraseña
     datos_usuario = u.model_dump()
-    datos_usuario["contrasena_hash"] = get_password_hash(datos_usuario["contrasena_hash"])
+    datos_usuario["contrasena_hash"] = await get_password_hash_async(datos_usuario["contrasena_hash"])
 
     query = usuario.update().where(usuario.c.id == id).values(**datos_usuario)
     result = await database.execute(query)
@@ -1,12 +1,21 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Query, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
+import json
 from typing import List, Optional
-from pydantic import BaseModel
+from pydantic import BaseModel, model_validator
 from datetime import datetime, timezone, date # <--- AQUÍ ESTABA EL ERROR (Faltaba date)
 
-from sqlalchemy import select, desc, or_, and_
+from sqlalchemy import select, desc, func, tuple_
 
 from database import database, fecha_local_iso
-from models import venta, venta_detalle, inventario, producto, corte_caja, regla_descuento
+from models import venta, venta_detalle, producto, corte_caja
+from servicios.descuentos import motor_descuentos
+from servicios.codigos import indice_codigos
+from servicios.kpis import kpis
+from servicios.stock import mover_stock
+from servicios.resumen_ventas import acumular_venta
+from servicios.paginacion import codificar_cursor, decodificar_cursor
 
 router = APIRouter(
     prefix="/ventas",
@@ -15,9 +24,16 @@ router = APIRouter(
 
 # --- Esquemas ---
 class DetalleVentaReq(BaseModel):
-    producto_id: int
+    producto_id: Optional[int] = None
+    codigo: Optional[str] = None # Código de barras o SKU tal como lo manda el escáner
     cantidad: float
 
+    @model_validator(mode="after")
+    def producto_o_codigo(self):
+        if self.producto_id is None and not self.codigo:
+            raise ValueError("Cada línea necesita producto_id o codigo")
+        return self
+
 class VentaCreateReq(BaseModel):
     sucursal_id: int
     usuario_id: int
@@ -26,138 +42,178 @@ class VentaCreateReq(BaseModel):
     descuento_especial: float = 0.0
     motivo_descuento: Optional[str] = None
 
+def _kilos_por_linea(prod_db, cantidad: float) -> float:
+    """Convierte la cantidad vendida a la unidad de inventario (kilos/piezas)."""
+    if prod_db['unidad_medida'] in ['kg', 'lt']:
+        return float(cantidad)
+    return float(cantidad) * float(prod_db['contenido_neto'])
+
+def _acumular_en_corte(condicion, monto):
+    """UPDATE que suma `monto` a los totales corrientes del corte (negativo al cancelar)."""
+    return corte_caja.update().where(condicion).values(
+        ventas_totales=func.coalesce(corte_caja.c.ventas_totales, 0) + monto,
+        efectivo_esperado=func.coalesce(corte_caja.c.efectivo_esperado, corte_caja.c.fondo_inicial) + monto
+    ).returning(corte_caja.c.id)
+
+async def _resolver_codigos(detalles: List[DetalleVentaReq]):
+    """Llena producto_id de las líneas escaneadas (índice en memoria; lo que falte, una consulta)."""
+    await indice_codigos.asegurar_cargado()
+    pendientes = []
+    for item in detalles:
+        if item.producto_id is None:
+            prod = indice_codigos.buscar(item.codigo)
+            if prod:
+                item.producto_id = prod["id"]
+            else:
+                pendientes.append(item)
+    if not pendientes:
+        return
+    
+    codigos = list({item.codigo for item in pendientes})
+    query = select(producto).where(
+        (producto.c.activo == True) &
+        (producto.c.codigo_barras.in_(codigos) | producto.c.sku.in_(codigos))
+    ).order_by(producto.c.id)
+    for fila in await database.fetch_all(query):
+        indice_codigos.actualizar(dict(fila))
+    
+    for item in pendientes:
+        prod = indice_codigos.buscar(item.codigo)
+        if not prod:
+            raise HTTPException(404, f"Código {item.codigo} no encontrado")
+        item.producto_id = prod["id"]
+
 @router.post("/", response_model=dict)
 async def registrar_venta(data: VentaCreateReq):
     async with database.transaction():
         
-        # 1. Validar Corte de Caja Abierto
-        query_corte = select(corte_caja).where(
-            (corte_caja.c.usuario_id == data.usuario_id) &
-            (corte_caja.c.fecha_cierre == None)
-        )
-        corte_abierto = await database.fetch_one(query_corte)
-        if not corte_abierto:
-            raise HTTPException(400, "No hay turno abierto. Debe abrir caja primero.")
+        # 1. Cargar todo el ticket de una vez (una consulta por tabla, no por línea)
+        #    Las reglas de descuento ya viven en memoria (servicios/descuentos.py)
+        await _resolver_codigos(data.detalles)
+        ids_producto = list({item.producto_id for item in data.detalles})
         
-        total_venta_bruto = 0.0
+        q_prods = select(producto).where(producto.c.id.in_(ids_producto))
+        productos = {p['id']: p for p in await database.fetch_all(q_prods)}
+        for pid in ids_producto:
+            if pid not in productos:
+                raise HTTPException(404, f"Producto {pid} no encontrado")
+            # activo admite NULL: solo se bloquean los dados de baja (False), como antes
+            if productos[pid]['activo'] is False:
+                raise HTTPException(400, f"Producto {pid} inactivo")
+        # El índice puede venir de antes de un cambio hecho en otro worker:
+        # el código escaneado tiene que seguir siendo de ese producto
+        for item in data.detalles:
+            prod_db = productos[item.producto_id]
+            if item.codigo and item.codigo not in (prod_db['codigo_barras'], prod_db['sku']):
+                indice_codigos.quitar(item.producto_id)
+                raise HTTPException(409, f"El código {item.codigo} ya no corresponde al producto {item.producto_id}; vuelva a escanear")
         
-        # 2. Crear Cabecera Venta
-        query_venta = venta.insert().values(
-            sucursal_id=data.sucursal_id,
-            usuario_id=data.usuario_id,
-            cliente_id=data.cliente_id,
-            corte_caja_id=corte_abierto['id'],
-            fecha=datetime.now(timezone.utc),
-            total=0, # Se actualiza al final
-            descuento_especial_monto=data.descuento_especial,
-            descuento_especial_motivo=data.motivo_descuento
-        )
-        venta_id = await database.execute(query_venta)
+        await motor_descuentos.asegurar_cargado()
+        
+        # 2. Calcular precios, descuentos y kilos en memoria
+        total_venta_bruto = 0.0
+        lineas = []
+        kilos_por_producto = {}
         
-        # 3. Procesar Productos (Inventario y Descuentos)
         for item in data.detalles:
-            # A. Datos del Producto
-            q_prod = select(producto).where(producto.c.id == item.producto_id)
-            prod_db = await database.fetch_one(q_prod)
-            if not prod_db:
-                raise HTTPException(404, f"Producto {item.producto_id} no encontrado")
+            prod_db = productos[item.producto_id]
             
-            # B. Calcular Precio Base (Bulto vs Granel)
+            # A. Precio Base (Bulto vs Granel)
             precio_lista = float(prod_db['precio_base'])
-            contenido_neto = float(prod_db['contenido_neto'])
             
             # Lógica simple: si es a granel y cantidad < 1 (fracción de bulto), usar precio granel si existe
             if prod_db['se_vende_a_granel'] and prod_db['precio_granel'] and item.cantidad < 1.0:
                 precio_lista = float(prod_db['precio_granel'])
             
-            # C. --- MOTOR DE DESCUENTOS AUTOMÁTICOS ---
-            porcentaje_descuento = 0.0
-            
-            criterios_cliente = [regla_descuento.c.cliente_id == None]
-            if data.cliente_id:
-                criterios_cliente.append(regla_descuento.c.cliente_id == data.cliente_id)
-            
-            criterios_producto = [
-                regla_descuento.c.producto_id == item.producto_id,
-                regla_descuento.c.marca_id == prod_db['marca_id']
-            ]
-            
-            query_reglas = select(regla_descuento).where(
-                and_(
-                    regla_descuento.c.activo == True,
-                    or_(*criterios_cliente),
-                    or_(*criterios_producto)
-                )
-            ).order_by(desc(regla_descuento.c.descuento_porcentaje))
-            
-            mejor_regla = await database.fetch_one(query_reglas)
-            
-            if mejor_regla:
-                porcentaje_descuento = float(mejor_regla['descuento_porcentaje'])
+            # B. --- MOTOR DE DESCUENTOS AUTOMÁTICOS ---
+            porcentaje_descuento = motor_descuentos.mejor_descuento(
+                data.cliente_id, item.producto_id, prod_db['marca_id']
+            )
             
-            # Aplicar Descuento
             precio_final_unitario = precio_lista * (1 - (porcentaje_descuento / 100))
             subtotal = float(item.cantidad) * precio_final_unitario
             total_venta_bruto += subtotal
-
-            # D. Registrar Detalle
-            q_detalle = venta_detalle.insert().values(
-                venta_id=venta_id,
-                producto_id=item.producto_id,
-                cantidad=item.cantidad,
-                precio_unitario=precio_final_unitario 
-            )
-            await database.execute(q_detalle)
             
-            # E. Descontar Inventario
-            if prod_db['unidad_medida'] in ['kg', 'lt']:
-                kilos_a_restar = float(item.cantidad)
-            else:
-                kilos_a_restar = float(item.cantidad) * contenido_neto
-
-            q_inv = select(inventario).where(
-                (inventario.c.producto_id == item.producto_id) &
-                (inventario.c.sucursal_id == data.sucursal_id)
-            )
-            inv_db = await database.fetch_one(q_inv)
-            
-            stock_actual = float(inv_db['cantidad']) if inv_db else 0.0
-            nuevo_stock = stock_actual - kilos_a_restar
+            lineas.append({
+                "producto_id": item.producto_id,
+                "cantidad": item.cantidad,
+                "precio_unitario": precio_final_unitario
+            })
             
-            if inv_db:
-                await database.execute(
-                    inventario.update().where(inventario.c.id == inv_db['id']).values(
-                        cantidad=nuevo_stock, fecha_actualizacion=datetime.now(timezone.utc)
-                    )
-                )
-            else:
-                await database.execute(
-                    inventario.insert().values(
-                        producto_id=item.producto_id, sucursal_id=data.sucursal_id,
-                        cantidad=nuevo_stock, fecha_actualizacion=datetime.now(timezone.utc)
-                    )
-                )
-
-        # 4. Cerrar Totales
+            # C. Acumular kilos por producto (un ticket puede repetir producto)
+            kilos_por_producto[item.producto_id] = (
+                kilos_por_producto.get(item.producto_id, 0.0) + _kilos_por_linea(prod_db, item.cantidad)
+            )
+        
         total_neto = total_venta_bruto - data.descuento_especial
-        await database.execute(
-            venta.update().where(venta.c.id == venta_id).values(total=total_neto)
+        ahora = datetime.now(timezone.utc)
+        
+        # 3. Validar Corte de Caja Abierto y sumarle la venta (una sola sentencia)
+        corte_abierto = await database.fetch_one(
+            _acumular_en_corte(
+                (corte_caja.c.usuario_id == data.usuario_id) & (corte_caja.c.fecha_cierre == None),
+                total_neto
+            )
+        )
+        if not corte_abierto:
+            raise HTTPException(400, "No hay turno abierto. Debe abrir caja primero.")
+        
+        # 4. Crear Cabecera Venta (ya con el total final)
+        query_venta = venta.insert().values(
+            sucursal_id=data.sucursal_id,
+            usuario_id=data.usuario_id,
+            cliente_id=data.cliente_id,
+            corte_caja_id=corte_abierto['id'],
+            fecha=ahora,
+            total=total_neto,
+            descuento_especial_monto=data.descuento_especial,
+            descuento_especial_motivo=data.motivo_descuento
+        )
+        venta_id = await database.execute(query_venta)
+        await acumular_venta(data.sucursal_id, ahora, total_neto)
+        
+        # 5. Registrar todos los Detalles en un solo INSERT (con la fecha de la venta: misma partición)
+        if lineas:
+            await database.execute(
+                venta_detalle.insert().values([{**l, "venta_id": venta_id, "fecha": ahora} for l in lineas])
+            )
+        
+        # 6. Descontar Inventario (atómico, en bloque, con su renglón en el historial)
+        movimientos = await mover_stock(
+            data.sucursal_id,
+            {pid: -kilos for pid, kilos in kilos_por_producto.items()},
+            ahora,
+            tipo_movimiento="VENTA",
+            usuario_id=data.usuario_id,
+            motivo=f"Venta #{venta_id}"
         )
         
-        return {
-            "mensaje": "Venta registrada",
-            "venta_id": venta_id,
-            "total_original": total_venta_bruto,
-            "total_final": total_neto,
-            "descuento_aplicado": total_venta_bruto - total_neto
-        }
+    # Ya confirmada: una venta que se revirtió no cuenta
+    kpis.venta(data.sucursal_id, total_neto, movimientos)
+    return {
+        "mensaje": "Venta registrada",
+        "venta_id": venta_id,
+        "total_original": total_venta_bruto,
+        "total_final": total_neto,
+        "descuento_aplicado": total_venta_bruto - total_neto
+    }
 
 @router.get("/", response_model=List[dict])
 async def listar_ventas(
+    response: Response,
     sucursal_id: Optional[int] = None,
-    fecha: Optional[date] = None
+    fecha: Optional[date] = None,
+    limite: int = Query(100, ge=1, le=1000, description="Ventas por página"),
+    cursor: Optional[str] = Query(None, description="Valor de X-Siguiente-Cursor de la página anterior"),
+    formato: str = Query("json", pattern="^(json|ndjson)$", description="ndjson = todas las ventas en streaming")
 ):
-    """Listar ventas resumidas"""
+    """
+    Listar ventas resumidas, de la más reciente a la más vieja.
+    Paginación por cursor sobre (fecha, id): si hay más páginas, el cursor
+    de la siguiente viene en el header X-Siguiente-Cursor.
+    Con formato=ndjson se mandan todas las ventas del filtro, una por línea,
+    conforme llegan del driver (sin paginar y sin cargar todo en memoria).
+    """
     query = select(venta)
     if sucursal_id:
         query = query.where(venta.c.sucursal_id == sucursal_id)
@@ -166,8 +222,25 @@ async def listar_ventas(
         fin = datetime.combine(fecha, datetime.max.time())
         query = query.where((venta.c.fecha >= inicio) & (venta.c.fecha <= fin))
     
-    query = query.order_by(desc(venta.c.fecha))
-    registros = await database.fetch_all(query)
+    query = query.order_by(desc(venta.c.fecha), desc(venta.c.id))
+    
+    if formato == "ndjson":
+        async def generar():
+            async for r in database.iterate(query):
+                fila = {**dict(r), "fecha": fecha_local_iso(r["fecha"])}
+                yield json.dumps(jsonable_encoder(fila)) + "\n"
+        return StreamingResponse(generar(), media_type="application/x-ndjson")
+    
+    if cursor:
+        cursor_fecha, cursor_id = decodificar_cursor(cursor)
+        query = query.where(tuple_(venta.c.fecha, venta.c.id) < tuple_(cursor_fecha, cursor_id))
+    
+    # Pedimos uno de más para saber si hay otra página
+    registros = await database.fetch_all(query.limit(limite + 1))
+    if len(registros) > limite:
+        registros = registros[:limite]
+        ultimo = registros[-1]
+        response.headers["X-Siguiente-Cursor"] = codificar_cursor(ultimo["fecha"], ultimo["id"])
     
     return [
         {**dict(r), "fecha": fecha_local_iso(r["fecha"])} 
@@ -191,7 +264,10 @@ async def obtener_venta(id: int):
         producto.c.unidad_medida
     ).select_from(
         venta_detalle.join(producto)
-    ).where(venta_detalle.c.venta_id == id)
+    ).where(
+        # Con la fecha solo se lee la partición del mes de la venta
+        (venta_detalle.c.venta_id == id) & (venta_detalle.c.fecha == v["fecha"])
+    )
     
     detalles = await database.fetch_all(q_detalles)
     
@@ -201,45 +277,59 @@ async def obtener_venta(id: int):
     }
 
 @router.put("/{id}/cancelar")
-async def cancelar_venta(id: int):
-    """Cancela una venta y regresa el stock"""
+async def cancelar_venta(id: int, usuario_id: Optional[int] = None):
+    """
+    Cancela una venta y regresa el stock. `usuario_id` es quien cancela (va al
+    historial de inventario); sin él se atribuye al vendedor de la venta.
+    """
     async with database.transaction():
         q_venta = select(venta).where(venta.c.id == id)
         v = await database.fetch_one(q_venta)
         if not v:
             raise HTTPException(404, "Venta no encontrada")
+        usuario_id = usuario_id if usuario_id is not None else v['usuario_id']
+        if usuario_id is None:
+            raise HTTPException(400, "La venta no tiene usuario: indica usuario_id de quien cancela")
         
-        # 2. Regresar stock
-        q_detalles = select(venta_detalle).where(venta_detalle.c.venta_id == id)
+        # 2. Regresar stock (detalles + producto en una sola consulta)
+        q_detalles = select(
+            venta_detalle.c.producto_id,
+            venta_detalle.c.cantidad,
+            producto.c.unidad_medida,
+            producto.c.contenido_neto
+        ).select_from(
+            venta_detalle.join(producto)
+        ).where((venta_detalle.c.venta_id == id) & (venta_detalle.c.fecha == v['fecha']))
         items = await database.fetch_all(q_detalles)
         
+        kilos_por_producto = {}
         for item in items:
-            q_prod = select(producto).where(producto.c.id == item['producto_id'])
-            prod = await database.fetch_one(q_prod)
-            
-            kilos_a_regresar = 0.0
-            if prod['unidad_medida'] in ['kg', 'lt']:
-                kilos_a_regresar = float(item['cantidad'])
-            else:
-                kilos_a_regresar = float(item['cantidad']) * float(prod['contenido_neto'])
-            
-            q_inv = select(inventario).where(
-                (inventario.c.producto_id == item['producto_id']) &
-                (inventario.c.sucursal_id == v['sucursal_id'])
+            kilos_por_producto[item['producto_id']] = (
+                kilos_por_producto.get(item['producto_id'], 0.0) + _kilos_por_linea(item, item['cantidad'])
             )
-            inv = await database.fetch_one(q_inv)
-            
-            if inv:
-                nuevo_stock = float(inv['cantidad']) + kilos_a_regresar
-                await database.execute(
-                    inventario.update().where(inventario.c.id == inv['id']).values(
-                        cantidad=nuevo_stock,
-                        fecha_actualizacion=datetime.now(timezone.utc)
-                    )
+        await mover_stock(
+            v['sucursal_id'], kilos_por_producto,
+            tipo_movimiento="CANCELACION",
+            usuario_id=usuario_id,
+            motivo=f"Cancelación de la venta #{id}"
+        )
+
+        # 3. Restar del corte, solo si sigue abierto (los cerrados ya están cuadrados)
+        if v['corte_caja_id'] is not None:
+            await database.execute(
+                _acumular_en_corte(
+                    (corte_caja.c.id == v['corte_caja_id']) & (corte_caja.c.fecha_cierre == None),
+                    -float(v['total'])
                 )
+            )
 
-        # 3. Eliminar venta (Reverso simple)
-        await database.execute(venta_detalle.delete().where(venta_detalle.c.venta_id == id))
-        await database.execute(venta.delete().where(venta.c.id == id))
-        
-        return {"mensaje": "Venta cancelada y stock restaurado"}
\ No newline at end of file
+        await acumular_venta(v['sucursal_id'], v['fecha'], -float(v['total']), -1)
+
+        # 4. Eliminar venta (Reverso simple)
+        await database.execute(venta_detalle.delete().where(
+            (venta_detalle.c.venta_id == id) & (venta_detalle.c.fecha == v['fecha'])
+        ))
+        await database.execute(venta.delete().where((venta.c.id == id) & (venta.c.fecha == v['fecha'])))
+    
+    kpis.cancelacion(v['sucursal_id'], float(v['total']))
+    return {"mensaje": "Venta cancelada y stock restaurado"}
\ No newline at end of file
@@ -1,5 +1,5 @@
-from pydantic import BaseModel
-from typing import Optional, List
+from pydantic import BaseModel, Field, model_validator
+from typing import Optional, List, Literal
 from datetime import datetime
 
 # === ATRIBUTOS (Sin cambios) ===
@@ -59,7 +59,7 @@ class ProductoIn(BaseModel):
     
     # Lógica de Venta
     unidad_medida: str = "pza"
-    contenido_neto: float = 1.0
+    contenido_neto: float = Field(1.0, gt=0)
     se_vende_a_granel: bool = False
     
     # Precios
@@ -72,11 +72,18 @@ class ProductoIn(BaseModel):
 class Producto(ProductoIn):
     id: int
 
+class ProductoBusqueda(Producto):
+    marca_nombre: Optional[str] = None
+    relevancia: float
+
 # === INVENTARIO ===
 class InventarioIn(BaseModel):
     producto_id: int
     sucursal_id: int
     cantidad: float 
+    # Quién hace el movimiento (historial_inventario)
+    usuario_id: int
+    motivo: Optional[str] = None
 
 class Inventario(BaseModel):
     id: int
@@ -106,6 +113,15 @@ class IngresoInventario(IngresoInventarioIn):
     id: int
     fecha_actualizacion: str 
 
+class IngresoLoteLinea(BaseModel):
+    producto_id: int
+    cantidad: float # Bultos / piezas, igual que en IngresoInventarioIn
+
+class IngresoInventarioLoteIn(BaseModel):
+    sucursal_id: int
+    usuario_id: int
+    lineas: List[IngresoLoteLinea]
+
 # === AJUSTE INVENTARIO (AUDITORÍA) ===
 class AjusteInventarioIn(BaseModel):
     sucursal_id: int
@@ -120,6 +136,30 @@ class AjusteInventario(AjusteInventarioIn):
     diferencia: float
     fecha: datetime
 
+# === CONTEO FÍSICO POR SESIÓN ===
+class ConteoSesionIn(BaseModel):
+    sucursal_id: int
+    usuario_id: int
+    motivo: Optional[str] = None
+
+class ConteoSesion(ConteoSesionIn):
+    id: int
+    fecha_apertura: datetime
+    fecha_cierre: Optional[datetime] = None
+    estado: str
+
+class ConteoLinea(BaseModel):
+    producto_id: int
+    cantidad: float # Total que lleva contado ESTE dispositivo (reenviar reemplaza, no suma)
+
+class ConteoLecturasIn(BaseModel):
+    dispositivo: str
+    usuario_id: int
+    lineas: List[ConteoLinea]
+
+class ConteoCierreIn(BaseModel):
+    usuario_id: int
+
 # === USUARIOS Y VENTAS ===
 class UsuarioIn(BaseModel):
     nombre: str
@@ -180,4 +220,41 @@ class ProductoUpdate(BaseModel):
     descripcion: Optional[str] = None
     precio: Optional[float] = None
     stock: Optional[int] = None
-    tipo_producto: Optional[str] = None
\ No newline at end of file
+    tipo_producto: Optional[str] = None
+
+class CambioPreciosIn(BaseModel):
+    # "porcentaje": valor=8 sube 8%, valor=-5 baja 5%. "monto": suma valor en pesos
+    modo: Literal["porcentaje", "monto"]
+    valor: float
+    campos: List[Literal["precio_base", "precio_granel"]] = Field(["precio_base", "precio_granel"], min_length=1)
+    
+    # Filtros (se combinan con AND); al menos uno, para no tocar todo el catálogo por error
+    marca_id: Optional[int] = None
+    categoria_id: Optional[int] = None
+    especie_id: Optional[int] = None
+    ids: Optional[List[int]] = None
+    incluir_inactivos: bool = False
+
+    @model_validator(mode="after")
+    def al_menos_un_filtro(self):
+        if self.marca_id is None and self.categoria_id is None and self.especie_id is None and not self.ids:
+            raise ValueError("Indica marca_id, categoria_id, especie_id o ids")
+        if not self.campos:
+            raise ValueError("campos no puede ir vacío")
+        return self
+
+# === TRABAJOS EN SEGUNDO PLANO ===
+class TrabajoIn(BaseModel):
+    tipo: str # Ver GET /trabajos/tipos
+    parametros: dict = {}
+
+class Trabajo(BaseModel):
+    id: int
+    tipo: str
+    parametros: str # JSON tal como se envió
+    estado: str # PENDIENTE, EN_CURSO, TERMINADO, ERROR
+    fecha_creacion: datetime
+    fecha_inicio: Optional[datetime] = None
+    fecha_fin: Optional[datetime] = None
+    tipo_contenido: Optional[str] = None
+    error: Optional[str] = None
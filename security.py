@@ -1,4 +1,7 @@
 # security.py
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
 from typing import Union
 from jose import JWTError, jwt
@@ -19,6 +22,21 @@ def get_password_hash(password):
     """Encripta una contraseña."""
     return pwd_context.hash(password)
 
+# bcrypt tarda ~250 ms por llamada y bloquearía el event loop (y todas las cajas).
+# Se corre en un pool de hilos acotado; bcrypt suelta el GIL mientras calcula.
+PASSWORD_HILOS = int(os.getenv("PASSWORD_HILOS", "2"))
+_pool_passwords = ThreadPoolExecutor(max_workers=PASSWORD_HILOS, thread_name_prefix="bcrypt")
+
+async def verificar_password_async(plain_password, hashed_password):
+    """verificar_password fuera del event loop."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_pool_passwords, verificar_password, plain_password, hashed_password)
+
+async def get_password_hash_async(password):
+    """get_password_hash fuera del event loop."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_pool_passwords, get_password_hash, password)
+
 def crear_token_acceso(data: dict, expires_delta: Union[timedelta, None] = None):
     """Genera el Token JWT que el frontend guardará."""
     to_encode = data.copy()
@@ -0,0 +1,200 @@
+# servicios/analitica.py
+#
+# Analítica de ventas por producto para un rango de días: clasificación ABC
+# por ingreso, velocidad de venta, sell-through, días de cobertura del stock
+# y fuga por descuentos. Los datos salen de dos consultas que regresan UNA
+# fila de arreglos (array_agg): asyncpg los entrega como listas que pasan
+# directo a columnas de numpy/pandas, sin armar un Record por renglón. Los
+# cálculos son vectorizados (sin ciclos ni consultas por producto), así que
+# un año de detalle se procesa en segundos.
+
+from datetime import date, datetime, time, timedelta
+from typing import Optional
+from zoneinfo import ZoneInfo
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import select, func, cast, type_coerce, literal, Float, Integer, Date
+
+from database import database
+from models import venta, venta_detalle, producto, inventario
+from servicios.resumen_ventas import ZONA_LOCAL
+
+# Participación acumulada del ingreso: A hasta 80 %, B hasta 95 %, C el resto
+ABC_LIMITES = (0.80, 0.95)
+
+TIPOS_LINEAS = {
+    "producto_id": "int64", "venta_id": "int64", "cantidad": "float64",
+    "precio_unitario": "float64", "descuento_ticket": "float64", "dia": "int64",
+}
+TIPOS_PRODUCTOS = {
+    "producto_id": "int64", "nombre": "object", "sku": "object", "precio_base": "float64",
+    "precio_granel": "float64", "se_vende_a_granel": "bool", "por_peso": "bool",
+    "contenido_neto": "float64", "stock": "float64",
+}
+
+
+async def _columnas(query, tipos: dict) -> pd.DataFrame:
+    """Una fila de arreglos -> DataFrame (array_agg de cero filas regresa NULL)."""
+    fila = dict(await database.fetch_one(query))
+    return pd.DataFrame({
+        col: np.asarray(fila[col] if fila[col] is not None else [], dtype=tipo)
+        for col, tipo in tipos.items()
+    })
+
+
+def _consulta_lineas(inicio: datetime, fin: datetime, desde: date, sucursal_id: Optional[int]):
+    # Día local de la venta como entero desde `desde` (date - date = int en Postgres)
+    dia = type_coerce(
+        cast(func.timezone(ZONA_LOCAL, venta.c.fecha), Date) - cast(literal(desde), Date), Integer
+    )
+    query = select(
+        func.array_agg(venta_detalle.c.producto_id).label("producto_id"),
+        func.array_agg(venta_detalle.c.venta_id).label("venta_id"),
+        func.array_agg(cast(venta_detalle.c.cantidad, Float)).label("cantidad"),
+        func.array_agg(cast(venta_detalle.c.precio_unitario, Float)).label("precio_unitario"),
+        func.array_agg(cast(func.coalesce(venta.c.descuento_especial_monto, 0), Float)).label("descuento_ticket"),
+        func.array_agg(dia).label("dia"),
+    ).select_from(
+        venta_detalle.join(venta)
+    ).where(
+        # La fecha en las dos tablas: solo se leen las particiones del rango
+        (venta.c.fecha >= inicio) & (venta.c.fecha < fin) &
+        (venta_detalle.c.fecha >= inicio) & (venta_detalle.c.fecha < fin) &
+        (venta_detalle.c.producto_id != None)
+    )
+    if sucursal_id is not None:
+        query = query.where(venta.c.sucursal_id == sucursal_id)
+    return query
+
+
+def _consulta_productos(sucursal_id: Optional[int]):
+    stock = select(
+        inventario.c.producto_id, func.sum(inventario.c.cantidad).label("cantidad")
+    ).group_by(inventario.c.producto_id)
+    if sucursal_id is not None:
+        stock = stock.where(inventario.c.sucursal_id == sucursal_id)
+    stock = stock.subquery("stock")
+
+    return select(
+        func.array_agg(producto.c.id).label("producto_id"),
+        func.array_agg(producto.c.nombre).label("nombre"),
+        func.array_agg(producto.c.sku).label("sku"),
+        func.array_agg(cast(producto.c.precio_base, Float)).label("precio_base"),
+        func.array_agg(cast(func.coalesce(producto.c.precio_granel, producto.c.precio_base), Float)).label("precio_granel"),
+        func.array_agg(func.coalesce(producto.c.se_vende_a_granel, False)).label("se_vende_a_granel"),
+        func.array_agg(func.coalesce(producto.c.unidad_medida.in_(["kg", "lt"]), False)).label("por_peso"),
+        func.array_agg(cast(func.coalesce(producto.c.contenido_neto, 1), Float)).label("contenido_neto"),
+        func.array_agg(cast(func.coalesce(stock.c.cantidad, 0), Float)).label("stock"),
+    ).select_from(producto.outerjoin(stock, stock.c.producto_id == producto.c.id))
+
+
+def calcular(lineas: pd.DataFrame, productos: pd.DataFrame, dias: int) -> pd.DataFrame:
+    """Métricas por producto (índice producto_id), ordenadas por ingreso."""
+    prod = productos.set_index("producto_id")
+
+    # Columnas del producto alineadas a cada línea
+    p = prod.reindex(lineas["producto_id"].to_numpy())
+    cantidad = lineas["cantidad"].to_numpy()
+    importe = cantidad * lineas["precio_unitario"].to_numpy()
+
+    # Precio de lista con la misma regla que registrar_venta (fracción de bulto a granel).
+    # Es el precio de HOY: si subió desde la venta, la fuga sale de más
+    granel = p["se_vende_a_granel"].to_numpy(dtype=bool) & (cantidad < 1.0)
+    precio_lista = np.where(granel, p["precio_granel"].to_numpy(), p["precio_base"].to_numpy())
+    # Lo que se dejó de cobrar por reglas de descuento (las bajas de precio no cuentan como fuga)
+    fuga_reglas = np.maximum(cantidad * precio_lista - importe, 0.0)
+
+    # El descuento manual es por ticket: se reparte entre sus líneas según su importe
+    bruto_ticket = pd.Series(importe).groupby(lineas["venta_id"].to_numpy()).transform("sum").to_numpy()
+    fuga_manual = np.divide(
+        lineas["descuento_ticket"].to_numpy() * importe, bruto_ticket,
+        out=np.zeros_like(importe), where=bruto_ticket > 0
+    )
+
+    # A unidad de inventario (kilos/piezas), como _kilos_por_linea
+    kilos = np.where(p["por_peso"].to_numpy(dtype=bool), cantidad, cantidad * p["contenido_neto"].to_numpy())
+
+    por_producto = pd.DataFrame({
+        "producto_id": lineas["producto_id"].to_numpy(),
+        "cantidad": cantidad, "kilos": kilos, "ingreso": importe,
+        "fuga_reglas": fuga_reglas, "fuga_manual": fuga_manual,
+        "dia": lineas["dia"].to_numpy(),
+    }).groupby("producto_id").agg(
+        cantidad=("cantidad", "sum"),
+        kilos=("kilos", "sum"),
+        ingreso=("ingreso", "sum"),
+        fuga_reglas=("fuga_reglas", "sum"),
+        fuga_manual=("fuga_manual", "sum"),
+        lineas=("ingreso", "size"),
+        dias_con_venta=("dia", "nunique"),
+    )
+
+    df = prod.join(por_producto, how="left")
+    ceros = ["cantidad", "kilos", "ingreso", "fuga_reglas", "fuga_manual", "lineas", "dias_con_venta"]
+    df[ceros] = df[ceros].fillna(0)
+    df[["lineas", "dias_con_venta"]] = df[["lineas", "dias_con_venta"]].astype("int64")
+    # Solo lo que se movió o tiene existencia
+    df = df[(df["lineas"] > 0) | (df["stock"] > 0)].copy()
+
+    stock = np.maximum(df["stock"].to_numpy(), 0.0)
+    kilos = df["kilos"].to_numpy()
+    velocidad = kilos / max(dias, 1)  # Unidad de inventario por día
+    df["velocidad_diaria"] = velocidad
+    df["dias_cobertura"] = np.divide(stock, velocidad, out=np.full_like(stock, np.nan), where=velocidad > 0)
+    vendido_mas_stock = kilos + stock
+    df["sell_through"] = np.divide(kilos, vendido_mas_stock, out=np.zeros_like(kilos), where=vendido_mas_stock > 0)
+
+    # ABC: la clase se decide con lo acumulado ANTES del producto (el que cruza el 80 % sigue siendo A)
+    df = df.sort_values("ingreso", ascending=False)
+    ingreso = df["ingreso"].to_numpy()
+    total = ingreso.sum()
+    previo = (np.cumsum(ingreso) - ingreso) / total if total > 0 else np.ones_like(ingreso)
+    df["participacion"] = ingreso / total if total > 0 else 0.0
+    df["abc"] = np.select(
+        [(ingreso > 0) & (previo < ABC_LIMITES[0]), (ingreso > 0) & (previo < ABC_LIMITES[1])],
+        ["A", "B"], default="C"
+    )
+    return df
+
+
+async def analitica_ventas(desde: date, hasta: date, sucursal_id: Optional[int] = None, limite: Optional[int] = None):
+    """Totales, resumen por clase ABC y métricas por producto (los `limite` de más ingreso)."""
+    zona = ZoneInfo(ZONA_LOCAL)
+    inicio = datetime.combine(desde, time.min, tzinfo=zona)
+    fin = datetime.combine(hasta + timedelta(days=1), time.min, tzinfo=zona)
+    dias = (hasta - desde).days + 1
+
+    lineas = await _columnas(_consulta_lineas(inicio, fin, desde, sucursal_id), TIPOS_LINEAS)
+    productos = await _columnas(_consulta_productos(sucursal_id), TIPOS_PRODUCTOS)
+    df = calcular(lineas, productos, dias)
+
+    resumen_abc = df.groupby("abc").agg(
+        productos=("ingreso", "size"), ingreso=("ingreso", "sum"), stock=("stock", "sum")
+    ).round(2)
+    columnas = [
+        "nombre", "sku", "abc", "cantidad", "ingreso", "participacion", "lineas", "dias_con_venta",
+        "velocidad_diaria", "stock", "dias_cobertura", "sell_through", "fuga_reglas", "fuga_manual",
+    ]
+    filas = df[columnas].head(limite).round(4).reset_index()
+    # NaN (sin velocidad = cobertura indefinida) -> null en el JSON
+    filas = filas.astype(object).where(filas.notna(), None)
+
+    return {
+        "desde": desde,
+        "hasta": hasta,
+        "dias": dias,
+        "sucursal_id": sucursal_id,
+        "totales": {
+            "lineas": int(len(lineas)),
+            "tickets": int(lineas["venta_id"].nunique()),
+            "ingreso": round(float(df["ingreso"].sum()), 2),
+            "fuga_reglas": round(float(df["fuga_reglas"].sum()), 2),
+            "fuga_manual": round(float(df["fuga_manual"].sum()), 2),
+        },
+        "abc": {
+            clase: {"productos": int(f["productos"]), "ingreso": float(f["ingreso"]), "stock": float(f["stock"])}
+            for clase, f in resumen_abc.iterrows()
+        },
+        "productos": filas.to_dict("records"),
+    }
@@ -0,0 +1,238 @@
+# servicios/carga_productos.py
+#
+# Importación / exportación masiva del catálogo con COPY.
+# El archivo entra por COPY a una tabla temporal (producto_carga) y de ahí se
+# hace un solo upsert contra `producto` por SKU. La exportación sale con
+# COPY ... TO STDOUT en el mismo formato, así que el archivo se puede reimportar.
+
+import asyncio
+import csv
+import io
+import json
+from typing import AsyncIterator, List
+
+from sqlalchemy import (
+    Table, Column, MetaData, BigInteger, Boolean, Identity, Numeric, Text, Integer,
+    select, desc, literal_column
+)
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.schema import CreateTable
+
+from database import database
+from models import producto
+from servicios.trabajos import cola_trabajos
+
+# Mismas columnas (y mismos defaults) que ProductoIn; el id no viaja en el archivo
+producto_carga = Table(
+    "producto_carga",
+    MetaData(),
+    Column("linea", BigInteger, Identity()),
+    Column("nombre", Text),
+    Column("tipo_producto", Text, server_default="Alimento"),
+    Column("sku", Text),
+    Column("codigo_barras", Text),
+    Column("descripcion", Text),
+    Column("marca_id", Integer),
+    Column("categoria_id", Integer),
+    Column("subcategoria_id", Integer),
+    Column("especie_id", Integer),
+    Column("etapa_id", Integer),
+    Column("unidad_medida", Text, server_default="pza"),
+    Column("contenido_neto", Numeric(10, 3), server_default="1.0"),
+    Column("se_vende_a_granel", Boolean, server_default="false"),
+    Column("precio_base", Numeric(10, 2)),
+    Column("precio_granel", Numeric(10, 2)),
+    Column("activo", Boolean, server_default="true"),
+    Column("stock_minimo", Numeric(12, 3), server_default="5.0"),
+    prefixes=["TEMPORARY"],
+    postgresql_on_commit="DROP"
+)
+
+COLUMNAS = [c.name for c in producto_carga.c if c.name != "linea"]
+# Sin estas no se puede dar de alta un producto nuevo; un archivo que no las
+# trae (p. ej. una lista de precios: sku,precio_base) solo actualiza existentes
+OBLIGATORIAS_ALTA = {"sku", "nombre", "precio_base"}
+# En un alta, lo que el archivo no trae toma el default de la tabla temporal
+CON_DEFAULT = [c.name for c in producto_carga.c if c.server_default is not None and c.name != "linea"]
+
+FILAS_POR_TROZO = 1000
+
+
+class ArchivoInvalido(ValueError):
+    pass
+
+
+def validar_columnas(columnas: List[str]):
+    desconocidas = [c for c in columnas if c not in COLUMNAS]
+    if desconocidas:
+        raise ArchivoInvalido(f"Columnas desconocidas: {', '.join(desconocidas)}")
+    if "sku" not in columnas:
+        raise ArchivoInvalido("El archivo necesita la columna sku")
+    if len(set(columnas)) != len(columnas):
+        raise ArchivoInvalido("Columnas repetidas en el encabezado")
+
+
+async def separar_encabezado_csv(cuerpo: AsyncIterator[bytes]):
+    """Lee solo hasta el primer salto de línea; el resto sigue en streaming hacia COPY."""
+    buffer = b""
+    async for trozo in cuerpo:
+        buffer += trozo
+        if b"\n" in buffer:
+            break
+    encabezado, _, resto = buffer.partition(b"\n")
+    columnas = [c.strip() for c in next(csv.reader([encabezado.decode("utf-8-sig")]), [])]
+
+    async def datos():
+        if resto:
+            yield resto
+        async for trozo in cuerpo:
+            yield trozo
+
+    return columnas, datos()
+
+
+async def separar_encabezado_ndjson(cuerpo: AsyncIterator[bytes]):
+    """
+    NDJSON -> CSV al vuelo para el mismo COPY. Las columnas salen de las llaves
+    del primer objeto; una llave ausente en otra línea se carga como NULL y
+    una que el primero no traía es error.
+    """
+    async def lineas():
+        pendiente = b""
+        async for trozo in cuerpo:
+            pendiente += trozo
+            *completas, pendiente = pendiente.split(b"\n")
+            for linea in completas:
+                if linea.strip():
+                    yield linea
+        if pendiente.strip():
+            yield pendiente
+
+    iterador = lineas().__aiter__()
+    try:
+        primera = json.loads(await iterador.__anext__())
+    except StopAsyncIteration:
+        return [], _vacio()
+    except json.JSONDecodeError as e:
+        raise ArchivoInvalido(f"Línea 1: JSON inválido ({e.msg})")
+    columnas = list(primera)
+
+    async def datos():
+        salida = io.StringIO()
+        escritor = csv.writer(salida)
+        escritor.writerow([primera.get(c) for c in columnas])
+        numero = 1
+        async for linea in iterador:
+            numero += 1
+            try:
+                obj = json.loads(linea)
+            except json.JSONDecodeError as e:
+                raise ArchivoInvalido(f"Línea {numero}: JSON inválido ({e.msg})")
+            extra = set(obj) - set(columnas)
+            if extra:
+                raise ArchivoInvalido(f"Línea {numero}: llaves que no están en la primera línea: {', '.join(sorted(extra))}")
+            escritor.writerow([obj.get(c) for c in columnas])
+            if numero % FILAS_POR_TROZO == 0:
+                yield salida.getvalue().encode()
+                salida.seek(0)
+                salida.truncate()
+        if salida.tell():
+            yield salida.getvalue().encode()
+
+    return columnas, datos()
+
+
+async def _vacio():
+    return
+    yield
+
+
+async def importar(columnas: List[str], datos: AsyncIterator[bytes]) -> dict:
+    """
+    COPY del archivo a producto_carga y un solo upsert por SKU.
+    Si el SKU viene repetido en el archivo gana la última línea.
+    """
+    validar_columnas(columnas)
+    dialecto = postgresql.dialect()
+    alta = OBLIGATORIAS_ALTA.issubset(columnas)
+
+    # Una fila por SKU (la última), descartando las que no traen SKU
+    dedup = select(
+        *[producto_carga.c[c] for c in columnas]
+    ).where(
+        producto_carga.c.sku != None
+    ).distinct(producto_carga.c.sku).order_by(producto_carga.c.sku, desc(producto_carga.c.linea))
+
+    if alta:
+        # Se insertan también las columnas con default, pero al actualizar
+        # solo se tocan las que venían en el archivo
+        insertar = columnas + [c for c in CON_DEFAULT if c not in columnas]
+        dedup = dedup.add_columns(*[producto_carga.c[c] for c in insertar[len(columnas):]])
+        query = pg_insert(producto).from_select(insertar, dedup, include_defaults=False)
+        query = query.on_conflict_do_update(
+            index_elements=["sku"],
+            set_={c: query.excluded[c] for c in columnas if c != "sku"}
+        ).returning(producto.c.id, literal_column("(xmax = 0)").label("insertado"))
+    else:
+        fuente = dedup.subquery("fuente")
+        query = producto.update().where(
+            producto.c.sku == fuente.c.sku
+        ).values(
+            {c: fuente.c[c] for c in columnas if c != "sku"}
+        ).returning(producto.c.id, literal_column("false").label("insertado"))
+
+    async with database.transaction():
+        conexion = database.connection().raw_connection
+        await conexion.execute(str(CreateTable(producto_carga).compile(dialect=dialecto)))
+        await conexion.copy_to_table(
+            "producto_carga", source=datos, columns=columnas, format="csv"
+        )
+        leidas, sin_sku, skus = await conexion.fetchrow(
+            "SELECT count(*), count(*) FILTER (WHERE sku IS NULL), count(DISTINCT sku) FROM producto_carga"
+        )
+        filas = await database.fetch_all(query)
+
+    insertados = sum(1 for f in filas if f["insertado"])
+    return {
+        "filas_leidas": leidas,
+        "insertados": insertados,
+        "actualizados": len(filas) - insertados,
+        "sin_sku": sin_sku,
+        "sku_no_encontrados": skus - len(filas),
+    }
+
+
+@cola_trabajos.registrar("productos.exportar-csv", "text/csv")
+async def exportar_csv() -> AsyncIterator[bytes]:
+    """COPY (SELECT ...) TO STDOUT en CSV con encabezado, trozo por trozo."""
+    query = select(*[producto.c[c] for c in COLUMNAS]).order_by(producto.c.id)
+    sql = str(query.compile(dialect=postgresql.dialect()))
+
+    cola: asyncio.Queue = asyncio.Queue(maxsize=16)
+    fin = object()
+
+    async def copiar():
+        try:
+            async with database.connection() as conexion:
+                await conexion.raw_connection.copy_from_query(
+                    sql, output=cola.put, format="csv", header=True
+                )
+        finally:
+            await cola.put(fin)
+
+    tarea = asyncio.create_task(copiar())
+    try:
+        while (trozo := await cola.get()) is not fin:
+            yield trozo
+        await tarea  # Propaga el error del COPY, si hubo
+    finally:
+        tarea.cancel()
+
+
+@cola_trabajos.registrar("productos.exportar-ndjson", "application/x-ndjson")
+async def exportar_ndjson() -> AsyncIterator[str]:
+    query = select(*[producto.c[c] for c in COLUMNAS]).order_by(producto.c.id)
+    async for r in database.iterate(query):
+        fila = {c: r[c] for c in COLUMNAS}
+        yield json.dumps(fila, default=float, ensure_ascii=False) + "\n"
@@ -0,0 +1,92 @@
+# servicios/catalogo.py
+
+import asyncio
+import hashlib
+import os
+import time
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, List, Tuple, Type
+
+from fastapi import Request, Response
+from pydantic import BaseModel, TypeAdapter
+
+# Las escrituras de este proceso invalidan al momento; el TTL acota lo que
+# puede tardar en verse un cambio hecho por otro worker.
+CATALOGO_TTL_SEGUNDOS = float(os.getenv("CATALOGO_TTL_SEGUNDOS", "60"))
+
+
+@dataclass
+class Snapshot:
+    version: int
+    cuerpo: bytes
+    etag: str
+    creado_en: float
+
+
+class CacheCatalogo:
+    """
+    Copias ya serializadas (JSON) de los catálogos que casi no cambian:
+    productos, marcas, especies, etapas, categorías y subcategorías.
+
+    Cada catálogo tiene un número de versión que sube con cada escritura.
+    El ETag es el hash del contenido, así coincide entre workers y el
+    cliente puede revalidar con If-None-Match sin que se toque la base.
+    """
+
+    def __init__(self):
+        self._versiones: Dict[str, int] = {}
+        self._snapshots: Dict[Tuple[str, tuple], Snapshot] = {}
+        self._lock = asyncio.Lock()
+
+    def invalidar(self, *catalogos: str):
+        """Sube la versión de los catálogos; sus copias se regeneran al pedirse."""
+        for nombre in catalogos:
+            self._versiones[nombre] = self._versiones.get(nombre, 0) + 1
+
+    def _vigente(self, nombre: str, snap: Snapshot) -> bool:
+        return (
+            snap.version == self._versiones.get(nombre, 0)
+            and time.monotonic() - snap.creado_en < CATALOGO_TTL_SEGUNDOS
+        )
+
+    async def obtener(self, nombre: str, clave: tuple, modelo: Type[BaseModel],
+                      cargar: Callable[[], Awaitable[list]]) -> Snapshot:
+        snap = self._snapshots.get((nombre, clave))
+        if snap and self._vigente(nombre, snap):
+            return snap
+
+        async with self._lock:
+            snap = self._snapshots.get((nombre, clave))
+            if snap and self._vigente(nombre, snap):
+                return snap
+
+            version = self._versiones.get(nombre, 0)
+            filas = await cargar()
+            cuerpo = TypeAdapter(List[modelo]).dump_json(
+                [modelo.model_validate(dict(f)) for f in filas]
+            )
+            etag = '"' + hashlib.sha1(cuerpo).hexdigest()[:20] + '"'
+            snap = Snapshot(version, cuerpo, etag, time.monotonic())
+            self._snapshots[(nombre, clave)] = snap
+            return snap
+
+
+cache_catalogo = CacheCatalogo()
+
+
+def _etag_coincide(request: Request, etag: str) -> bool:
+    encabezado = request.headers.get("if-none-match")
+    if not encabezado:
+        return False
+    etiquetas = [e.strip().removeprefix("W/") for e in encabezado.split(",")]
+    return "*" in etiquetas or etag in etiquetas
+
+
+async def responder_catalogo(request: Request, nombre: str, clave: tuple, modelo: Type[BaseModel],
+                             cargar: Callable[[], Awaitable[list]]) -> Response:
+    """Respuesta de un catálogo desde la caché, con ETag y 304 si el cliente ya lo tiene."""
+    snap = await cache_catalogo.obtener(nombre, clave, modelo, cargar)
+    encabezados = {"ETag": snap.etag, "Cache-Control": "no-cache"}
+    if _etag_coincide(request, snap.etag):
+        return Response(status_code=304, headers=encabezados)
+    return Response(content=snap.cuerpo, media_type="application/json", headers=encabezados)
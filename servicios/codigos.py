@@ -0,0 +1,80 @@
+# servicios/codigos.py
+
+import asyncio
+import os
+import time
+from typing import Dict, Optional
+
+from sqlalchemy import select
+
+from database import database
+from models import producto
+
+# Las escrituras de este proceso actualizan el índice al momento; el TTL acota
+# lo que tarda en verse un cambio de precio, baja o código hecho en otro worker.
+CODIGOS_TTL_SEGUNDOS = float(os.getenv("CODIGOS_TTL_SEGUNDOS", "60"))
+
+class IndiceCodigos:
+    """
+    Código de barras / SKU -> producto activo, en memoria.
+
+    Se carga al arrancar, cada escritura de productos.py lo actualiza y se
+    recarga completo cada CODIGOS_TTL_SEGUNDOS, así que un escaneo se resuelve
+    sin ir a la base. Si dos productos comparten código de barras gana el de
+    id más alto (el último dado de alta).
+    """
+
+    def __init__(self):
+        self._por_codigo: Dict[str, dict] = {}
+        self._por_sku: Dict[str, dict] = {}
+        self._por_id: Dict[int, dict] = {}
+        self._cargado_en: Optional[float] = None
+        self._lock = asyncio.Lock()
+
+    async def cargar(self):
+        """Reconstruye el índice con todos los productos activos."""
+        query = select(producto).where(producto.c.activo == True).order_by(producto.c.id)
+        filas = await database.fetch_all(query)
+        self._por_codigo, self._por_sku, self._por_id = {}, {}, {}
+        for f in filas:
+            self.actualizar(dict(f))
+        self._cargado_en = time.monotonic()
+
+    async def asegurar_cargado(self):
+        vigente = (
+            self._cargado_en is not None
+            and time.monotonic() - self._cargado_en < CODIGOS_TTL_SEGUNDOS
+        )
+        if vigente:
+            return
+        async with self._lock:
+            # Otro request pudo haber recargado mientras esperábamos el lock
+            if self._cargado_en is None or time.monotonic() - self._cargado_en >= CODIGOS_TTL_SEGUNDOS:
+                await self.cargar()
+
+    def actualizar(self, prod: dict):
+        """Agrega o reemplaza un producto (si quedó inactivo, lo quita)."""
+        self.quitar(prod["id"])
+        if prod.get("activo") is False:
+            return
+        self._por_id[prod["id"]] = prod
+        if prod.get("codigo_barras"):
+            self._por_codigo[prod["codigo_barras"]] = prod
+        if prod.get("sku"):
+            self._por_sku[prod["sku"]] = prod
+
+    def quitar(self, producto_id: int):
+        anterior = self._por_id.pop(producto_id, None)
+        if not anterior:
+            return
+        if self._por_codigo.get(anterior.get("codigo_barras")) is anterior:
+            del self._por_codigo[anterior["codigo_barras"]]
+        if self._por_sku.get(anterior.get("sku")) is anterior:
+            del self._por_sku[anterior["sku"]]
+
+    def buscar(self, codigo: str) -> Optional[dict]:
+        """Producto por código de barras o, si no, por SKU."""
+        return self._por_codigo.get(codigo) or self._por_sku.get(codigo)
+
+
+indice_codigos = IndiceCodigos()
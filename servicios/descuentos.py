@@ -0,0 +1,91 @@
+# servicios/descuentos.py
+
+import asyncio
+import os
+import time
+from typing import Optional
+
+from sqlalchemy import select
+
+from database import database
+from models import regla_descuento
+
+# Segundos que puede vivir el índice sin recargarse. Las escrituras hechas en
+# este proceso lo invalidan al momento; el TTL cubre a los demás workers.
+DESCUENTOS_TTL_SEGUNDOS = float(os.getenv("DESCUENTOS_TTL_SEGUNDOS", "300"))
+
+
+class MotorDescuentos:
+    """
+    Índice en memoria de las reglas activas de `regla_descuento`.
+
+    Guarda el mejor porcentaje por (cliente_id, producto_id) y por
+    (cliente_id, marca_id); cliente_id None significa "cualquier cliente".
+    Resolver el descuento de una línea son cuatro búsquedas en diccionario.
+    """
+
+    def __init__(self):
+        self._por_producto = {}
+        self._por_marca = {}
+        self._cargado_en: Optional[float] = None
+        # Sube con cada invalidar(): una carga que empezó antes de una escritura no se queda
+        self._version = 0
+        self._lock = asyncio.Lock()
+
+    async def cargar(self) -> bool:
+        """
+        Lee todas las reglas activas y reconstruye los índices. Si invalidar()
+        corrió mientras se leía, lo leído puede ser de antes de la escritura:
+        se descarta y devuelve False.
+        """
+        version = self._version
+        query = select(regla_descuento).where(regla_descuento.c.activo == True)
+        reglas = await database.fetch_all(query)
+        if version != self._version:
+            return False
+
+        por_producto, por_marca = {}, {}
+        for r in reglas:
+            pct = float(r['descuento_porcentaje'])
+            # Igual que el filtro SQL original: una regla aplica por producto O por marca
+            if r['producto_id'] is not None:
+                clave = (r['cliente_id'], r['producto_id'])
+                por_producto[clave] = max(pct, por_producto.get(clave, 0.0))
+            if r['marca_id'] is not None:
+                clave = (r['cliente_id'], r['marca_id'])
+                por_marca[clave] = max(pct, por_marca.get(clave, 0.0))
+
+        self._por_producto, self._por_marca = por_producto, por_marca
+        self._cargado_en = time.monotonic()
+        return True
+
+    def invalidar(self):
+        """Marca el índice como viejo; se recarga en el siguiente uso."""
+        self._version += 1
+        self._cargado_en = None
+
+    async def asegurar_cargado(self):
+        vigente = (
+            self._cargado_en is not None
+            and time.monotonic() - self._cargado_en < DESCUENTOS_TTL_SEGUNDOS
+        )
+        if vigente:
+            return
+        async with self._lock:
+            # Otro request pudo haber recargado mientras esperábamos el lock;
+            # si una escritura invalidó a media carga, se vuelve a leer
+            while self._cargado_en is None or time.monotonic() - self._cargado_en >= DESCUENTOS_TTL_SEGUNDOS:
+                await self.cargar()
+
+    def mejor_descuento(self, cliente_id: Optional[int], producto_id: int, marca_id: Optional[int]) -> float:
+        """Porcentaje de la mejor regla para la línea (0.0 si ninguna aplica)."""
+        clientes = [None, cliente_id] if cliente_id else [None]
+        mejor = 0.0
+        for c in clientes:
+            mejor = max(mejor, self._por_producto.get((c, producto_id), 0.0))
+            if marca_id is not None:
+                mejor = max(mejor, self._por_marca.get((c, marca_id), 0.0))
+        return mejor
+
+
+motor_descuentos = MotorDescuentos()
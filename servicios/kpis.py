@@ -0,0 +1,101 @@
+# servicios/kpis.py
+#
+# Contadores de negocio para GET /metrics. Se actualizan en memoria en el
+# momento de la venta / cancelación, así que leerlos no cuesta ninguna
+# consulta. Son por worker: Prometheus suma los contadores de todos.
+# La excepción son los cortes abiertos: es un estado de toda la base, no algo
+# que un worker pueda contar, así que se lee de corte_caja (cacheado).
+
+import asyncio
+import os
+import time
+from collections import defaultdict
+from typing import Dict, Optional
+
+from sqlalchemy import select, func
+
+from database import database
+from models import corte_caja, sucursal
+
+LOOP_INTERVALO_SEGUNDOS = float(os.getenv("LOOP_INTERVALO_SEGUNDOS", "0.5"))
+# Cada cuánto se vuelve a contar corte_caja para /metrics (abrir o cerrar en este worker invalida)
+CORTES_CACHE_SEGUNDOS = float(os.getenv("CORTES_CACHE_SEGUNDOS", "15"))
+
+
+class Kpis:
+    def __init__(self):
+        self.ventas = defaultdict(int)              # sucursal_id -> tickets
+        self.ventas_monto = defaultdict(float)      # sucursal_id -> pesos
+        self.cancelaciones = defaultdict(int)
+        self.cancelaciones_monto = defaultdict(float)
+        self.agotados = defaultdict(int)            # productos que una venta dejó en 0 o menos
+        self._cortes_abiertos: Dict[int, int] = {}
+        self._cortes_leidos_en: Optional[float] = None
+
+    def venta(self, sucursal_id: int, total: float, movimientos: dict):
+        self.ventas[sucursal_id] += 1
+        self.ventas_monto[sucursal_id] += total
+        # movimientos = {producto_id: (anterior, nueva)} de mover_stock
+        self.agotados[sucursal_id] += sum(
+            1 for anterior, nueva in movimientos.values() if anterior > 0 >= nueva
+        )
+
+    def cancelacion(self, sucursal_id: int, total: float):
+        self.cancelaciones[sucursal_id] += 1
+        self.cancelaciones_monto[sucursal_id] += total
+
+    def invalidar_cortes(self):
+        """Un turno se abrió o cerró en este worker: el siguiente /metrics vuelve a contar."""
+        self._cortes_leidos_en = None
+
+    async def cortes_abiertos(self) -> Dict[int, int]:
+        """
+        Turnos abiertos por sucursal en toda la base (fecha_cierre IS NULL).
+        Cada worker reporta el mismo total: se agrega con max, no con sum.
+        """
+        vigente = (
+            self._cortes_leidos_en is not None
+            and time.monotonic() - self._cortes_leidos_en < CORTES_CACHE_SEGUNDOS
+        )
+        if not vigente:
+            # Desde sucursal: las que ya no tienen turnos abiertos reportan 0, no desaparecen
+            query = select(
+                sucursal.c.id, func.count(corte_caja.c.id).label("abiertos")
+            ).select_from(
+                sucursal.outerjoin(
+                    corte_caja, (corte_caja.c.sucursal_id == sucursal.c.id) & (corte_caja.c.fecha_cierre == None)
+                )
+            ).group_by(sucursal.c.id)
+            self._cortes_abiertos = {r["id"]: r["abiertos"] for r in await database.fetch_all(query)}
+            self._cortes_leidos_en = time.monotonic()
+        return self._cortes_abiertos
+
+
+kpis = Kpis()
+
+
+class MonitorLoop:
+    """
+    Retraso del event loop: una corrutina que duerme LOOP_INTERVALO_SEGUNDOS
+    y mide cuánto tarde despertó. Si algo bloquea el loop (bcrypt, un cálculo
+    pesado), aquí se ve antes que en la latencia de las cajas.
+    """
+
+    def __init__(self):
+        self.ultimo = 0.0
+        self.maximo = 0.0
+        self.suma = 0.0
+        self.muestras = 0
+
+    async def tarea(self):
+        while True:
+            inicio = time.perf_counter()
+            await asyncio.sleep(LOOP_INTERVALO_SEGUNDOS)
+            retraso = max(0.0, time.perf_counter() - inicio - LOOP_INTERVALO_SEGUNDOS)
+            self.ultimo = retraso
+            self.maximo = max(self.maximo, retraso)
+            self.suma += retraso
+            self.muestras += 1
+
+
+monitor_loop = MonitorLoop()
@@ -0,0 +1,130 @@
+# servicios/metricas.py
+#
+# Cuántas consultas hace cada request y cuánto tiempo pasa en la base.
+# DatabaseMedida (database.py) anota cada consulta en la medición del request
+# en curso (contextvar) y el middleware de main.py la cierra, pone el
+# Server-Timing y la suma al histograma de su ruta (GET /interno/rutas).
+
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+# Límites superiores (ms) de las cubetas de latencia
+CUBETAS_MS = [5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000]
+# Límites de consultas por request: un N+1 se ve como requests cayendo a la derecha
+CUBETAS_CONSULTAS = [0, 1, 2, 3, 5, 10, 20, 50, 100]
+
+
+@dataclass
+class MedicionRequest:
+    consultas: int = 0
+    tiempo_db: float = 0.0
+    mas_lenta: float = 0.0
+    consulta_mas_lenta: Any = None
+
+    def anotar(self, query, duracion: float):
+        self.consultas += 1
+        self.tiempo_db += duracion
+        if duracion > self.mas_lenta:
+            self.mas_lenta = duracion
+            self.consulta_mas_lenta = query
+
+
+medicion_actual: ContextVar[Optional[MedicionRequest]] = ContextVar("medicion_actual", default=None)
+
+
+def anotar_consulta(query, inicio: float):
+    """Lo llama database.py al terminar cada consulta (fuera de un request no hace nada)."""
+    medicion = medicion_actual.get()
+    if medicion is not None:
+        medicion.anotar(query, time.perf_counter() - inicio)
+
+
+def _texto_sql(query) -> str:
+    texto = query if isinstance(query, str) else str(query)
+    texto = " ".join(texto.split())
+    return texto[:300]
+
+
+def _cubeta(limites: List[float], valor: float) -> int:
+    # Índice de la primera cubeta con límite >= valor (la última es +Inf)
+    return bisect_left(limites, valor)
+
+
+@dataclass
+class EstadisticaRuta:
+    router: str = ""
+    requests: int = 0
+    errores: int = 0
+    duracion_total_ms: float = 0.0
+    db_total_ms: float = 0.0
+    consultas_total: int = 0
+    consultas_max: int = 0
+    cubetas_ms: List[int] = field(default_factory=lambda: [0] * (len(CUBETAS_MS) + 1))
+    cubetas_consultas: List[int] = field(default_factory=lambda: [0] * (len(CUBETAS_CONSULTAS) + 1))
+    consulta_mas_lenta_ms: float = 0.0
+    consulta_mas_lenta: str = ""
+
+
+class MetricasRutas:
+    """Histogramas por ruta (plantilla, p. ej. 'GET /ventas/{id}'), en memoria de este worker."""
+
+    def __init__(self):
+        self._rutas: Dict[str, EstadisticaRuta] = {}
+
+    def registrar(self, ruta: str, router: str, status: int, duracion: float, medicion: MedicionRequest):
+        est = self._rutas.get(ruta)
+        if est is None:
+            est = self._rutas[ruta] = EstadisticaRuta(router=router)
+        duracion_ms = duracion * 1000
+        est.requests += 1
+        if status >= 500:
+            est.errores += 1
+        est.duracion_total_ms += duracion_ms
+        est.db_total_ms += medicion.tiempo_db * 1000
+        est.consultas_total += medicion.consultas
+        est.consultas_max = max(est.consultas_max, medicion.consultas)
+        est.cubetas_ms[_cubeta(CUBETAS_MS, duracion_ms)] += 1
+        est.cubetas_consultas[_cubeta(CUBETAS_CONSULTAS, medicion.consultas)] += 1
+        if medicion.mas_lenta * 1000 > est.consulta_mas_lenta_ms:
+            # El SQL solo se arma cuando hay un nuevo récord
+            est.consulta_mas_lenta_ms = medicion.mas_lenta * 1000
+            est.consulta_mas_lenta = _texto_sql(medicion.consulta_mas_lenta)
+
+    def rutas(self) -> Dict[str, EstadisticaRuta]:
+        return self._rutas
+
+    def resumen(self) -> List[dict]:
+        etiquetas_ms = [f"<={c}" for c in CUBETAS_MS] + ["+Inf"]
+        etiquetas_consultas = [f"<={c}" for c in CUBETAS_CONSULTAS] + ["+Inf"]
+        filas = []
+        for ruta, est in self._rutas.items():
+            filas.append({
+                "ruta": ruta,
+                "router": est.router,
+                "requests": est.requests,
+                "errores": est.errores,
+                "duracion_promedio_ms": round(est.duracion_total_ms / est.requests, 2),
+                "db_promedio_ms": round(est.db_total_ms / est.requests, 2),
+                "consultas_promedio": round(est.consultas_total / est.requests, 2),
+                "consultas_max": est.consultas_max,
+                "histograma_ms": dict(zip(etiquetas_ms, est.cubetas_ms)),
+                "histograma_consultas": dict(zip(etiquetas_consultas, est.cubetas_consultas)),
+                "consulta_mas_lenta_ms": round(est.consulta_mas_lenta_ms, 2),
+                "consulta_mas_lenta": est.consulta_mas_lenta,
+            })
+        # Las que más consultas hacen por request primero (candidatas a N+1)
+        return sorted(filas, key=lambda f: f["consultas_promedio"], reverse=True)
+
+
+metricas_rutas = MetricasRutas()
+
+
+def server_timing(medicion: MedicionRequest, duracion: float) -> str:
+    return ", ".join([
+        f'db;dur={medicion.tiempo_db * 1000:.1f};desc="{medicion.consultas} consultas"',
+        f'db-max;dur={medicion.mas_lenta * 1000:.1f};desc="consulta mas lenta"',
+        f"total;dur={duracion * 1000:.1f}",
+    ])
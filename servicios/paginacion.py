@@ -0,0 +1,22 @@
+# servicios/paginacion.py
+#
+# Cursor opaco para paginar por (fecha, id) de la más reciente a la más vieja:
+# la siguiente página sigue con WHERE (fecha, id) < cursor sobre el índice,
+# sin OFFSET. Viaja en el header X-Siguiente-Cursor.
+
+import base64
+from datetime import datetime
+
+from fastapi import HTTPException
+
+
+def codificar_cursor(fecha: datetime, id: int) -> str:
+    return base64.urlsafe_b64encode(f"{fecha.isoformat()}|{id}".encode()).decode()
+
+
+def decodificar_cursor(cursor: str):
+    try:
+        fecha_iso, id = base64.urlsafe_b64decode(cursor.encode()).decode().rsplit("|", 1)
+        return datetime.fromisoformat(fecha_iso), int(id)
+    except ValueError:
+        raise HTTPException(400, "Cursor inválido")
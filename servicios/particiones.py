@@ -0,0 +1,196 @@
+# servicios/particiones.py
+#
+# Mantenimiento de las particiones mensuales de venta, venta_detalle e
+# historial_inventario (migración 5a9c3e1f7b42). Cada mes (en UTC) es una
+# tabla <tabla>_YYYY_MM y <tabla>_default recoge lo que caiga fuera.
+# - Los meses que vienen se crean por adelantado: al arrancar la app y una vez
+#   al día (tarea_particiones). Si una fila cae en la DEFAULT, ese mes ya no se
+#   puede crear hasta sacarla de ahí: por eso se crean antes de que lleguen.
+# - Retención: los meses más viejos que N se desprenden (quedan como tablas
+#   sueltas para respaldarlas con pg_dump) y, si se pide, se borran.
+#
+# Uso:
+#   python -m servicios.particiones                       # crea los meses que falten
+#   python -m servicios.particiones --listar
+#   python -m servicios.particiones --retener-meses 60 [--borrar]
+
+import argparse
+import asyncio
+import logging
+import os
+import re
+from datetime import datetime, timezone
+from typing import List, Optional, Tuple
+
+from database import database
+
+logger = logging.getLogger(__name__)
+
+# venta_detalle va antes que venta: al desprender, el detalle suelta primero su FK
+TABLAS_PARTICIONADAS = ["venta_detalle", "venta", "historial_inventario"]
+PARTICIONES_MESES_ADELANTE = int(os.getenv("PARTICIONES_MESES_ADELANTE", "3"))
+PARTICIONES_REVISION_SEGUNDOS = float(os.getenv("PARTICIONES_REVISION_SEGUNDOS", str(24 * 3600)))
+
+_MES = re.compile(r"_(\d{4})_(\d{2})$")
+
+
+def inicio_mes(fecha: datetime) -> datetime:
+    fecha = fecha.astimezone(timezone.utc)
+    return datetime(fecha.year, fecha.month, 1, tzinfo=timezone.utc)
+
+
+def sumar_meses(mes: datetime, n: int) -> datetime:
+    total = mes.year * 12 + mes.month - 1 + n
+    return datetime(total // 12, total % 12 + 1, 1, tzinfo=timezone.utc)
+
+
+def nombre_particion(tabla: str, mes: datetime) -> str:
+    return f"{tabla}_{mes:%Y_%m}"
+
+
+def mes_de_particion(nombre: str) -> Optional[datetime]:
+    """'venta_2026_10' -> 2026-10-01 UTC; None para la DEFAULT."""
+    m = _MES.search(nombre)
+    return datetime(int(m.group(1)), int(m.group(2)), 1, tzinfo=timezone.utc) if m else None
+
+
+def sentencias_crear(tabla: str, desde: datetime, hasta: datetime, existentes=()) -> List[Tuple[str, str]]:
+    """(nombre, DDL) de los meses entre `desde` y `hasta` (inclusive) que no estén en `existentes`, más la DEFAULT."""
+    sentencias = []
+    mes = inicio_mes(desde)
+    while mes <= hasta:
+        nombre = nombre_particion(tabla, mes)
+        if nombre not in existentes:
+            sentencias.append((nombre,
+                f"CREATE TABLE IF NOT EXISTS {nombre} PARTITION OF {tabla} "
+                f"FOR VALUES FROM ('{mes.isoformat()}') TO ('{sumar_meses(mes, 1).isoformat()}')"
+            ))
+        mes = sumar_meses(mes, 1)
+    if f"{tabla}_default" not in existentes:
+        sentencias.append((f"{tabla}_default", f"CREATE TABLE IF NOT EXISTS {tabla}_default PARTITION OF {tabla} DEFAULT"))
+    return sentencias
+
+
+async def listar_particiones() -> List[dict]:
+    """Particiones de las tablas particionadas, con filas estimadas y tamaño."""
+    filas = await database.fetch_all(
+        """
+        SELECT padre.relname AS tabla, hija.relname AS particion,
+               pg_get_expr(hija.relpartbound, hija.oid) AS limites,
+               greatest(hija.reltuples, 0)::bigint AS filas_estimadas,
+               pg_total_relation_size(hija.oid) AS bytes
+        FROM pg_inherits i
+        JOIN pg_class padre ON padre.oid = i.inhparent
+        JOIN pg_class hija ON hija.oid = i.inhrelid
+        WHERE padre.relname = ANY(:tablas) AND padre.relkind = 'p'
+        ORDER BY padre.relname, hija.relname
+        """,
+        {"tablas": TABLAS_PARTICIONADAS}
+    )
+    return [dict(f) for f in filas]
+
+
+async def _tablas_particionadas() -> List[str]:
+    # Con una base sin migrar (tablas normales) no hay nada que mantener
+    filas = await database.fetch_all(
+        "SELECT relname FROM pg_class WHERE relkind = 'p' AND relname = ANY(:tablas)",
+        {"tablas": TABLAS_PARTICIONADAS}
+    )
+    nombres = {f["relname"] for f in filas}
+    return [t for t in TABLAS_PARTICIONADAS if t in nombres]
+
+
+async def asegurar_particiones(meses_adelante: int = PARTICIONES_MESES_ADELANTE, ahora: datetime = None) -> List[str]:
+    """Crea el mes en curso y los `meses_adelante` siguientes que falten. Devuelve los creados."""
+    ahora = ahora or datetime.now(timezone.utc)
+    existentes = {p["particion"] for p in await listar_particiones()}
+    creadas = []
+    for tabla in await _tablas_particionadas():
+        for nombre, sql in sentencias_crear(tabla, ahora, sumar_meses(inicio_mes(ahora), meses_adelante), existentes):
+            await database.execute(sql)
+            creadas.append(nombre)
+    return creadas
+
+
+async def filas_en_default() -> dict:
+    """Filas que cayeron en cada DEFAULT (debería ser 0: si no, falta crear ese mes)."""
+    return {
+        tabla: await database.fetch_val(f"SELECT count(*) FROM {tabla}_default")
+        for tabla in await _tablas_particionadas()
+    }
+
+
+async def desprender_anteriores(retener_meses: int, borrar: bool = False, ahora: datetime = None) -> List[str]:
+    """
+    Desprende los meses que terminaron hace más de `retener_meses` meses; con
+    borrar=True además los elimina. La DEFAULT nunca se toca.
+    """
+    corte = sumar_meses(inicio_mes(ahora or datetime.now(timezone.utc)), -retener_meses)
+    particiones = await listar_particiones()
+    acciones = []
+    async with database.transaction():
+        for tabla in await _tablas_particionadas():
+            for p in particiones:
+                mes = mes_de_particion(p["particion"])
+                if p["tabla"] != tabla or mes is None or mes >= corte:
+                    continue
+                await database.execute(f"ALTER TABLE {tabla} DETACH PARTITION {p['particion']}")
+                if tabla == "venta_detalle":
+                    # Suelto, el detalle ya no apunta a venta (si no, venta no se podría desprender)
+                    await database.execute(
+                        f"ALTER TABLE {p['particion']} DROP CONSTRAINT IF EXISTS venta_detalle_venta_id_fkey"
+                    )
+                if borrar:
+                    await database.execute(f"DROP TABLE {p['particion']}")
+                    acciones.append(f"borrada {p['particion']}")
+                else:
+                    acciones.append(f"desprendida {p['particion']}")
+    return acciones
+
+
+async def tarea_particiones():
+    """Bucle de fondo: revisa una vez al día que existan los meses que vienen."""
+    while True:
+        try:
+            creadas = await asegurar_particiones()
+            if creadas:
+                logger.info("Particiones creadas: %s", ", ".join(creadas))
+            for tabla, filas in (await filas_en_default()).items():
+                if filas:
+                    logger.warning("%s_default tiene %s filas fuera de los meses creados", tabla, filas)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("No se pudieron revisar las particiones")
+        await asyncio.sleep(PARTICIONES_REVISION_SEGUNDOS)
+
+
+async def _main():
+    parser = argparse.ArgumentParser(description="Mantenimiento de particiones mensuales")
+    parser.add_argument("--meses-adelante", type=int, default=PARTICIONES_MESES_ADELANTE)
+    parser.add_argument("--listar", action="store_true", help="Solo listar particiones")
+    parser.add_argument("--retener-meses", type=int, default=None,
+                        help="Desprender los meses más viejos que esto (p. ej. 60 = cinco años)")
+    parser.add_argument("--borrar", action="store_true", help="Con --retener-meses: borrar en vez de solo desprender")
+    args = parser.parse_args()
+
+    await database.connect()
+    try:
+        if args.listar:
+            for p in await listar_particiones():
+                print(f"{p['particion']:<40} {p['filas_estimadas']:>12} filas {p['bytes'] / 2**20:>10.1f} MB   {p['limites']}")
+            for tabla, filas in (await filas_en_default()).items():
+                if filas:
+                    print(f"AVISO: {tabla}_default tiene {filas} filas")
+            return
+        for nombre in await asegurar_particiones(args.meses_adelante):
+            print(f"creada {nombre}")
+        if args.retener_meses is not None:
+            for accion in await desprender_anteriores(args.retener_meses, args.borrar):
+                print(accion)
+    finally:
+        await database.disconnect()
+
+
+if __name__ == "__main__":
+    asyncio.run(_main())
@@ -0,0 +1,103 @@
+# servicios/ranking_productos.py
+#
+# Mantiene `venta_producto_diario` para el ranking de productos más vendidos.
+# Una tarea de fondo recalcula los últimos días cada cierto tiempo; para
+# reconstruir un rango más largo (p. ej. después de cancelar ventas viejas):
+#   python -m servicios.ranking_productos --desde 2025-01-01
+
+import argparse
+import asyncio
+import logging
+import os
+from datetime import date, datetime, time, timedelta
+from zoneinfo import ZoneInfo
+
+from sqlalchemy import select, func, cast, Date
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from database import database
+from models import venta, venta_detalle, venta_producto_diario
+from servicios.resumen_ventas import ZONA_LOCAL
+
+logger = logging.getLogger(__name__)
+
+RANKING_REFRESCO_SEGUNDOS = float(os.getenv("RANKING_REFRESCO_SEGUNDOS", "300"))
+RANKING_DIAS_RECIENTES = int(os.getenv("RANKING_DIAS_RECIENTES", "2"))
+
+# Llave del advisory lock: la tarea corre en cada worker y solo uno refresca a la vez
+CANDADO_RANKING = 0x52414E4B  # "RANK"
+
+
+async def refrescar(desde: date, esperar: bool = False) -> bool:
+    """
+    Recalcula el agregado desde el día local `desde` hasta hoy. Si otro
+    proceso ya está refrescando, no hace nada y devuelve False (con
+    esperar=True espera a que termine y refresca después).
+    """
+    zona = ZoneInfo(ZONA_LOCAL)
+    # El filtro va sobre venta.fecha (UTC) para que use el índice por fecha
+    inicio_utc = datetime.combine(desde, time.min, tzinfo=zona)
+    dia = cast(func.timezone(ZONA_LOCAL, venta.c.fecha), Date)
+
+    agregado = select(
+        dia.label("fecha_local"),
+        venta.c.sucursal_id,
+        venta_detalle.c.producto_id,
+        func.sum(venta_detalle.c.cantidad),
+        func.sum(venta_detalle.c.cantidad * venta_detalle.c.precio_unitario)
+    ).select_from(
+        venta_detalle.join(venta)
+    ).where(
+        # La fecha va en las dos tablas para que ambas poden particiones
+        (venta.c.fecha >= inicio_utc) &
+        (venta_detalle.c.fecha >= inicio_utc) &
+        (venta.c.sucursal_id != None) &
+        (venta_detalle.c.producto_id != None)
+    ).group_by(dia, venta.c.sucursal_id, venta_detalle.c.producto_id)
+
+    async with database.transaction():
+        # El candado es de la transacción: se suelta solo al confirmar o revertir
+        if esperar:
+            await database.execute(select(func.pg_advisory_xact_lock(CANDADO_RANKING)))
+        elif not await database.fetch_val(select(func.pg_try_advisory_xact_lock(CANDADO_RANKING))):
+            return False
+        await database.execute(
+            venta_producto_diario.delete().where(venta_producto_diario.c.fecha_local >= desde)
+        )
+        await database.execute(
+            pg_insert(venta_producto_diario).from_select(
+                ["fecha_local", "sucursal_id", "producto_id", "cantidad", "ingreso"],
+                agregado
+            )
+        )
+    return True
+
+
+async def tarea_refresco():
+    """Bucle de fondo: refresca los días recientes cada RANKING_REFRESCO_SEGUNDOS."""
+    while True:
+        try:
+            hoy = datetime.now(ZoneInfo(ZONA_LOCAL)).date()
+            await refrescar(hoy - timedelta(days=RANKING_DIAS_RECIENTES - 1))
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("No se pudo refrescar el ranking de productos")
+        await asyncio.sleep(RANKING_REFRESCO_SEGUNDOS)
+
+
+async def _main():
+    parser = argparse.ArgumentParser(description="Reconstruye venta_producto_diario")
+    parser.add_argument("--desde", type=date.fromisoformat, default=date(2000, 1, 1), help="YYYY-MM-DD (local)")
+    args = parser.parse_args()
+
+    await database.connect()
+    try:
+        await refrescar(args.desde, esperar=True)
+        print("Ranking de productos reconstruido.")
+    finally:
+        await database.disconnect()
+
+
+if __name__ == "__main__":
+    asyncio.run(_main())
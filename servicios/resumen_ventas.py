@@ -0,0 +1,104 @@
+# servicios/resumen_ventas.py
+#
+# Mantiene `venta_resumen_diario` (sucursal, día local, hora).
+# Reconstruir desde la tabla venta:
+#   python -m servicios.resumen_ventas --desde 2025-01-01
+
+import argparse
+import asyncio
+from datetime import date, datetime
+from typing import Optional
+from zoneinfo import ZoneInfo
+
+from sqlalchemy import select, func, cast, extract, Date, Integer, and_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from database import database
+from models import venta, venta_resumen_diario
+
+ZONA_LOCAL = "America/Mexico_City"
+
+
+async def acumular_venta(sucursal_id: int, fecha_utc: datetime, total: float, transacciones: int = 1):
+    """
+    Suma una venta (o la resta, con total y transacciones negativos al cancelar)
+    a la hora local que le toca. Es un upsert: corre dentro de la transacción
+    de la venta y no compite con otras cajas.
+    """
+    local = fecha_utc.astimezone(ZoneInfo(ZONA_LOCAL))
+    query = pg_insert(venta_resumen_diario).values(
+        sucursal_id=sucursal_id,
+        fecha_local=local.date(),
+        hora=local.hour,
+        total_vendido=total,
+        transacciones=transacciones
+    )
+    query = query.on_conflict_do_update(
+        index_elements=["sucursal_id", "fecha_local", "hora"],
+        set_={
+            "total_vendido": venta_resumen_diario.c.total_vendido + query.excluded.total_vendido,
+            "transacciones": venta_resumen_diario.c.transacciones + query.excluded.transacciones
+        }
+    )
+    await database.execute(query)
+
+
+async def totales(sucursal_id: int, desde: date, hasta: date):
+    """Total y número de ventas por día en [desde, hasta], leídos del resumen."""
+    query = select(
+        venta_resumen_diario.c.fecha_local,
+        func.sum(venta_resumen_diario.c.total_vendido).label("total_vendido"),
+        func.sum(venta_resumen_diario.c.transacciones).label("cantidad_transacciones")
+    ).where(
+        and_(
+            venta_resumen_diario.c.sucursal_id == sucursal_id,
+            venta_resumen_diario.c.fecha_local >= desde,
+            venta_resumen_diario.c.fecha_local <= hasta
+        )
+    ).group_by(venta_resumen_diario.c.fecha_local).order_by(venta_resumen_diario.c.fecha_local)
+    return await database.fetch_all(query)
+
+
+async def reconstruir(desde: Optional[date] = None):
+    """Recalcula el resumen desde la tabla venta (todo, o a partir de `desde`)."""
+    fecha_local = func.timezone(ZONA_LOCAL, venta.c.fecha)
+    dia = cast(fecha_local, Date)
+    hora = cast(extract("hour", fecha_local), Integer)
+
+    agregado = select(
+        venta.c.sucursal_id,
+        dia.label("fecha_local"),
+        hora.label("hora"),
+        func.sum(venta.c.total),
+        func.count()
+    ).where(venta.c.sucursal_id != None).group_by(venta.c.sucursal_id, dia, hora)
+
+    borrar = venta_resumen_diario.delete()
+    if desde:
+        agregado = agregado.where(dia >= desde)
+        borrar = borrar.where(venta_resumen_diario.c.fecha_local >= desde)
+
+    insertar = pg_insert(venta_resumen_diario).from_select(
+        ["sucursal_id", "fecha_local", "hora", "total_vendido", "transacciones"],
+        agregado
+    )
+    async with database.transaction():
+        await database.execute(borrar)
+        await database.execute(insertar)
+
+
+async def _main():
+    parser = argparse.ArgumentParser(description="Reconstruye venta_resumen_diario")
+    parser.add_argument("--desde", type=date.fromisoformat, default=None, help="YYYY-MM-DD (local)")
+    args = parser.parse_args()
+
+    await database.connect()
+    try:
+        await reconstruir(args.desde)
+        print("Resumen de ventas reconstruido.")
+    finally:
+        await database.disconnect()
+
+
+if __name__ == "__main__":
+    asyncio.run(_main())
@@ -0,0 +1,210 @@
+# servicios/snapshots.py
+#
+# Fotos nocturnas del stock (`inventario_snapshot`): una fila por sucursal y
+# producto con lo que había al cierre del día local, valuada a precio_base.
+# Cada foto sale de la anterior más el último movimiento del día de cada
+# producto en historial_inventario, así que tomarla lee un solo día de
+# movimientos (una partición). El stock a cualquier momento es la foto del día
+# anterior más lo que se movió desde su cierre: a lo mucho un día de historial.
+#
+# Una tarea de fondo se pone al corriente con los días que falten. Para
+# rehacer fotos (p. ej. después de corregir historial viejo):
+#   python -m servicios.snapshots --desde 2026-10-01
+
+import argparse
+import asyncio
+import logging
+import os
+from datetime import date, datetime, time, timedelta
+from typing import Optional
+from zoneinfo import ZoneInfo
+
+from sqlalchemy import select, func, desc, literal, case, cast, false, Date
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from database import database
+from models import inventario_snapshot, historial_inventario, producto
+from servicios.resumen_ventas import ZONA_LOCAL
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_REVISION_SEGUNDOS = float(os.getenv("SNAPSHOT_REVISION_SEGUNDOS", "3600"))
+
+
+def cierre_dia(dia: date) -> datetime:
+    """Instante en que termina el día local `dia` (las 00:00 del siguiente, hora de la tienda)."""
+    return datetime.combine(dia + timedelta(days=1), time.min, tzinfo=ZoneInfo(ZONA_LOCAL))
+
+
+def valor_inventario(cantidad, precio_base):
+    """
+    Importe de `cantidad` (unidad de inventario) a precio_base, que es por unidad de venta.
+    Sin contenido_neto válido (0 o NULL, p. ej. de una carga masiva) vale 0: un
+    NULL tumbaría el INSERT de la foto de todas las sucursales.
+    """
+    return func.coalesce(func.round(
+        case(
+            (producto.c.unidad_medida.in_(["kg", "lt"]), cantidad * precio_base),
+            else_=cantidad / func.nullif(producto.c.contenido_neto, 0) * precio_base
+        ), 2
+    ), 0)
+
+
+def _stock(condicion_historial, foto: Optional[date], sucursal_id: Optional[int] = None):
+    """
+    (sucursal_id, producto_id, cantidad, precio_foto, ultimo_movimiento): las
+    filas de la foto `foto` (si hay) con el último movimiento de cada producto
+    que cumpla `condicion_historial` encima. precio_foto es NULL si el producto
+    no estaba en la foto; ultimo_movimiento, si no se movió desde ella.
+    """
+    h = historial_inventario
+    movs = select(
+        h.c.sucursal_id, h.c.producto_id, h.c.cantidad_nueva.label("cantidad"), h.c.fecha
+    ).where(condicion_historial)
+    if sucursal_id is not None:
+        movs = movs.where(h.c.sucursal_id == sucursal_id)
+    # El último es el de mayor id, no el de mayor fecha: la fecha la pone quien
+    # llama antes de tomar el candado del inventario, y dos cajas pueden confirmar
+    # en orden contrario a su fecha. El id sale de nextval con el candado tomado,
+    # así que sigue el orden real; la fecha solo acota la ventana.
+    movs = movs.distinct(h.c.sucursal_id, h.c.producto_id).order_by(
+        h.c.sucursal_id, h.c.producto_id, desc(h.c.id)
+    ).cte("movs")
+
+    s = inventario_snapshot
+    base = select(s.c.sucursal_id, s.c.producto_id, s.c.cantidad, s.c.precio_base).where(
+        s.c.fecha_local == foto if foto is not None else false()
+    )
+    if sucursal_id is not None:
+        base = base.where(s.c.sucursal_id == sucursal_id)
+    base = base.cte("base")
+
+    return select(
+        func.coalesce(movs.c.sucursal_id, base.c.sucursal_id).label("sucursal_id"),
+        func.coalesce(movs.c.producto_id, base.c.producto_id).label("producto_id"),
+        func.coalesce(movs.c.cantidad, base.c.cantidad).label("cantidad"),
+        base.c.precio_base.label("precio_foto"),
+        movs.c.fecha.label("ultimo_movimiento")
+    ).select_from(
+        base.outerjoin(
+            movs,
+            (movs.c.sucursal_id == base.c.sucursal_id) & (movs.c.producto_id == base.c.producto_id),
+            full=True
+        )
+    ).subquery("stock")
+
+
+async def ultima_foto(antes_de: date, sucursal_id: Optional[int] = None) -> Optional[date]:
+    """Día de la foto más reciente anterior a `antes_de`."""
+    s = inventario_snapshot
+    query = select(func.max(s.c.fecha_local)).where(s.c.fecha_local < antes_de)
+    if sucursal_id is not None:
+        query = query.where(s.c.sucursal_id == sucursal_id)
+    return await database.fetch_val(query)
+
+
+async def tomar_snapshot(dia: date):
+    """
+    Foto del cierre del día local `dia` para todas las sucursales, desde la
+    foto anterior y los movimientos posteriores a ella (sin foto anterior,
+    desde todo el historial: solo la primera vez). Rehacerla la sobrescribe.
+    """
+    h = historial_inventario
+    anterior = await ultima_foto(dia)
+    condicion = h.c.fecha < cierre_dia(dia)
+    if anterior is not None:
+        condicion &= h.c.fecha >= cierre_dia(anterior)
+    stock = _stock(condicion, anterior)
+
+    fuente = select(
+        cast(literal(dia), Date),
+        stock.c.sucursal_id,
+        stock.c.producto_id,
+        stock.c.cantidad,
+        producto.c.precio_base,
+        valor_inventario(stock.c.cantidad, producto.c.precio_base)
+    ).select_from(stock.join(producto, producto.c.id == stock.c.producto_id))
+
+    query = pg_insert(inventario_snapshot).from_select(
+        ["fecha_local", "sucursal_id", "producto_id", "cantidad", "precio_base", "valor"], fuente
+    )
+    query = query.on_conflict_do_update(
+        index_elements=["fecha_local", "sucursal_id", "producto_id"],
+        set_={c: query.excluded[c] for c in ("cantidad", "precio_base", "valor")}
+    )
+    await database.execute(query)
+
+
+async def ponerse_al_corriente(desde: Optional[date] = None):
+    """Toma las fotos que falten hasta ayer (o rehace desde `desde`). Devuelve los días tomados."""
+    ayer = datetime.now(ZoneInfo(ZONA_LOCAL)).date() - timedelta(days=1)
+    if desde is None:
+        ultima = await ultima_foto(ayer + timedelta(days=1))
+        # Sin ninguna foto se arranca con la de ayer
+        desde = ultima + timedelta(days=1) if ultima is not None else ayer
+    dias = []
+    dia = desde
+    while dia <= ayer:
+        await tomar_snapshot(dia)
+        dias.append(dia)
+        dia += timedelta(days=1)
+    return dias
+
+
+async def stock_al_momento(sucursal_id: int, momento: datetime, producto_id: Optional[int] = None):
+    """
+    Stock y valor por producto en `momento`: la foto más reciente cerrada
+    antes de él más el último movimiento de cada producto desde su cierre.
+    Lo que estaba en la foto se valúa al precio de la foto; lo demás, al actual.
+    """
+    h = historial_inventario
+    foto = await ultima_foto(momento.astimezone(ZoneInfo(ZONA_LOCAL)).date(), sucursal_id)
+    condicion = h.c.fecha <= momento
+    if foto is not None:
+        condicion &= h.c.fecha >= cierre_dia(foto)
+    stock = _stock(condicion, foto, sucursal_id)
+
+    precio = func.coalesce(stock.c.precio_foto, producto.c.precio_base)
+    query = select(
+        stock.c.producto_id,
+        producto.c.nombre,
+        stock.c.cantidad,
+        stock.c.ultimo_movimiento,
+        precio.label("precio_base"),
+        valor_inventario(stock.c.cantidad, precio).label("valor")
+    ).select_from(stock.join(producto, producto.c.id == stock.c.producto_id))
+    if producto_id is not None:
+        query = query.where(stock.c.producto_id == producto_id)
+    query = query.order_by(producto.c.nombre)
+    return foto, await database.fetch_all(query)
+
+
+async def tarea_snapshots():
+    """Bucle de fondo: cada SNAPSHOT_REVISION_SEGUNDOS toma las fotos que falten."""
+    while True:
+        try:
+            dias = await ponerse_al_corriente()
+            if dias:
+                logger.info("Fotos de inventario tomadas: %s", ", ".join(d.isoformat() for d in dias))
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("No se pudo tomar la foto de inventario")
+        await asyncio.sleep(SNAPSHOT_REVISION_SEGUNDOS)
+
+
+async def _main():
+    parser = argparse.ArgumentParser(description="Toma o rehace las fotos de inventario hasta ayer")
+    parser.add_argument("--desde", type=date.fromisoformat, default=None, help="YYYY-MM-DD (local)")
+    args = parser.parse_args()
+
+    await database.connect()
+    try:
+        dias = await ponerse_al_corriente(args.desde)
+        print(f"{len(dias)} fotos tomadas.")
+    finally:
+        await database.disconnect()
+
+
+if __name__ == "__main__":
+    asyncio.run(_main())
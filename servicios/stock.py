@@ -0,0 +1,161 @@
+# servicios/stock.py
+
+from datetime import datetime, timezone
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import select, cast, DateTime, Integer, Numeric, Text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from database import database, tabla_valores
+from models import inventario, historial_inventario
+
+# Resultado por producto: (cantidad_anterior, cantidad_nueva)
+Movimientos = Dict[int, Tuple[float, float]]
+
+
+async def mover_stock(sucursal_id: int, deltas: Dict[int, float], ahora: Optional[datetime] = None,
+                      tipo_movimiento: Optional[str] = None, usuario_id: Optional[int] = None,
+                      motivo: Optional[str] = None) -> Movimientos:
+    """
+    Suma `deltas[producto_id]` (negativo = salida) al inventario de la sucursal.
+
+    Es un solo upsert para todos los productos: `INSERT ... ON CONFLICT
+    (producto_id, sucursal_id) DO UPDATE SET cantidad = cantidad + delta
+    RETURNING`. El cambio se aplica dentro de PostgreSQL, así que dos cajas
+    vendiendo lo mismo a la vez no se pisan, y los productos sin registro se crean.
+
+    Con `tipo_movimiento` (VENTA, CANCELACION, COMPRA...) el upsert va en un
+    CTE y la misma sentencia escribe una fila de historial_inventario por
+    producto con la cantidad anterior y la nueva que devolvió el upsert.
+    """
+    deltas = {pid: float(d) for pid, d in deltas.items()}
+    if not deltas:
+        return {}
+    ahora = ahora or datetime.now(timezone.utc)
+
+    movs = select(
+        tabla_valores(
+            "movs",
+            producto_id=(Integer, list(deltas.keys())),
+            delta=(Numeric, list(deltas.values()))
+        )
+    ).cte("movs")
+    query = pg_insert(inventario).from_select(
+        ["producto_id", "sucursal_id", "cantidad", "fecha_actualizacion"],
+        select(
+            movs.c.producto_id,
+            cast(sucursal_id, Integer),
+            movs.c.delta,
+            cast(ahora, DateTime(timezone=True))
+        )
+    )
+    query = query.on_conflict_do_update(
+        constraint="uq_inventario_producto_sucursal",
+        set_={
+            "cantidad": inventario.c.cantidad + query.excluded.cantidad,
+            "fecha_actualizacion": query.excluded.fecha_actualizacion
+        }
+    ).returning(inventario.c.producto_id, inventario.c.cantidad)
+
+    if tipo_movimiento:
+        if usuario_id is None:
+            raise ValueError("El historial necesita usuario_id")
+        stock = query.cte("stock")
+        query = pg_insert(historial_inventario).from_select(
+            ["fecha", "sucursal_id", "usuario_id", "producto_id", "tipo_movimiento",
+             "cantidad_anterior", "cantidad_movida", "cantidad_nueva", "motivo"],
+            select(
+                cast(ahora, DateTime(timezone=True)),
+                cast(sucursal_id, Integer),
+                cast(usuario_id, Integer),
+                stock.c.producto_id,
+                cast(tipo_movimiento, Text),
+                stock.c.cantidad - movs.c.delta,
+                movs.c.delta,
+                stock.c.cantidad,
+                cast(motivo, Text)
+            ).select_from(stock.join(movs, movs.c.producto_id == stock.c.producto_id))
+        ).returning(historial_inventario.c.producto_id, historial_inventario.c.cantidad_nueva.label("cantidad"))
+
+    resultado = {}
+    for r in await database.fetch_all(query):
+        nueva = float(r['cantidad'])
+        resultado[r['producto_id']] = (nueva - deltas[r['producto_id']], nueva)
+    return resultado
+
+
+async def fijar_stock(sucursal_id: int, cantidades: Dict[int, float], ahora: Optional[datetime] = None,
+                      tipo_movimiento: Optional[str] = None, usuario_id: Optional[int] = None,
+                      motivo: Optional[str] = None) -> Movimientos:
+    """
+    Reemplaza el inventario por `cantidades[producto_id]` (conteo físico).
+
+    La cantidad anterior se lee con FOR UPDATE en la misma sentencia del UPDATE,
+    así la diferencia se calcula contra el valor que realmente se sobrescribió.
+    Con `tipo_movimiento` escribe una fila de historial_inventario por cada
+    producto cuya cantidad cambió, como mover_stock.
+    """
+    cantidades = {pid: float(c) for pid, c in cantidades.items()}
+    if not cantidades:
+        return {}
+    ahora = ahora or datetime.now(timezone.utc)
+
+    fisico = tabla_valores(
+        "fisico",
+        producto_id=(Integer, list(cantidades.keys())),
+        cantidad=(Numeric, list(cantidades.values()))
+    )
+    previo = select(inventario.c.id, inventario.c.cantidad).where(
+        (inventario.c.sucursal_id == sucursal_id) &
+        (inventario.c.producto_id.in_(list(cantidades.keys())))
+    ).with_for_update().subquery("previo")
+
+    query = inventario.update().where(
+        (inventario.c.id == previo.c.id) &
+        (inventario.c.producto_id == fisico.c.producto_id)
+    ).values(
+        cantidad=fisico.c.cantidad,
+        fecha_actualizacion=ahora
+    ).returning(inventario.c.producto_id, previo.c.cantidad.label("anterior"), inventario.c.cantidad)
+
+    resultado = {
+        r['producto_id']: (float(r['anterior']), float(r['cantidad']))
+        for r in await database.fetch_all(query)
+    }
+
+    # Productos que no tenían registro (ON CONFLICT por si otra caja lo creó en medio)
+    faltantes = {pid: c for pid, c in cantidades.items() if pid not in resultado}
+    if faltantes:
+        query_ins = pg_insert(inventario).values([
+            {
+                "producto_id": pid, "sucursal_id": sucursal_id,
+                "cantidad": c, "fecha_actualizacion": ahora
+            }
+            for pid, c in faltantes.items()
+        ])
+        query_ins = query_ins.on_conflict_do_update(
+            constraint="uq_inventario_producto_sucursal",
+            set_={
+                "cantidad": query_ins.excluded.cantidad,
+                "fecha_actualizacion": query_ins.excluded.fecha_actualizacion
+            }
+        )
+        await database.execute(query_ins)
+        resultado.update({pid: (0.0, c) for pid, c in faltantes.items()})
+
+    if tipo_movimiento:
+        if usuario_id is None:
+            raise ValueError("El historial necesita usuario_id")
+        cambios = {pid: (a, n) for pid, (a, n) in resultado.items() if n != a}
+        if cambios:
+            await database.execute(historial_inventario.insert().values([
+                {
+                    "fecha": ahora, "sucursal_id": sucursal_id, "usuario_id": usuario_id,
+                    "producto_id": pid, "tipo_movimiento": tipo_movimiento,
+                    "cantidad_anterior": anterior, "cantidad_movida": nueva - anterior,
+                    "cantidad_nueva": nueva, "motivo": motivo
+                }
+                for pid, (anterior, nueva) in cambios.items()
+            ]))
+
+    return resultado
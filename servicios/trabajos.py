@@ -0,0 +1,242 @@
+# servicios/trabajos.py
+#
+# Trabajos en segundo plano para informes y exportaciones pesadas: el request
+# solo da de alta el trabajo (tabla `trabajo`) y regresa su id; un número fijo
+# de workers (TRABAJOS_WORKERS) los corre fuera del request, así que nunca hay
+# más de esos ocupando conexiones del pool. El resultado se guarda en la tabla
+# y se descarga con GET /trabajos/{id}/resultado.
+#
+# Los routers registran qué se puede correr así:
+#   @cola_trabajos.registrar("informes.ventas-mes")
+#   async def reporte_ventas_mes(...)
+# Un async def cuyo resultado se guarda como JSON, o un generador async de
+# bytes/str (exportaciones) que se junta tal cual con el tipo_contenido indicado.
+
+import asyncio
+import inspect
+import json
+import logging
+import os
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Optional
+
+from fastapi.encoders import jsonable_encoder
+from pydantic import BaseModel, ConfigDict, ValidationError, create_model
+from sqlalchemy import select, desc
+
+from database import database
+from models import trabajo
+
+logger = logging.getLogger(__name__)
+
+TRABAJOS_WORKERS = int(os.getenv("TRABAJOS_WORKERS", "2"))
+# Trabajos esperando en este proceso; con la cola llena se rechazan (503)
+TRABAJOS_COLA_MAX = int(os.getenv("TRABAJOS_COLA_MAX", "100"))
+TRABAJOS_TIMEOUT_SEGUNDOS = float(os.getenv("TRABAJOS_TIMEOUT_SEGUNDOS", "600"))
+# Terminados o fallidos más viejos que esto se borran al arrancar
+TRABAJOS_RETENCION_HORAS = float(os.getenv("TRABAJOS_RETENCION_HORAS", "24"))
+
+# Todo menos el resultado, que puede pesar megas
+COLUMNAS_ESTADO = [c for c in trabajo.c if c.name != "resultado"]
+
+
+class ColaLlena(Exception):
+    pass
+
+
+@dataclass
+class TipoTrabajo:
+    funcion: Callable
+    tipo_contenido: str
+    # Modelo armado con la firma de la función: valida y convierte los parámetros
+    parametros: type[BaseModel]
+
+
+def _modelo_parametros(tipo: str, funcion: Callable) -> type[BaseModel]:
+    vacio = inspect.Parameter.empty
+    campos = {
+        p.name: (Any if p.annotation is vacio else p.annotation, ... if p.default is vacio else p.default)
+        for p in inspect.signature(funcion).parameters.values()
+    }
+    return create_model(f"Parametros[{tipo}]", __config__=ConfigDict(extra="forbid"), **campos)
+
+
+class ColaTrabajos:
+    def __init__(self):
+        self._tipos = {}
+        self._cola: Optional[asyncio.Queue] = None
+        self._workers = []
+        self.en_curso = 0
+        self.terminados = 0
+        self.fallidos = 0
+
+    def registrar(self, tipo: str, tipo_contenido: str = "application/json"):
+        def decorador(funcion):
+            # Los parámetros llegan como JSON: pydantic los convierte (p. ej. "2026-10-01" -> date)
+            self._tipos[tipo] = TipoTrabajo(funcion, tipo_contenido, _modelo_parametros(tipo, funcion))
+            return funcion
+        return decorador
+
+    def tipos(self):
+        return {
+            nombre: {"parametros": list(inspect.signature(t.funcion).parameters), "tipo_contenido": t.tipo_contenido}
+            for nombre, t in sorted(self._tipos.items())
+        }
+
+    def validar(self, tipo: str, parametros: dict) -> dict:
+        """
+        Parámetros convertidos a los tipos de la función. ValueError si el tipo
+        no existe o los parámetros (nombres o valores) no le cuadran, sin correrlo.
+        """
+        if tipo not in self._tipos:
+            raise ValueError(f"Tipo de trabajo desconocido: {tipo}")
+        try:
+            return dict(self._tipos[tipo].parametros.model_validate(parametros))
+        except ValidationError as e:
+            errores = "; ".join(f"{'.'.join(map(str, err['loc'])) or 'parametros'}: {err['msg']}" for err in e.errors())
+            raise ValueError(f"Parámetros inválidos para {tipo}: {errores}")
+
+    async def iniciar(self):
+        self._cola = asyncio.Queue(maxsize=TRABAJOS_COLA_MAX)
+        ahora = datetime.now(timezone.utc)
+        # Los que quedaron a medias en un reinicio (y ya vencieron) no se van a terminar
+        await database.execute(
+            trabajo.update().where(
+                (trabajo.c.estado == "EN_CURSO") &
+                (trabajo.c.fecha_inicio < ahora - timedelta(seconds=TRABAJOS_TIMEOUT_SEGUNDOS))
+            ).values(estado="ERROR", error="Interrumpido por un reinicio", fecha_fin=ahora)
+        )
+        await database.execute(
+            trabajo.delete().where(
+                trabajo.c.estado.in_(["TERMINADO", "ERROR"]) &
+                (trabajo.c.fecha_fin < ahora - timedelta(hours=TRABAJOS_RETENCION_HORAS))
+            )
+        )
+        # Los pendientes se vuelven a encolar; si otro proceso los toma primero, aquí se saltan
+        pendientes = await database.fetch_all(
+            select(trabajo.c.id).where(trabajo.c.estado == "PENDIENTE")
+            .order_by(trabajo.c.id).limit(TRABAJOS_COLA_MAX)
+        )
+        for p in pendientes:
+            self._cola.put_nowait(p["id"])
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(TRABAJOS_WORKERS)]
+
+    async def detener(self):
+        for w in self._workers:
+            w.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    async def enviar(self, tipo: str, parametros: dict) -> int:
+        self.validar(tipo, parametros)
+        if self._cola is None or self._cola.full():
+            raise ColaLlena()
+        id = await database.execute(
+            trabajo.insert().values(tipo=tipo, parametros=json.dumps(parametros), estado="PENDIENTE")
+        )
+        try:
+            self._cola.put_nowait(id)
+        except asyncio.QueueFull:
+            # Otro request llenó la cola mientras se insertaba
+            await database.execute(
+                trabajo.update().where(trabajo.c.id == id).values(
+                    estado="ERROR", error="Cola llena", fecha_fin=datetime.now(timezone.utc)
+                )
+            )
+            raise ColaLlena()
+        return id
+
+    def resumen(self) -> dict:
+        return {
+            "workers": len(self._workers),
+            "en_cola": self._cola.qsize() if self._cola else 0,
+            "en_curso": self.en_curso,
+            "terminados": self.terminados,
+            "fallidos": self.fallidos,
+        }
+
+    async def _worker(self):
+        while True:
+            id = await self._cola.get()
+            try:
+                await self._correr(id)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Falló el trabajo %s", id)
+            finally:
+                self._cola.task_done()
+
+    async def _correr(self, id: int):
+        # Tomarlo: si otro proceso ya lo tomó, el UPDATE no regresa fila
+        t = await database.fetch_one(
+            trabajo.update().where(
+                (trabajo.c.id == id) & (trabajo.c.estado == "PENDIENTE")
+            ).values(
+                estado="EN_CURSO", fecha_inicio=datetime.now(timezone.utc)
+            ).returning(trabajo.c.tipo, trabajo.c.parametros)
+        )
+        if t is None:
+            return
+
+        self.en_curso += 1
+        try:
+            tipo = self._tipos.get(t["tipo"])
+            if tipo is None:
+                raise ValueError(f"Tipo de trabajo desconocido: {t['tipo']}")
+            contenido = await asyncio.wait_for(
+                self._ejecutar(tipo, self.validar(t["tipo"], json.loads(t["parametros"]))), TRABAJOS_TIMEOUT_SEGUNDOS
+            )
+        except asyncio.CancelledError:
+            # Apagado: queda pendiente para el siguiente arranque
+            await database.execute(
+                trabajo.update().where(trabajo.c.id == id).values(estado="PENDIENTE", fecha_inicio=None)
+            )
+            raise
+        except Exception as e:
+            self.fallidos += 1
+            mensaje = "Tiempo agotado" if isinstance(e, asyncio.TimeoutError) else f"{type(e).__name__}: {e}"
+            await database.execute(
+                trabajo.update().where(trabajo.c.id == id).values(
+                    estado="ERROR", error=mensaje[:2000], fecha_fin=datetime.now(timezone.utc)
+                )
+            )
+        else:
+            self.terminados += 1
+            await database.execute(
+                trabajo.update().where(trabajo.c.id == id).values(
+                    estado="TERMINADO", resultado=contenido, tipo_contenido=tipo.tipo_contenido,
+                    fecha_fin=datetime.now(timezone.utc)
+                )
+            )
+        finally:
+            self.en_curso -= 1
+
+    async def _ejecutar(self, tipo: TipoTrabajo, parametros: dict) -> bytes:
+        resultado = tipo.funcion(**parametros)
+        if inspect.isasyncgen(resultado):
+            return b"".join([p if isinstance(p, bytes) else p.encode() async for p in resultado])
+        resultado = await resultado
+        return json.dumps(jsonable_encoder(resultado), ensure_ascii=False).encode()
+
+
+cola_trabajos = ColaTrabajos()
+
+
+async def obtener(id: int):
+    return await database.fetch_one(select(*COLUMNAS_ESTADO).where(trabajo.c.id == id))
+
+
+async def listar(estado: Optional[str] = None, limite: int = 50):
+    query = select(*COLUMNAS_ESTADO)
+    if estado:
+        query = query.where(trabajo.c.estado == estado)
+    return await database.fetch_all(query.order_by(desc(trabajo.c.id)).limit(limite))
+
+
+async def resultado(id: int):
+    return await database.fetch_one(
+        select(trabajo.c.estado, trabajo.c.tipo, trabajo.c.tipo_contenido, trabajo.c.resultado)
+        .where(trabajo.c.id == id)
+    )
@@ -0,0 +1,34 @@
+# tests/test_cambio_precios.py
+#
+# El UPDATE de POST /productos/precios se revisa compilado para PostgreSQL
+# (no hace falta base): un precio_granel NULL tiene que quedarse NULL.
+
+import pytest
+from pydantic import ValidationError
+from sqlalchemy.dialects import postgresql
+
+from models import producto
+from schemas import CambioPreciosIn
+from routers.productos import precio_ajustado
+
+
+def _sql(campo, modo, valor):
+    query = producto.update().values({campo: precio_ajustado(producto.c[campo], modo, valor)})
+    return str(query.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}))
+
+
+def test_precio_granel_null_se_queda_null():
+    for modo in ("porcentaje", "monto"):
+        sql = _sql("precio_granel", modo, 8)
+        assert "CASE WHEN (producto.precio_granel IS NULL) THEN NULL ELSE greatest(" in sql
+
+
+def test_precio_base_redondeado_y_sin_bajar_de_cero():
+    sql = _sql("precio_base", "monto", -500)
+    assert "greatest(round(producto.precio_base + -500, 2), 0)" in sql
+
+
+def test_sin_campos_es_invalido():
+    # UPDATE ... SET sin columnas no es SQL válido: se rechaza antes (422)
+    with pytest.raises(ValidationError):
+        CambioPreciosIn(modo="monto", valor=10, marca_id=1, campos=[])
@@ -0,0 +1,44 @@
+# tests/test_descuentos.py
+#
+# Una carga del motor de descuentos que se cruza con una escritura de reglas
+# no puede dejar vigentes las reglas de antes.
+
+import asyncio
+
+from servicios import descuentos
+from servicios.descuentos import MotorDescuentos
+
+
+class _BaseLenta:
+    """fetch_all que tarda y devuelve las reglas que había al EMPEZAR la consulta."""
+
+    def __init__(self, reglas):
+        self.reglas = reglas
+        self.consultas = 0
+
+    async def fetch_all(self, query):
+        leidas = list(self.reglas)
+        self.consultas += 1
+        await asyncio.sleep(0.01)
+        return leidas
+
+
+def _regla(pct):
+    return {"descuento_porcentaje": pct, "producto_id": 7, "marca_id": None, "cliente_id": None}
+
+
+def test_invalidar_durante_la_carga_descarta_lo_leido(monkeypatch):
+    base = _BaseLenta([_regla(10)])
+    monkeypatch.setattr(descuentos, "database", base)
+    motor = MotorDescuentos()
+
+    async def escenario():
+        carga = asyncio.create_task(motor.asegurar_cargado())
+        await asyncio.sleep(0)  # la carga ya leyó la regla del 10 %
+        base.reglas = [_regla(25)]
+        motor.invalidar()
+        await carga
+
+    asyncio.run(escenario())
+    assert base.consultas == 2
+    assert motor.mejor_descuento(None, 7, None) == 25